@@ -4,164 +4,202 @@ Analysis script for trading results
 
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 from datetime import datetime, timedelta
 import os
+import argparse
+from config import *
+from trade_store import TradeStore
+from journal_aggregates import aggregate_journal
+from performance_metrics import ledger_metrics, max_drawdown
+from equity_curve import equity_from_bar_store
+from chart_renderer import ChartSpec, render_charts
 
-def analyze_trading_results(excel_file="trading_log.xlsx"):
-    """Analyze trading results from Excel file"""
+# Trade columns the risk metrics and the mark-to-market equity curve are computed from
+METRIC_COLUMNS = ['ticker', 'entry_time', 'exit_time', 'gross_pl', 'shares', 'entry_fill_price',
+                  'exit_fill_price', 'stop_loss_price']
+TRADE_COLUMNS = ['ticker', 'strategy', 'gross_pl', 'date']  # Best and worst trade listings
+BREAKDOWNS = {'Entry Hour': 'entry_hour', 'Exit Reason': 'exit_reason'}  # Extra performance tables
+
+def analyze_trading_results(store_file=TRADE_STORE_FILE):
+    """Analyze trading results from the trade store
+    
+    Every figure is aggregated by SQLite over its indexes, the daily rollup
+    and the attribution cube; only the columns the metrics and charts use
+    are read out per trade.
+    """
     
-    if not os.path.exists(excel_file):
-        print(f"Excel file {excel_file} not found. Run the simulator first.")
+    if not os.path.exists(store_file):
+        print(f"Trade store {store_file} not found. Run the simulator first.")
         return
     
     try:
-        # Read trading data
-        df = pd.read_excel(excel_file, sheet_name="Trading Log")
+        store = TradeStore(store_file)
+        summary = store.summary()
         
-        if df.empty:
+        if summary['total_trades'] == 0:
             print("No trading data found.")
             return
         
-        print("Day Trading Simulator - Results Analysis")
-        print("=" * 50)
-        print()
-        
-        # Basic statistics
-        total_trades = len(df)
-        winning_trades = len(df[df['Win/Loss'] == 'Win'])
-        losing_trades = len(df[df['Win/Loss'] == 'Loss'])
-        win_rate = (winning_trades / total_trades) * 100 if total_trades > 0 else 0
-        
-        total_profit = df[df['Gross P/L ($)'] > 0]['Gross P/L ($)'].sum()
-        total_loss = abs(df[df['Gross P/L ($)'] < 0]['Gross P/L ($)'].sum())
-        net_profit = total_profit - total_loss
-        
-        avg_win = total_profit / winning_trades if winning_trades > 0 else 0
-        avg_loss = total_loss / losing_trades if losing_trades > 0 else 0
-        profit_factor = total_profit / total_loss if total_loss > 0 else float('inf')
-        
-        print("Overall Performance:")
-        print(f"  Total Trades: {total_trades}")
-        print(f"  Winning Trades: {winning_trades}")
-        print(f"  Losing Trades: {losing_trades}")
-        print(f"  Win Rate: {win_rate:.1f}%")
-        print(f"  Total Profit: ${total_profit:,.2f}")
-        print(f"  Total Loss: ${total_loss:,.2f}")
-        print(f"  Net Profit: ${net_profit:,.2f}")
-        print(f"  Average Win: ${avg_win:,.2f}")
-        print(f"  Average Loss: ${avg_loss:,.2f}")
-        print(f"  Profit Factor: {profit_factor:.2f}")
-        print()
-        
-        # Strategy performance
-        print("Strategy Performance:")
-        strategy_stats = df.groupby('Strategy').agg({
-            'Win/Loss': lambda x: (x == 'Win').sum(),
-            'Gross P/L ($)': ['count', 'sum', 'mean']
-        }).round(2)
-        
-        strategy_stats.columns = ['Wins', 'Total_Trades', 'Total_PL', 'Avg_PL']
-        strategy_stats['Win_Rate'] = (strategy_stats['Wins'] / strategy_stats['Total_Trades'] * 100).round(1)
-        strategy_stats['Profit_Factor'] = (strategy_stats['Total_PL'] / 
-                                         strategy_stats['Total_PL'].where(strategy_stats['Total_PL'] < 0).abs()).round(2)
-        
-        print(strategy_stats)
-        print()
-        
-        # Daily performance
-        df['Date'] = pd.to_datetime(df['Date'])
-        daily_perf = df.groupby('Date').agg({
-            'Gross P/L ($)': 'sum',
-            'Win/Loss': lambda x: (x == 'Win').sum(),
-            'Order ID': 'count'
-        }).round(2)
+        trades = store.query(METRIC_COLUMNS)
+        curve = equity_from_bar_store(trades, INITIAL_PORTFOLIO_VALUE)
+        intraday_drawdown = None
+        if not curve.empty:
+            intraday_drawdown, _ = max_drawdown(curve['equity'].to_numpy(), curve.index.to_numpy())
         
-        daily_perf.columns = ['Daily_PL', 'Wins', 'Total_Trades']
-        daily_perf['Daily_Win_Rate'] = (daily_perf['Wins'] / daily_perf['Total_Trades'] * 100).round(1)
-        
-        print("Recent Daily Performance (Last 10 days):")
-        print(daily_perf.tail(10))
-        print()
-        
-        # Risk metrics
-        print("Risk Metrics:")
-        max_drawdown = df['Cumulative P/L'].min()
-        avg_risk = df['$ Risked (per trade)'].mean()
-        max_risk = df['$ Risked (per trade)'].max()
-        
-        print(f"  Maximum Drawdown: ${max_drawdown:,.2f}")
-        print(f"  Average Risk per Trade: ${avg_risk:,.2f}")
-        print(f"  Maximum Risk per Trade: ${max_risk:,.2f}")
-        print()
-        
-        # Best and worst trades
-        print("Best Trades:")
-        best_trades = df.nlargest(3, 'Gross P/L ($)')[['Ticker', 'Strategy', 'Gross P/L ($)', 'Date']]
-        print(best_trades)
-        print()
-        
-        print("Worst Trades:")
-        worst_trades = df.nsmallest(3, 'Gross P/L ($)')[['Ticker', 'Strategy', 'Gross P/L ($)', 'Date']]
-        print(worst_trades)
-        print()
+        strategy_stats = store.performance_by('strategy')
+        print_report(summary, strategy_stats, store.performance_by('date', limit=10),
+                     {label: store.cube.slice(dimension) for label, dimension in BREAKDOWNS.items()},
+                     ledger_metrics(trades, INITIAL_PORTFOLIO_VALUE),
+                     store.cube.top_trades(3, columns=TRADE_COLUMNS),
+                     store.cube.top_trades(3, worst=True, columns=TRADE_COLUMNS), intraday_drawdown)
         
         # Generate charts
-        create_performance_charts(df)
-        
+        chart_data = store.query(['cumulative_pl', 'trade_duration_min'])
+        create_performance_charts(chart_data['cumulative_pl'].fillna(0), strategy_stats,
+                                  chart_data['trade_duration_min'].dropna().value_counts().sort_index())
+    
     except Exception as e:
         print(f"Error analyzing results: {e}")
 
-def create_performance_charts(df):
-    """Create performance visualization charts"""
+def analyze_journal_streaming(journal_file=JOURNAL_FILE, chunk_rows=ANALYSIS_CHUNK_ROWS):
+    """Analyze trading results by streaming the trade journal in chunks
+    
+    Prints the same report as analyze_trading_results() without the trade
+    store, holding only chunk_rows trades and the running aggregates in
+    memory. The intraday drawdown, which needs every trade at once, is left
+    out.
+    """
+    
+    if not os.path.exists(journal_file):
+        print(f"Trade journal {journal_file} not found. Run the simulator first.")
+        return
+    
     try:
-        # Set up the plotting style
-        plt.style.use('default')
-        fig, axes = plt.subplots(2, 2, figsize=(15, 10))
-        fig.suptitle('Day Trading Simulator - Performance Analysis', fontsize=16)
-        
-        # 1. Cumulative P&L
-        df['Cumulative P/L'] = df['Cumulative P/L'].fillna(0)
-        axes[0, 0].plot(df.index, df['Cumulative P/L'], linewidth=2, color='blue')
-        axes[0, 0].set_title('Cumulative P&L Over Time')
-        axes[0, 0].set_xlabel('Trade Number')
-        axes[0, 0].set_ylabel('Cumulative P&L ($)')
-        axes[0, 0].grid(True, alpha=0.3)
-        
-        # 2. Strategy Performance
-        strategy_pnl = df.groupby('Strategy')['Gross P/L ($)'].sum().sort_values(ascending=True)
-        axes[0, 1].barh(strategy_pnl.index, strategy_pnl.values)
-        axes[0, 1].set_title('Total P&L by Strategy')
-        axes[0, 1].set_xlabel('Total P&L ($)')
-        axes[0, 1].grid(True, alpha=0.3)
+        aggregates = aggregate_journal(journal_file, chunk_rows, INITIAL_PORTFOLIO_VALUE)
+        summary = aggregates.summary()
         
-        # 3. Win Rate by Strategy
-        win_rates = df.groupby('Strategy').apply(
-            lambda x: (x['Win/Loss'] == 'Win').sum() / len(x) * 100
-        ).sort_values(ascending=True)
-        axes[1, 0].barh(win_rates.index, win_rates.values, color='green', alpha=0.7)
-        axes[1, 0].set_title('Win Rate by Strategy (%)')
-        axes[1, 0].set_xlabel('Win Rate (%)')
-        axes[1, 0].grid(True, alpha=0.3)
-        
-        # 4. Trade Duration Distribution
-        axes[1, 1].hist(df['Trade Duration (min)'].dropna(), bins=20, alpha=0.7, color='orange')
-        axes[1, 1].set_title('Trade Duration Distribution')
-        axes[1, 1].set_xlabel('Duration (minutes)')
-        axes[1, 1].set_ylabel('Number of Trades')
-        axes[1, 1].grid(True, alpha=0.3)
+        if summary['total_trades'] == 0:
+            print("No trading data found.")
+            return
         
-        plt.tight_layout()
-        plt.savefig('trading_performance_analysis.png', dpi=300, bbox_inches='tight')
-        print("Performance charts saved as 'trading_performance_analysis.png'")
+        strategy_stats = aggregates.performance_by('strategy')
+        print_report(summary, strategy_stats, aggregates.performance_by('date', limit=10),
+                     {label: aggregates.performance_by(grouping) for label, grouping in BREAKDOWNS.items()},
+                     aggregates.metrics(), aggregates.best_trades(), aggregates.worst_trades())
         
+        # Generate charts
+        create_performance_charts(aggregates.cumulative_pl(), strategy_stats, aggregates.trade_durations())
+    
+    except Exception as e:
+        print(f"Error analyzing results: {e}")
+
+def print_report(summary: dict, strategy_stats: pd.DataFrame, daily_perf: pd.DataFrame,
+                 breakdowns: dict, metrics: dict, best_trades: pd.DataFrame, worst_trades: pd.DataFrame,
+                 intraday_drawdown: float = None):
+    """Print the results report from a TradeStore.summary, performance_by tables and ledger metrics"""
+    print("Day Trading Simulator - Results Analysis")
+    print("=" * 50)
+    print()
+    
+    print("Overall Performance:")
+    print(f"  Total Trades: {summary['total_trades']}")
+    print(f"  Winning Trades: {summary['winning_trades']}")
+    print(f"  Losing Trades: {summary['losing_trades']}")
+    print(f"  Win Rate: {summary['win_rate']:.1f}%")
+    print(f"  Total Profit: ${summary['total_profit']:,.2f}")
+    print(f"  Total Loss: ${summary['total_loss']:,.2f}")
+    print(f"  Net Profit: ${summary['net_profit']:,.2f}")
+    print(f"  Average Win: ${summary['avg_win']:,.2f}")
+    print(f"  Average Loss: ${summary['avg_loss']:,.2f}")
+    print(f"  Profit Factor: {summary['profit_factor']:.2f}")
+    print()
+    
+    # Strategy performance
+    print("Strategy Performance:")
+    print(_performance_table(strategy_stats))
+    print()
+    
+    # Daily performance
+    print("Recent Daily Performance (Last 10 days):")
+    daily_table = _performance_table(daily_perf)[['Total_PL', 'Wins', 'Total_Trades', 'Win_Rate']]
+    print(daily_table.rename(columns={'Total_PL': 'Daily_PL', 'Win_Rate': 'Daily_Win_Rate'}))
+    print()
+    
+    for label, stats in breakdowns.items():
+        print(f"Performance by {label}:")
+        print(_performance_table(stats))
+        print()
+    
+    # Risk metrics
+    print("Risk Metrics:")
+    print(f"  Sharpe Ratio: {metrics['sharpe_ratio']:.2f}")
+    print(f"  Sortino Ratio: {metrics['sortino_ratio']:.2f}")
+    print(f"  Calmar Ratio: {metrics['calmar_ratio']:.2f}")
+    print(f"  Maximum Drawdown: {metrics['max_drawdown']:.2%} "
+          f"(longest {metrics['max_drawdown_days']:.0f} days below a peak)")
+    if intraday_drawdown is not None:
+        print(f"  Intraday Maximum Drawdown: {intraday_drawdown:.2%} "
+              f"(open positions marked to {INTRADAY_INTERVAL} closes)")
+    print(f"  Lowest Cumulative P/L: ${summary['min_cumulative_pl']:,.2f}")
+    print(f"  Exposure: {metrics['exposure']:.1%} of trading hours")
+    print(f"  Turnover: {metrics['turnover']:.1f}x average equity")
+    print(f"  Average Risk per Trade: ${summary['avg_risk']:,.2f}")
+    print(f"  Maximum Risk per Trade: ${summary['max_risk']:,.2f}")
+    print()
+    
+    # Best and worst trades
+    print("Best Trades:")
+    print(best_trades)
+    print()
+    
+    print("Worst Trades:")
+    print(worst_trades)
+    print()
+
+def _performance_table(stats: pd.DataFrame) -> pd.DataFrame:
+    """Per-group statistics from TradeStore.performance_by or AttributionCube.slice, as printed in the report"""
+    table = stats[['wins', 'total_trades', 'total_pl', 'avg_pl', 'win_rate', 'profit_factor']].round(2)
+    table.columns = ['Wins', 'Total_Trades', 'Total_PL', 'Avg_PL', 'Win_Rate', 'Profit_Factor']
+    table['Win_Rate'] = table['Win_Rate'].round(1)
+    return table
+
+def create_performance_charts(cumulative_pl: pd.Series, strategy_stats: pd.DataFrame, duration_counts: pd.Series):
+    """Create performance visualization charts
+    
+    cumulative_pl is indexed by trade number; duration_counts is the number
+    of trades per duration in minutes. Each chart is its own PNG in
+    CHART_DIR, redrawn only when the data it shows has changed.
+    """
+    try:
+        charts = [
+            ChartSpec('cumulative_pl', 'line', cumulative_pl, 'Cumulative P&L Over Time',
+                      'Trade Number', 'Cumulative P&L ($)', {'linewidth': 2, 'color': 'blue'}),
+            ChartSpec('strategy_pl', 'barh', strategy_stats['total_pl'].sort_values(ascending=True),
+                      'Total P&L by Strategy', 'Total P&L ($)'),
+            ChartSpec('strategy_win_rate', 'barh', strategy_stats['win_rate'].sort_values(ascending=True),
+                      'Win Rate by Strategy (%)', 'Win Rate (%)', style={'color': 'green', 'alpha': 0.7}),
+            ChartSpec('trade_duration', 'hist', duration_counts, 'Trade Duration Distribution',
+                      'Duration (minutes)', 'Number of Trades', {'bins': 20, 'alpha': 0.7, 'color': 'orange'})
+        ]
+        paths, rendered = render_charts(charts)
+        print(f"Performance charts saved in '{CHART_DIR}' "
+              f"({len(rendered)} redrawn, {len(paths) - len(rendered)} unchanged)")
+    
     except Exception as e:
         print(f"Error creating charts: {e}")
 
 def main():
     """Main function"""
-    analyze_trading_results()
+    parser = argparse.ArgumentParser(description="Report on the simulator's closed trades")
+    parser.add_argument("--stream", action="store_true",
+                        help="read the trade journal in chunks instead of querying the trade store")
+    parser.add_argument("--journal", default=JOURNAL_FILE, help="trade journal to read with --stream")
+    args = parser.parse_args()
+    
+    if args.stream:
+        analyze_journal_streaming(args.journal)
+    else:
+        analyze_trading_results()
 
 if __name__ == "__main__":
     main()
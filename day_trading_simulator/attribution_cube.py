@@ -0,0 +1,180 @@
+"""
+Trade P/L attribution cube kept in the trade store, sliceable by any of its dimensions
+"""
+
+import heapq
+import sqlite3
+import logging
+from typing import List, Tuple, Union
+import pandas as pd
+import numpy as np
+from config import *
+
+logger = logging.getLogger(__name__)
+
+# Cube dimension: SQL expression over the trades table
+CUBE_DIMENSIONS = {
+    "strategy": "strategy",
+    "ticker": "ticker",
+    "date": "date",
+    "entry_hour": "CAST(substr(entry_time, 12, 2) AS INTEGER)",  # TIME_FORMAT text
+    "exit_reason": "COALESCE(exit_signal, '')"
+}
+# P/L aggregates per cell, summed when cells are sliced together
+CUBE_SUMS = {
+    "trades": "COUNT(*)",
+    "wins": "SUM(win_loss = 'Win')",
+    "losses": "SUM(win_loss = 'Loss')",
+    "total_pl": "COALESCE(SUM(gross_pl), 0)",
+    "gross_profit": "COALESCE(SUM(CASE WHEN gross_pl > 0 THEN gross_pl END), 0)",
+    "gross_loss": "COALESCE(-SUM(CASE WHEN gross_pl < 0 THEN gross_pl END), 0)"
+}
+# Top-trade side: ORDER BY that ranks trades for it, best first (both walk cube_top_trades_rank)
+TOP_SIDES = {"best": "gross_pl DESC, trade_id DESC", "worst": "gross_pl, trade_id"}
+
+def create_cube_schema(connection: sqlite3.Connection):
+    """Create the cube tables next to the trades table, filling them from any trades already stored"""
+    dimensions = ", ".join(CUBE_DIMENSIONS)
+    sums = ", ".join(f"{name} REAL" for name in CUBE_SUMS)
+    connection.execute(f"CREATE TABLE IF NOT EXISTS attribution_cube (cell INTEGER PRIMARY KEY, {dimensions}, "
+                       f"{sums}, UNIQUE ({dimensions}))")
+    for dimension in list(CUBE_DIMENSIONS)[1:]:
+        connection.execute(f"CREATE INDEX IF NOT EXISTS attribution_cube_{dimension} "
+                           f"ON attribution_cube ({dimension})")
+    connection.execute("CREATE TABLE IF NOT EXISTS cube_top_trades "
+                       "(cell INTEGER, side TEXT, trade_id INTEGER, gross_pl REAL)")
+    connection.execute("CREATE INDEX IF NOT EXISTS cube_top_trades_cell ON cube_top_trades (cell, side)")
+    connection.execute("CREATE INDEX IF NOT EXISTS cube_top_trades_trade ON cube_top_trades (trade_id)")
+    connection.execute("CREATE INDEX IF NOT EXISTS cube_top_trades_rank ON cube_top_trades (side, gross_pl, trade_id)")
+    
+    # Stores written before the cube existed
+    empty, stored = connection.execute(
+        "SELECT NOT EXISTS (SELECT 1 FROM attribution_cube), EXISTS (SELECT 1 FROM trades)"
+    ).fetchone()
+    if empty and stored:
+        logger.info("Building the attribution cube from the stored trades")
+        fold_into_cube(connection, 0)
+
+def fold_into_cube(connection: sqlite3.Connection, after_id: int):
+    """Add the trades with ids above after_id to the cube (inside the insert transaction)
+    
+    Cell sums are upserted, then every new trade becomes a best and a worst
+    candidate of its cell, and cells that gained candidates are cut back to
+    their ATTRIBUTION_TOP_K best and worst.
+    """
+    dimensions = ", ".join(CUBE_DIMENSIONS)
+    selected = [f"{expression} AS {name}" for name, expression in CUBE_DIMENSIONS.items()]
+    selected += [f"{expression} AS {name}" for name, expression in CUBE_SUMS.items()]
+    updates = [f"{name} = {name} + excluded.{name}" for name in CUBE_SUMS]
+    connection.execute(f"""
+        INSERT INTO attribution_cube ({dimensions}, {', '.join(CUBE_SUMS)})
+        SELECT {', '.join(selected)} FROM trades WHERE id > ? GROUP BY {dimensions}
+        ON CONFLICT ({dimensions}) DO UPDATE SET {', '.join(updates)}""", (after_id,))
+    
+    new_trades = ", ".join(f"{expression} AS {name}" for name, expression in CUBE_DIMENSIONS.items())
+    sides = " UNION ALL ".join(f"SELECT '{side}' AS side" for side in TOP_SIDES)
+    connection.execute(f"""
+        WITH new AS (SELECT id, gross_pl, {new_trades} FROM trades WHERE id > ? AND gross_pl IS NOT NULL)
+        INSERT INTO cube_top_trades (cell, side, trade_id, gross_pl)
+        SELECT cube.cell, sides.side, new.id, new.gross_pl
+        FROM new JOIN attribution_cube AS cube USING ({dimensions}) CROSS JOIN ({sides}) AS sides""",
+                       (after_id,))
+    
+    rank = " ".join(f"WHEN '{side}' THEN ROW_NUMBER() OVER (PARTITION BY cell, side ORDER BY {order})"
+                    for side, order in TOP_SIDES.items())
+    connection.execute(f"""
+        DELETE FROM cube_top_trades WHERE rowid IN (
+            SELECT rowid FROM (
+                SELECT rowid, CASE side {rank} END AS rank FROM cube_top_trades
+                WHERE cell IN (SELECT cell FROM cube_top_trades WHERE trade_id > ?)
+            ) WHERE rank > ?
+        )""", (after_id, ATTRIBUTION_TOP_K))
+
+class AttributionCube:
+    """P/L per strategy, ticker, date, hour of entry and exit reason, read from a TradeStore
+    
+    The store folds every insert batch into the cube in the same transaction,
+    so slices cost a scan of the cells rather than of the trades. Filters
+    take a value or a list of values per dimension, plus inclusive
+    start_date and end_date.
+    """
+    
+    def __init__(self, store):
+        self.store = store
+    
+    def _conditions(self, start_date=None, end_date=None, **filters) -> Tuple[List[str], list]:
+        conditions, params = [], []
+        if start_date is not None:
+            conditions.append("date >= ?")
+            params.append(str(pd.Timestamp(start_date).date()))
+        if end_date is not None:
+            conditions.append("date <= ?")
+            params.append(str(pd.Timestamp(end_date).date()))
+        for dimension, value in filters.items():
+            if dimension not in CUBE_DIMENSIONS:
+                raise ValueError(f"Unknown cube dimension: {dimension}")
+            values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+            conditions.append(f"{dimension} IN ({', '.join('?' for _ in values)})")
+            params.extend(values)
+        return conditions, params
+    
+    def slice(self, by: Union[str, List[str]] = None, **filters) -> pd.DataFrame:
+        """Trades, wins, P/L and profit factor of the matching cells, per combination of the `by` dimensions
+        
+        Columns are those of TradeStore.performance_by plus losses; without
+        `by` there is one row for all matching trades.
+        """
+        by = [by] if isinstance(by, str) else list(by or [])
+        for dimension in by:
+            if dimension not in CUBE_DIMENSIONS:
+                raise ValueError(f"Unknown cube dimension: {dimension}")
+        conditions, params = self._conditions(**filters)
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        group = f" GROUP BY {', '.join(by)} ORDER BY {', '.join(by)}" if by else ""
+        frame = self.store.read_sql(f"""
+            SELECT {''.join(f'{dimension}, ' for dimension in by)}
+                   CAST(COALESCE(SUM(trades), 0) AS INTEGER) AS total_trades,
+                   CAST(COALESCE(SUM(wins), 0) AS INTEGER) AS wins,
+                   CAST(COALESCE(SUM(losses), 0) AS INTEGER) AS losses,
+                   COALESCE(SUM(total_pl), 0) AS total_pl,
+                   COALESCE(SUM(gross_profit), 0) AS gross_profit,
+                   COALESCE(SUM(gross_loss), 0) AS gross_loss
+            FROM attribution_cube{where}{group}""", params)
+        if by:
+            frame = frame.set_index(by)
+        
+        frame["avg_pl"] = frame["total_pl"] / frame["total_trades"].replace(0, np.nan)
+        frame["win_rate"] = frame["wins"] / frame["total_trades"].replace(0, np.nan) * 100
+        frame["profit_factor"] = frame["gross_profit"] / frame["gross_loss"].replace(0, np.nan)
+        return frame[["total_trades", "wins", "losses", "total_pl", "avg_pl", "gross_profit", "gross_loss",
+                      "win_rate", "profit_factor"]]
+    
+    def top_trades(self, k: int = 3, worst: bool = False, columns: List[str] = None, **filters) -> pd.DataFrame:
+        """The k best (or worst) trades by gross P/L among the matching cells, best (or worst) first
+        
+        Each cell keeps its ATTRIBUTION_TOP_K best and worst trades. A slice
+        merges the candidates of its cells with a bounded heap rather than
+        sorting every matching trade; without filters the first k candidates
+        are read in order from the rank index.
+        """
+        if k > ATTRIBUTION_TOP_K:
+            raise ValueError(f"The cube keeps only the top {ATTRIBUTION_TOP_K} trades per cell")
+        side = "worst" if worst else "best"
+        conditions, params = self._conditions(**filters)
+        if not conditions:
+            chosen = self.store.read_sql(
+                f"SELECT trade_id FROM cube_top_trades WHERE side = ? ORDER BY {TOP_SIDES[side]} LIMIT ?", [side, k]
+            )["trade_id"].tolist()
+            return self.store.get_trades(chosen, columns)
+        
+        # Matching cells first, then their candidates (the planner would otherwise walk the rank index)
+        candidates = self.store.read_sql(
+            f"SELECT top.trade_id, top.gross_pl FROM attribution_cube "
+            f"JOIN cube_top_trades AS top INDEXED BY cube_top_trades_cell USING (cell) "
+            f"WHERE {' AND '.join(['top.side = ?', *conditions])}", [side, *params]
+        ).itertuples(index=False, name=None)
+        if worst:
+            chosen = heapq.nsmallest(k, candidates, key=lambda row: (row[1], row[0]))
+        else:
+            chosen = heapq.nlargest(k, candidates, key=lambda row: (row[1], row[0]))
+        return self.store.get_trades([trade_id for trade_id, _ in chosen], columns)
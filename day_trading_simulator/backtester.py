@@ -0,0 +1,456 @@
+"""
+Event-driven backtester that replays historical bars through the live trading logic
+"""
+
+import time
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import pandas as pd
+import numpy as np
+from config import *
+from data_feed import MarketDataFeed
+from data_providers import MarketDataProvider, UNKNOWN_METADATA
+from bar_store import market_time_index, period_to_start
+from clock import SimulatedClock
+from indicators import indicator_columns
+from trading_strategies import strategy_parameters
+from portfolio_manager import TradeLedger
+from performance_metrics import equity_curve_metrics, ledger_metrics
+from main_simulator import DayTradingSimulator
+
+logger = logging.getLogger(__name__)
+
+NANOS_PER_DAY = 86_400_000_000_000
+
+class BarHistory:
+    """Full bar and indicator history of one ticker held as NumPy columns
+    
+    Float64 columns of frame are kept as views rather than copies, so bars
+    mapped from shared memory stay shared; indicators are further columns
+    on the same index.
+    """
+    
+    def __init__(self, frame: pd.DataFrame, indicators: pd.DataFrame = None):
+        self.timestamps = market_time_index(frame.index).as_unit("ns").asi8
+        frames = [frame] if indicators is None else [frame, indicators]
+        self.columns = pd.Index([column for part in frames for column in part.columns])
+        self.values = {column: part[column].to_numpy(dtype=np.float64) for part in frames for column in part.columns}
+        self._rolling = {}  # {(column, window, how): full-history rolling values}
+    
+    def rolling(self, column: str, window: int, how: str) -> np.ndarray:
+        """Rolling aggregate over the whole history, computed once per column and window"""
+        key = (column, window, how)
+        values = self._rolling.get(key)
+        if values is None:
+            values = getattr(pd.Series(self.values[column]).rolling(window), how)().to_numpy()
+            self._rolling[key] = values
+        return values
+
+class WindowColumn:
+    """Read-only view of one column of a BarWindow
+    
+    Implements the part of the pandas Series API the strategies use
+    (positional iloc access, slicing, rolling windows and reductions) on top
+    of a slice of a precomputed array. Values before valid_from are NaN, which
+    keeps rolling results inside the window identical to pandas on the slice.
+    """
+    
+    __slots__ = ("_history", "_column", "_values", "_start", "_stop", "_valid_from")
+    
+    def __init__(self, history: BarHistory, column: Optional[str], values: np.ndarray,
+                 start: int, stop: int, valid_from: int):
+        self._history = history
+        self._column = column
+        self._values = values
+        self._start = start
+        self._stop = stop
+        self._valid_from = valid_from
+    
+    @property
+    def iloc(self) -> "WindowColumn":
+        return self
+    
+    def __len__(self) -> int:
+        return self._stop - self._start
+    
+    def __getitem__(self, key):
+        if type(key) is int:
+            position = (self._stop if key < 0 else self._start) + key
+            if not self._start <= position < self._stop:
+                raise IndexError("single positional indexer is out-of-bounds")
+            if position < self._valid_from:
+                return np.nan
+            return self._values[position]
+        
+        start, stop, step = key.indices(len(self))
+        if step != 1:
+            raise ValueError("WindowColumn only supports contiguous slices")
+        return WindowColumn(self._history, self._column, self._values,
+                            self._start + start, self._start + max(start, stop), self._valid_from)
+    
+    def to_numpy(self) -> np.ndarray:
+        values = self._values[self._start:self._stop].copy()
+        values[:max(0, self._valid_from - self._start)] = np.nan
+        return values
+    
+    def _valid(self) -> np.ndarray:
+        values = self._values[max(self._start, self._valid_from):self._stop]
+        return values[~np.isnan(values)]
+    
+    def mean(self) -> float:
+        values = self._valid()
+        return values.mean() if len(values) else np.nan
+    
+    def max(self) -> float:
+        values = self._valid()
+        return values.max() if len(values) else np.nan
+    
+    def min(self) -> float:
+        values = self._valid()
+        return values.min() if len(values) else np.nan
+    
+    def sum(self) -> float:
+        return self._valid().sum()
+    
+    def rolling(self, window: int) -> "WindowRolling":
+        return WindowRolling(self, window)
+
+class WindowRolling:
+    """Rolling window over a WindowColumn, served from the cached full-history aggregate"""
+    
+    __slots__ = ("_column", "_window")
+    
+    def __init__(self, column: WindowColumn, window: int):
+        self._column = column
+        self._window = window
+    
+    def _aggregate(self, how: str) -> WindowColumn:
+        column = self._column
+        if column._column is not None:
+            values = column._history.rolling(column._column, self._window, how)
+        else:
+            values = getattr(pd.Series(column._values).rolling(self._window), how)().to_numpy()
+        # pandas only has a full window once window - 1 earlier bars are inside the slice
+        valid_from = max(column._valid_from, column._start + self._window - 1)
+        return WindowColumn(column._history, None, values, column._start, column._stop, valid_from)
+    
+    def mean(self) -> WindowColumn:
+        return self._aggregate("mean")
+    
+    def max(self) -> WindowColumn:
+        return self._aggregate("max")
+    
+    def min(self) -> WindowColumn:
+        return self._aggregate("min")
+    
+    def sum(self) -> WindowColumn:
+        return self._aggregate("sum")
+    
+    def std(self) -> WindowColumn:
+        return self._aggregate("std")
+
+class BarWindow:
+    """Zero-copy, DataFrame-like view of the bars a live feed would return at one point in time"""
+    
+    __slots__ = ("_history", "_start", "_stop")
+    
+    def __init__(self, history: BarHistory, start: int, stop: int):
+        self._history = history
+        self._start = start
+        self._stop = stop
+    
+    def __len__(self) -> int:
+        return self._stop - self._start
+    
+    @property
+    def empty(self) -> bool:
+        return self._stop <= self._start
+    
+    @property
+    def columns(self) -> pd.Index:
+        return self._history.columns
+    
+    def __getitem__(self, column: str) -> WindowColumn:
+        return WindowColumn(self._history, column, self._history.values[column],
+                            self._start, self._stop, self._start)
+    
+    @property
+    def index(self) -> pd.DatetimeIndex:
+        return pd.DatetimeIndex(self._history.timestamps[self._start:self._stop].view("datetime64[ns]"))
+    
+    def to_frame(self) -> pd.DataFrame:
+        """Materialize the window as a regular DataFrame"""
+        return pd.DataFrame({column: values[self._start:self._stop]
+                             for column, values in self._history.values.items()},
+                            index=self.index, copy=False)
+
+class HistoricalDataFeed(MarketDataFeed):
+    """Market data feed that serves preloaded history as of the simulated time
+    
+    All bars (plus a warm-up period) are loaded once and their indicators are
+    computed over the whole history, so every history request during the run
+    is an O(1) BarWindow over the same arrays. Every request is answered from
+    the backtest interval's bars, and the current price is the close of the
+    latest bar at or before the current time.
+    """
+    
+    def __init__(self, tickers: List[str] = None, provider: MarketDataProvider = None,
+                 clock: SimulatedClock = None, interval: str = BACKTEST_INTERVAL,
+                 start: datetime = None, end: datetime = None, params: Dict = None,
+                 bars: Dict[str, pd.DataFrame] = None, metadata: Dict[str, Dict] = None):
+        super().__init__(tickers, provider, clock)
+        self.interval = interval
+        self.params = strategy_parameters(params)
+        self.histories = {}  # {ticker: BarHistory}
+        self.cursors = {}  # {ticker: number of bars at or before the current time}
+        self.now_ns = None
+        self.timeline = np.empty(0, dtype=np.int64)
+        self._positions = {}  # {ticker: cursor value at each timeline step}
+        self._period_nanos = {}  # {period: length in nanoseconds}
+        self._windows = {}  # {(ticker, period): BarWindow} for the current step
+        if bars is None:
+            bars = load_backtest_bars(self.provider, self.tickers, interval, start, end)
+        self._load(bars, start)
+        # Metadata is static over a backtest, so it is loaded once up front
+        if metadata is None:
+            metadata = load_backtest_metadata(self.provider, self.tickers)
+        self.ticker_metadata = metadata
+        self.metadata_date = self.clock.today()
+    
+    def _load(self, bars: Dict[str, pd.DataFrame], start: datetime):
+        """Compute indicators once per ticker and build the union timeline from start on"""
+        for ticker in list(self.tickers):
+            if ticker not in bars:
+                continue
+            # The bars may be views into a sweep's shared memory; only the indicators are new arrays
+            indicators = indicator_columns(bars[ticker], self.params["MACD_FAST"], self.params["MACD_SLOW"],
+                                           self.params["MACD_SIGNAL"])
+            self.histories[ticker] = BarHistory(bars[ticker], indicators)
+        
+        start = pd.Timestamp(start) if start is not None else None
+        self.tickers = [ticker for ticker in self.tickers if ticker in self.histories]
+        if not self.histories:
+            return
+        
+        timeline = np.unique(np.concatenate([history.timestamps for history in self.histories.values()]))
+        if start is not None:
+            timeline = timeline[timeline >= start.value]
+        self.timeline = timeline
+        
+        # Cursor of every ticker at every step, so advancing is a column lookup
+        for ticker, history in self.histories.items():
+            self._positions[ticker] = np.searchsorted(history.timestamps, timeline, side="right")
+            self.cursors[ticker] = 0
+    
+    def advance(self, step: int) -> List[str]:
+        """Move to a timeline step, returning the tickers that printed a new bar"""
+        self.now_ns = int(self.timeline[step])
+        self._windows.clear()
+        updated = []
+        for ticker, positions in self._positions.items():
+            position = int(positions[step])
+            if position != self.cursors[ticker]:
+                self.cursors[ticker] = position
+                updated.append(ticker)
+        return updated
+    
+    def start_feed(self):
+        """Bars are replayed by the backtest engine; there is nothing to poll"""
+        pass
+    
+    def refresh(self):
+        pass
+    
+    def is_market_open(self) -> bool:
+        # The engine only steps through timestamps at which bars exist
+        return True
+    
+    def get_current_price(self, ticker: str) -> Optional[float]:
+        position = self.cursors.get(ticker, 0)
+        if position == 0:
+            return None
+        return float(self.histories[ticker].values['Close'][position - 1])
+    
+    def get_historical_data(self, ticker: str, period: str = "30d", interval: str = "1d") -> BarWindow:
+        """Bars of the last period up to the current time, as a BarWindow"""
+        window = self._windows.get((ticker, period))
+        if window is not None:
+            return window
+        
+        history = self.histories.get(ticker)
+        if history is None or self.now_ns is None:
+            return BarWindow(_EMPTY_HISTORY, 0, 0)
+        
+        stop = self.cursors[ticker]
+        start = int(history.timestamps[:stop].searchsorted(self._period_start(period), side="left"))
+        window = self._windows[(ticker, period)] = BarWindow(history, start, stop)
+        return window
+    
+    def _period_start(self, period: str) -> int:
+        """Start of a period ending at the current time, in nanoseconds"""
+        nanos = self._period_nanos.get(period)
+        if nanos is not None:
+            return self.now_ns - nanos
+        if period.endswith("d") and period[:-1].isdigit():
+            self._period_nanos[period] = int(period[:-1]) * NANOS_PER_DAY
+            return self.now_ns - self._period_nanos[period]
+        
+        start = period_to_start(period, pd.Timestamp(self.now_ns))
+        if start is None:
+            return np.iinfo(np.int64).min
+        return start.tz_localize(None).value
+
+def backtest_range(start_date, end_date) -> tuple:
+    """Start and end datetimes of a backtest; a date-only end includes that whole day"""
+    end = pd.Timestamp(end_date)
+    end = end + timedelta(days=1) - timedelta(microseconds=1) if end == end.normalize() else end
+    return pd.Timestamp(start_date).to_pydatetime(), end.to_pydatetime()
+
+def load_backtest_bars(provider: MarketDataProvider, tickers: List[str], interval: str,
+                       start: datetime = None, end: datetime = None) -> Dict[str, pd.DataFrame]:
+    """OHLCV bars per ticker from BACKTEST_WARMUP_DAYS before start up to end, in market time
+    
+    Tickers without bars are skipped; if none of them has any, this raises
+    ValueError rather than letting the backtest run on an empty timeline.
+    """
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+    warmup_start = start - timedelta(days=BACKTEST_WARMUP_DAYS) if start is not None else None
+    if end is not None:
+        provider.set_time(end.tz_localize(MARKET_TIMEZONE))
+    
+    result = {}
+    for ticker in tickers:
+        try:
+            bars = provider.get_history(ticker, interval, start=warmup_start)
+        except Exception as e:
+            logger.error(f"Error loading backtest history for {ticker}: {e}")
+            continue
+        if bars is None or bars.empty:
+            logger.warning(f"No {interval} history for {ticker}, skipping it")
+            continue
+        
+        bars = bars[["Open", "High", "Low", "Close", "Volume"]].copy()
+        bars.index = market_time_index(bars.index)
+        if end is not None:
+            bars = bars[bars.index <= end]
+        result[ticker] = bars
+    
+    if tickers and not result:
+        raise ValueError(f"No {interval} bars could be loaded for any of the {len(tickers)} backtest tickers")
+    return result
+
+def load_backtest_metadata(provider: MarketDataProvider, tickers: List[str]) -> Dict[str, Dict]:
+    """Static metadata (sector, industry, market cap) per ticker, loaded once before a backtest"""
+    result = {}
+    for ticker in tickers:
+        try:
+            result[ticker] = provider.get_metadata(ticker)
+        except Exception as e:
+            logger.error(f"Error fetching metadata for {ticker}: {e}")
+            result[ticker] = dict(UNKNOWN_METADATA)
+    return result
+
+_EMPTY_HISTORY = BarHistory(pd.DataFrame(columns=["Open", "High", "Low", "Close", "Volume"], dtype=float))
+
+@dataclass
+class BacktestResult:
+    trades: TradeLedger  # Indexing and iterating give Trade records
+    equity_curve: pd.Series
+    stats: Dict = field(default_factory=dict)
+    
+    def trades_frame(self) -> pd.DataFrame:
+        return self.trades.to_frame()
+
+class BacktestEngine(DayTradingSimulator):
+    """Replays historical bars through the simulator's own trading logic
+    
+    Each timeline step sets the simulated clock to the bar time, updates open
+    positions (stop, target and strategy exits) and scans for new trades
+    exactly as the live loop does, without sleeping or touching the network.
+    Closed trades go to an in-memory ledger and equity is marked to market
+    after every step.
+    """
+    
+    def __init__(self, start_date, end_date, tickers: List[str] = None,
+                 interval: str = BACKTEST_INTERVAL, provider: MarketDataProvider = None,
+                 initial_capital: float = INITIAL_PORTFOLIO_VALUE, params: Dict = None,
+                 bars: Dict[str, pd.DataFrame] = None, metadata: Dict[str, Dict] = None):
+        self.start, self.end = backtest_range(start_date, end_date)
+        self.interval = interval
+        self.ledger = TradeLedger()
+        
+        clock = SimulatedClock(self.start)
+        feed = HistoricalDataFeed(tickers, provider, clock, interval, self.start, self.end, params, bars,
+                                  metadata)
+        # Bars are already in memory, so scanning on threads would only add overhead
+        super().__init__(initial_capital, clock=clock, data_feed=feed, excel_logger=self.ledger,
+                         strategy_params=params, scan_workers=1)
+    
+    def run(self) -> BacktestResult:
+        """Run the backtest over every bar in the date range"""
+        timeline = self.data_feed.timeline
+        equity = np.empty(len(timeline))
+        bars = 0
+        started = time.perf_counter()
+        
+        logger.info(f"Backtesting {len(self.data_feed.tickers)} tickers on {self.interval} bars "
+                    f"from {self.start:%Y-%m-%d} to {self.end:%Y-%m-%d} ({len(timeline)} steps)")
+        
+        for step in range(len(timeline)):
+            self.clock.set_time(pd.Timestamp(int(timeline[step])).to_pydatetime())
+            bars += len(self.data_feed.advance(step))
+            
+            if self.clock.today() != self.tracking_date:
+                self._reset_daily_tracking()
+            
+            self._sample_correlations()
+            self._update_positions()
+            self._scan_for_opportunities()
+            equity[step] = self.portfolio_manager.get_equity(self.data_feed)
+        
+        # Anything still open is closed at the last price so the ledger is complete
+        self.force_close_all_positions()
+        if len(equity):
+            equity[-1] = self.portfolio_manager.get_equity(self.data_feed)
+        
+        elapsed = time.perf_counter() - started
+        equity_curve = pd.Series(equity, index=pd.DatetimeIndex(timeline.view("datetime64[ns]")),
+                                 name="Equity")
+        stats = self._compute_stats(equity_curve, bars, elapsed)
+        logger.info(f"Backtest finished: {stats['total_trades']} trades, "
+                    f"return {stats['total_return']:.2%}, {stats['bars_per_second']:,.0f} bars/s")
+        
+        return BacktestResult(trades=self.ledger, equity_curve=equity_curve, stats=stats)
+    
+    def _compute_stats(self, equity_curve: pd.Series, bars: int, elapsed: float) -> Dict:
+        summary = self.portfolio_manager.get_portfolio_summary()
+        initial = self.portfolio_manager.initial_capital
+        final = equity_curve.iloc[-1] if len(equity_curve) else initial
+        metrics = equity_curve_metrics(equity_curve, initial)
+        trades = ledger_metrics(self.ledger.to_frame(), initial, timeline=equity_curve.index.to_numpy())
+        
+        return {
+            "start": self.start,
+            "end": self.end,
+            "interval": self.interval,
+            "tickers": len(self.data_feed.tickers),
+            "bars": bars,
+            "elapsed_seconds": elapsed,
+            "bars_per_second": bars / elapsed if elapsed > 0 else 0.0,
+            "initial_equity": initial,
+            "final_equity": final,
+            "total_return": final / initial - 1,
+            "max_drawdown": metrics["max_drawdown"],
+            "max_drawdown_days": metrics["max_drawdown_days"],
+            "sharpe_ratio": metrics["sharpe_ratio"],
+            "sortino_ratio": metrics["sortino_ratio"],
+            "calmar_ratio": metrics["calmar_ratio"],
+            "exposure": trades["exposure"],
+            "turnover": trades["turnover"],
+            "total_trades": summary["total_trades"],
+            "win_rate": summary["win_rate"],
+            "net_profit": summary["net_profit"]
+        }
@@ -0,0 +1,285 @@
+"""
+Append-only columnar OHLCV store backed by memory-mapped NumPy arrays
+"""
+
+import os
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+import pandas as pd
+import numpy as np
+from config import *
+
+logger = logging.getLogger(__name__)
+
+BAR_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+TIMESTAMP_FILE = "timestamp.i8"
+PENDING_FILE = "pending.npz"
+
+class BarStore:
+    """On-disk bar history, one directory of raw column files per ticker and interval
+    
+    Completed bars are appended to flat binary files (int64 UTC nanosecond
+    timestamps plus one float64 file per OHLCV column) and read back through
+    np.memmap, so range reads are zero-copy slices of the page cache. Bars
+    that may still be forming are kept in a small, overwritable pending file
+    together with the time the series was last synced from the network.
+    """
+    
+    def __init__(self, root: str = None):
+        self.root = root or os.path.join(DATA_DIR, BAR_STORE_DIR)
+        self._maps = {}  # {(ticker, interval): (row_count, {column: memmap})}
+        self._pending = {}  # {(ticker, interval): (file signature, frame, synced_at)}
+        self._lock = threading.Lock()
+    
+    def _series_dir(self, ticker: str, interval: str) -> str:
+        return os.path.join(self.root, interval, ticker)
+    
+    def _row_count(self, directory: str) -> int:
+        """Number of complete rows (a torn append leaves columns of different lengths)"""
+        sizes = []
+        for name, dtype in self._column_files():
+            path = os.path.join(directory, name)
+            if not os.path.exists(path):
+                return 0
+            sizes.append(os.path.getsize(path) // np.dtype(dtype).itemsize)
+        return min(sizes)
+    
+    def _column_files(self):
+        yield TIMESTAMP_FILE, np.int64
+        for column in BAR_COLUMNS:
+            yield f"{column}.f8", np.float64
+    
+    def _columns(self, ticker: str, interval: str) -> Tuple[int, Dict[str, np.ndarray]]:
+        """Memory-map the column files for a series, remapping when they have grown"""
+        directory = self._series_dir(ticker, interval)
+        rows = self._row_count(directory)
+        key = (ticker, interval)
+        
+        with self._lock:
+            cached = self._maps.get(key)
+            if cached is not None and cached[0] == rows:
+                return cached
+            
+            arrays = {}
+            for name, dtype in self._column_files():
+                column = name.split(".")[0]
+                if rows == 0:
+                    arrays[column] = np.empty(0, dtype=dtype)
+                else:
+                    arrays[column] = np.memmap(os.path.join(directory, name), dtype=dtype,
+                                               mode="r", shape=(rows,))
+            self._maps[key] = (rows, arrays)
+            return rows, arrays
+    
+    def last_timestamp(self, ticker: str, interval: str) -> Optional[pd.Timestamp]:
+        """Timestamp of the newest completed bar on disk"""
+        rows, arrays = self._columns(ticker, interval)
+        if rows == 0:
+            return None
+        return pd.Timestamp(int(arrays["timestamp"][-1]), tz="UTC")
+    
+    def first_timestamp(self, ticker: str, interval: str) -> Optional[pd.Timestamp]:
+        """Timestamp of the oldest completed bar on disk"""
+        rows, arrays = self._columns(ticker, interval)
+        if rows == 0:
+            return None
+        return pd.Timestamp(int(arrays["timestamp"][0]), tz="UTC")
+    
+    def append(self, ticker: str, interval: str, bars: pd.DataFrame) -> int:
+        """Append completed bars newer than the last stored one, returning the number written"""
+        if bars.empty:
+            return 0
+        
+        timestamps = _to_utc_nanos(bars.index)
+        last = self.last_timestamp(ticker, interval)
+        if last is not None:
+            newer = timestamps > last.value
+            bars = bars[newer]
+            timestamps = timestamps[newer]
+        if bars.empty:
+            return 0
+        
+        directory = self._series_dir(ticker, interval)
+        os.makedirs(directory, exist_ok=True)
+        rows = self._row_count(directory)
+        
+        with self._lock:
+            self._truncate(directory, rows)
+            with open(os.path.join(directory, TIMESTAMP_FILE), "ab") as f:
+                f.write(np.ascontiguousarray(timestamps, dtype=np.int64).tobytes())
+            for column in BAR_COLUMNS:
+                values = bars[column].to_numpy(dtype=np.float64) if column in bars else np.zeros(len(bars))
+                with open(os.path.join(directory, f"{column}.f8"), "ab") as f:
+                    f.write(np.ascontiguousarray(values).tobytes())
+        
+        return len(bars)
+    
+    def backfill(self, ticker: str, interval: str, bars: pd.DataFrame) -> int:
+        """Merge bars older than the stored history by rewriting the series files
+
+        Appends are the normal path; this is only needed when a longer period
+        is requested than has ever been downloaded for the series.
+        """
+        first = self.first_timestamp(ticker, interval)
+        if first is None:
+            return self.append(ticker, interval, bars)
+
+        older = bars[_to_utc_nanos(bars.index) < first.value]
+        if older.empty:
+            return 0
+
+        stored = self.read(ticker, interval, include_pending=False)
+        merged = pd.concat([older[BAR_COLUMNS].tz_convert(MARKET_TIMEZONE), stored])
+
+        directory = self._series_dir(ticker, interval)
+        temp_dir = directory + ".tmp"
+        os.makedirs(temp_dir, exist_ok=True)
+        merged_ns = _to_utc_nanos(merged.index)
+        with open(os.path.join(temp_dir, TIMESTAMP_FILE), "wb") as f:
+            f.write(merged_ns.tobytes())
+        for column in BAR_COLUMNS:
+            with open(os.path.join(temp_dir, f"{column}.f8"), "wb") as f:
+                f.write(np.ascontiguousarray(merged[column].to_numpy(dtype=np.float64)).tobytes())
+
+        with self._lock:
+            for name, _ in self._column_files():
+                os.replace(os.path.join(temp_dir, name), os.path.join(directory, name))
+            self._maps.pop((ticker, interval), None)
+        os.rmdir(temp_dir)
+
+        return len(older)
+
+    def _truncate(self, directory: str, rows: int):
+        """Drop any partial tail left behind by an interrupted append"""
+        for name, dtype in self._column_files():
+            path = os.path.join(directory, name)
+            size = rows * np.dtype(dtype).itemsize
+            if os.path.exists(path) and os.path.getsize(path) != size:
+                with open(path, "r+b") as f:
+                    f.truncate(size)
+    
+    def read(self, ticker: str, interval: str, start=None, end=None,
+             include_pending: bool = True) -> pd.DataFrame:
+        """Read bars in [start, end] as a DataFrame whose columns view the memory maps"""
+        rows, arrays = self._columns(ticker, interval)
+        timestamps = arrays["timestamp"]
+        start_ns = None if start is None else _to_utc_nanos([start])[0]
+        end_ns = None if end is None else _to_utc_nanos([end])[0]
+        
+        lo = 0 if start_ns is None else int(np.searchsorted(timestamps, start_ns, side="left"))
+        hi = rows if end_ns is None else int(np.searchsorted(timestamps, end_ns, side="right"))
+        
+        index = pd.DatetimeIndex(timestamps[lo:hi].view("datetime64[ns]")).tz_localize("UTC")
+        frame = pd.DataFrame({column: arrays[column][lo:hi] for column in BAR_COLUMNS},
+                             index=index, copy=False)
+        
+        if include_pending:
+            pending, _ = self.read_pending(ticker, interval)
+            pending_ns = _to_utc_nanos(pending.index)
+            keep = np.ones(len(pending), dtype=bool)
+            if rows:
+                keep &= pending_ns > timestamps[-1]
+            if start_ns is not None:
+                keep &= pending_ns >= start_ns
+            if end_ns is not None:
+                keep &= pending_ns <= end_ns
+            if keep.any():
+                frame = pd.concat([frame, pending[keep]])
+        
+        frame.index = frame.index.tz_convert(MARKET_TIMEZONE)
+        return frame
+    
+    def write_pending(self, ticker: str, interval: str, bars: pd.DataFrame,
+                      synced_at: datetime = None):
+        """Replace the still-forming bars of a series and record when it was synced"""
+        directory = self._series_dir(ticker, interval)
+        os.makedirs(directory, exist_ok=True)
+        synced_at = synced_at or datetime.now()
+        
+        payload = {column: bars[column].to_numpy(dtype=np.float64) for column in BAR_COLUMNS if column in bars}
+        payload["timestamp"] = _to_utc_nanos(bars.index)
+        payload["synced_at"] = np.array([pd.Timestamp(synced_at).value], dtype=np.int64)
+        
+        # Write then rename so readers never see a half-written pending file
+        temp_path = os.path.join(directory, "pending.tmp.npz")
+        np.savez(temp_path, **payload)
+        os.replace(temp_path, os.path.join(directory, PENDING_FILE))
+    
+    def read_pending(self, ticker: str, interval: str) -> Tuple[pd.DataFrame, Optional[datetime]]:
+        """Get the still-forming bars of a series and the time it was last synced"""
+        path = os.path.join(self._series_dir(ticker, interval), PENDING_FILE)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return pd.DataFrame(columns=BAR_COLUMNS), None
+
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = self._pending.get((ticker, interval))
+        if cached is not None and cached[0] == signature:
+            return cached[1], cached[2]
+
+        try:
+            with np.load(path) as payload:
+                index = pd.DatetimeIndex(payload["timestamp"].view("datetime64[ns]")).tz_localize("UTC")
+                frame = pd.DataFrame({column: payload[column] for column in BAR_COLUMNS if column in payload},
+                                     index=index)
+                synced_at = pd.Timestamp(int(payload["synced_at"][0])).to_pydatetime()
+        except Exception as e:
+            logger.error(f"Error reading pending bars for {ticker} {interval}: {e}")
+            return pd.DataFrame(columns=BAR_COLUMNS), None
+
+        self._pending[(ticker, interval)] = (signature, frame, synced_at)
+        return frame, synced_at
+
+def _to_utc_nanos(index) -> np.ndarray:
+    """Convert timestamps (naive ones are taken as market time) to int64 UTC nanoseconds"""
+    index = pd.DatetimeIndex(index)
+    if index.tz is None:
+        index = index.tz_localize(MARKET_TIMEZONE)
+    return index.tz_convert("UTC").as_unit("ns").asi8
+
+def market_time_index(index) -> pd.DatetimeIndex:
+    """Naive market-local timestamps, the time base of the simulator's clocks"""
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_convert(MARKET_TIMEZONE).tz_localize(None)
+    return index
+
+def interval_to_timedelta(interval: str) -> pd.Timedelta:
+    """Length of one bar for a yfinance interval string such as '1m', '1h' or '1d'"""
+    units = {"m": "min", "h": "h", "d": "D", "wk": "W", "mo": "D"}
+    for suffix in ("wk", "mo", "m", "h", "d"):
+        if interval.endswith(suffix):
+            count = int(interval[:-len(suffix)])
+            if suffix == "mo":
+                count *= 31
+            return pd.Timedelta(count, unit=units[suffix])
+    raise ValueError(f"Unsupported interval: {interval}")
+
+def period_to_start(period: str, now: datetime) -> Optional[pd.Timestamp]:
+    """Start of a yfinance period string such as '5d' or '1mo', or None for 'max'/'ytd'"""
+    now = pd.Timestamp(now)
+    if now.tz is None:
+        now = now.tz_localize(MARKET_TIMEZONE)
+    for suffix, offset in (("d", "days"), ("wk", "weeks"), ("mo", "months"), ("y", "years")):
+        if period.endswith(suffix) and period[:-len(suffix)].isdigit():
+            return now - pd.DateOffset(**{offset: int(period[:-len(suffix)])})
+    return None
+
+def window_starts(timestamps: np.ndarray, period: str) -> np.ndarray:
+    """Index of the first bar in the trailing period window ending at each bar
+    
+    timestamps are naive market-local nanoseconds; each window starts where a
+    history request for the period made at that bar's time would start.
+    """
+    if period.endswith("d") and period[:-1].isdigit():
+        starts = timestamps - pd.Timedelta(days=int(period[:-1])).value
+    else:
+        starts = np.array([_period_start_nanos(period, timestamp) for timestamp in timestamps], dtype=np.int64)
+    return np.searchsorted(timestamps, starts, side="left")
+
+def _period_start_nanos(period: str, timestamp: int) -> int:
+    start = period_to_start(period, pd.Timestamp(timestamp))
+    return np.iinfo(np.int64).min if start is None else start.tz_localize(None).value
@@ -0,0 +1,122 @@
+"""
+Headless chart rendering in a process pool, skipping charts whose data has not changed
+"""
+
+import os
+import json
+import hashlib
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+import pandas as pd
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from config import *
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "charts.json"  # Content hash of each chart in the chart directory
+RENDER_VERSION = 1  # Part of every content hash; bump when the drawing code changes
+
+@dataclass
+class ChartSpec:
+    """One chart: what to draw and the data it is drawn from"""
+    name: str  # File name, without .png
+    kind: str  # "line", "barh" or "hist"
+    data: pd.Series  # x (or categories, or histogram values) in the index, y (or weights) in the values
+    title: str
+    xlabel: str = ""
+    ylabel: str = ""
+    style: Dict = field(default_factory=dict)  # Keyword arguments of the plotting call
+    
+    def content_hash(self, dpi: int = CHART_DPI, size: Tuple[float, float] = CHART_SIZE) -> str:
+        """Hash of everything the image depends on"""
+        digest = hashlib.sha256()
+        digest.update(repr((RENDER_VERSION, self.kind, self.title, self.xlabel, self.ylabel,
+                            sorted(self.style.items()), dpi, tuple(size))).encode())
+        digest.update(repr((self.data.index.dtype, self.data.dtype, len(self.data))).encode())
+        digest.update(pd.util.hash_pandas_object(self.data, index=True).to_numpy().tobytes())
+        return digest.hexdigest()
+
+def _draw(spec: ChartSpec, axes):
+    if spec.kind == "line":
+        axes.plot(spec.data.index, spec.data.values, **spec.style)
+    elif spec.kind == "barh":
+        axes.barh(spec.data.index, spec.data.values, **spec.style)
+    elif spec.kind == "hist":
+        axes.hist(spec.data.index, weights=spec.data.values, **spec.style)
+    else:
+        raise ValueError(f"Unknown chart kind: {spec.kind}")
+    axes.set_title(spec.title)
+    axes.set_xlabel(spec.xlabel)
+    axes.set_ylabel(spec.ylabel)
+    axes.grid(True, alpha=0.3)
+
+def render_chart(spec: ChartSpec, path: str, dpi: int = CHART_DPI, size: Tuple[float, float] = CHART_SIZE) -> str:
+    """Draw one chart to a PNG with the Agg canvas, without pyplot or its global state"""
+    figure = Figure(figsize=size)
+    FigureCanvasAgg(figure)
+    _draw(spec, figure.add_subplot())
+    figure.tight_layout()
+    # Written beside the target and moved over it, so a reader never sees half a file
+    temporary = f"{path}.tmp.png"
+    figure.savefig(temporary, dpi=dpi)
+    os.replace(temporary, path)
+    return path
+
+def render_charts(specs: List[ChartSpec], directory: str = CHART_DIR, dpi: int = CHART_DPI,
+                  size: Tuple[float, float] = CHART_SIZE,
+                  max_workers: int = CHART_MAX_WORKERS) -> Tuple[Dict[str, str], List[str]]:
+    """Render the charts whose data changed since the last run into directory, in parallel
+    
+    Each chart's content hash is kept in a manifest beside the images; a
+    chart is only drawn again when its hash differs or its file is missing.
+    Several stale charts are drawn in a process pool, a single one in this
+    process. Returns the path of every chart and the names of those drawn.
+    """
+    os.makedirs(directory, exist_ok=True)
+    manifest_path = os.path.join(directory, MANIFEST_FILE)
+    try:
+        with open(manifest_path, encoding="utf-8") as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        manifest = {}
+    
+    paths = {spec.name: os.path.join(directory, f"{spec.name}.png") for spec in specs}
+    hashes = {spec.name: spec.content_hash(dpi, size) for spec in specs}
+    stale = [spec for spec in specs
+             if manifest.get(spec.name) != hashes[spec.name] or not os.path.exists(paths[spec.name])]
+    
+    workers = min(max_workers or os.cpu_count() or 1, len(stale))
+    rendered = []
+    if workers > 1:
+        with ProcessPoolExecutor(workers) as pool:
+            futures = {spec.name: pool.submit(render_chart, spec, paths[spec.name], dpi, size) for spec in stale}
+            for name, future in futures.items():
+                try:
+                    future.result()
+                    rendered.append(name)
+                except Exception as e:
+                    logger.error(f"Error rendering chart {name}: {e}")
+    else:
+        for spec in stale:
+            try:
+                render_chart(spec, paths[spec.name], dpi, size)
+                rendered.append(spec.name)
+            except Exception as e:
+                logger.error(f"Error rendering chart {spec.name}: {e}")
+    
+    # Charts that failed keep no hash, so the next run draws them again
+    for spec in stale:
+        if spec.name in rendered:
+            manifest[spec.name] = hashes[spec.name]
+        else:
+            manifest.pop(spec.name, None)
+    with open(f"{manifest_path}.tmp", "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(f"{manifest_path}.tmp", manifest_path)
+    
+    logger.info(f"Rendered {len(rendered)} of {len(specs)} charts"
+                f"{f' with {workers} workers' if workers > 1 else ''}; {len(specs) - len(stale)} unchanged")
+    return paths, rendered
@@ -0,0 +1,82 @@
+"""
+Injectable clocks so the simulator can run on wall-clock or simulated time
+"""
+
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, date
+from typing import Optional
+from config import *
+
+class Clock(ABC):
+    """Source of the current time and of waiting"""
+    
+    is_simulated = False
+    
+    @abstractmethod
+    def now(self) -> datetime:
+        """Current (possibly simulated) local market time"""
+        pass
+    
+    @abstractmethod
+    def sleep(self, seconds: float):
+        """Let the given number of seconds pass"""
+        pass
+    
+    def today(self) -> date:
+        return self.now().date()
+
+class WallClock(Clock):
+    """Real time: now() is datetime.now() and sleep() blocks"""
+    
+    def now(self) -> datetime:
+        return datetime.now()
+    
+    def sleep(self, seconds: float):
+        time.sleep(seconds)
+
+class SimulatedClock(Clock):
+    """Virtual time that only moves when the simulator sleeps or advances it
+    
+    With step_seconds set (fixed-step mode) every sleep() moves time forward by
+    exactly one step, so each loop iteration lands on the next bar. Otherwise
+    sleep() moves time by the requested amount. speed is virtual seconds per
+    real second; None runs as fast as possible without ever blocking.
+    """
+    
+    is_simulated = True
+    
+    def __init__(self, start: datetime = None, step_seconds: Optional[float] = None,
+                 speed: Optional[float] = None):
+        self._now = start or datetime.now()
+        self.step = timedelta(seconds=step_seconds) if step_seconds else None
+        self.speed = speed
+    
+    def now(self) -> datetime:
+        return self._now
+    
+    def sleep(self, seconds: float):
+        delta = self.step or timedelta(seconds=seconds)
+        self.advance(delta)
+        if self.speed:
+            time.sleep(delta.total_seconds() / self.speed)
+    
+    def advance(self, delta: timedelta = None):
+        """Move time forward by delta, or by one step in fixed-step mode"""
+        self._now += delta if delta is not None else (self.step or timedelta(minutes=1))
+    
+    def set_time(self, timestamp: datetime):
+        """Jump to a point in time (never backwards)"""
+        if timestamp > self._now:
+            self._now = timestamp
+
+def create_clock(mode: str = None, start: datetime = None) -> Clock:
+    """Build a clock: "wall", "fixed" (one CLOCK_STEP_SECONDS step per sleep) or "fast" """
+    mode = mode or CLOCK_MODE
+    if mode == "wall":
+        return WallClock()
+    if mode == "fixed":
+        return SimulatedClock(start, step_seconds=CLOCK_STEP_SECONDS, speed=CLOCK_SPEED)
+    if mode == "fast":
+        return SimulatedClock(start)
+    raise ValueError(f"Unknown clock mode: {mode}")
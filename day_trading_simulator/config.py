@@ -23,19 +23,79 @@ MIN_TRADE_DURATION = 5  # Minimum minutes to hold a position
 MAX_TRADE_DURATION = 240  # Maximum minutes to hold a position (4 hours)
 
 # Risk Management
-MAX_CORRELATED_POSITIONS = 3  # Max positions in same sector
+MAX_CORRELATED_POSITIONS = 3  # Max positions in the same sector or correlated with the new ticker
+CORRELATION_THRESHOLD = 0.8  # Return correlation at which two tickers count as correlated
+CORRELATION_WINDOW = 60  # Price samples (feed refreshes, or bars in backtests) in the rolling correlation
 MAX_TOTAL_POSITIONS = 10  # Maximum concurrent positions
 
 # Data Settings
 DATA_REFRESH_INTERVAL = 30  # seconds
 HISTORICAL_DAYS = 30  # Days of historical data to load
+HISTORICAL_CACHE_TTL = 300  # seconds a cached history frame stays fresh
+HISTORICAL_CACHE_SIZE = 128  # Max (ticker, period, interval) frames held in memory
+INTRADAY_INTERVAL = "1m"  # Bar size of the realtime feed
+INDICATOR_SEED_PERIOD = "5d"  # Intraday history used to warm up streaming indicators
+MARKET_TIMEZONE = "America/New_York"  # Exchange timezone for stored bar timestamps
+STORE_COVERAGE_SLACK_DAYS = 4  # Stored history may start this late (weekends/holidays) and still count as covering a period
+
+# Market Data Provider
+DATA_PROVIDER = "yfinance"  # "yfinance", "replay" (recorded CSV/Parquet files) or "synthetic"
+SYNTHETIC_SEED = 42  # Random seed for the synthetic provider
+SYNTHETIC_DAYS = 30  # Trading sessions generated by the synthetic provider
+SYNTHETIC_BARS_PER_SESSION = 390  # Minute bars per synthetic session (09:30-16:00)
+
+# Simulation Clock
+CLOCK_MODE = "wall"  # "wall" (real time), "fixed" (data polled once per step) or "fast" (sleeps are instant)
+CLOCK_STEP_SECONDS = 60  # Virtual seconds per step in "fixed" mode
+CLOCK_SPEED = None  # Virtual seconds per real second in "fixed" mode (None = as fast as possible)
+DAILY_RESET_TIME = "00:01"  # When the per-strategy daily trade quotas reset
+POSITION_SWEEP_INTERVAL = 60  # Seconds between checks of every open position (price ticks check their own ticker at once)
+
+# Backtesting
+BACKTEST_INTERVAL = "1d"  # Bar size replayed by the backtester
+BACKTEST_WARMUP_DAYS = 30  # History loaded before the start date so lookback windows are full
+
+# Performance Metrics
+PERIODS_PER_YEAR = 252  # Trading days per year, for annualizing daily returns
+RISK_FREE_RATE = 0.0  # Annual risk-free rate subtracted in the Sharpe and Sortino ratios
+
+# Parameter Sweeps
+SWEEP_MAX_WORKERS = None  # Backtest processes; None uses every CPU
+SWEEP_RANK_METRIC = "total_return"  # Backtest statistic the results table is ranked by
+SWEEP_SEED = 42  # Seed for random-search sampling
+
+# Report Charts
+CHART_DIR = "charts"  # analyze_results charts, with the content hashes that decide which to redraw
+CHART_DPI = 300
+CHART_SIZE = (7.5, 5)  # Inches per chart
+CHART_MAX_WORKERS = None  # Chart rendering processes; None uses every CPU
+
+# Opportunity Scanning
+SCAN_MAX_WORKERS = 8  # Threads generating signals concurrently; 1 scans sequentially
+SCAN_TASK_TIMEOUT = 10  # Seconds one ticker's signals may take before the scan skips it
 
 # File Paths
 DATA_DIR = "data"
+BAR_STORE_DIR = "bars"  # Columnar OHLCV store, relative to DATA_DIR
+REPLAY_DATA_DIR = os.path.join(DATA_DIR, "replay")  # Recorded bars for the replay provider
 LOGS_DIR = "logs"
-EXCEL_FILE = "trading_log.xlsx"
+EXCEL_FILE = "trading_log.xlsx"  # Formatted workbook, rebuilt from the trade journal
+JOURNAL_FILE = "trade_journal.csv"  # Append-only record of every closed trade
+TRADE_STORE_FILE = "trades.db"  # Indexed SQLite copy of the journal for queries and reports
 CONFIG_FILE = "simulator_config.json"
 
+# Trade Journal
+JOURNAL_FSYNC_BATCH = 20  # Trades appended before the journal is fsynced...
+JOURNAL_FSYNC_INTERVAL = 5  # ...or seconds since the last fsync, whichever comes first
+EXCEL_EXPORT_INTERVAL = 300  # Seconds between workbook rebuilds while running; None only rebuilds on stop
+EXCEL_EXPORT_CHUNK_ROWS = 10000  # Journal rows held in memory at once while rebuilding the workbook
+TRADE_WRITER_WARN_DEPTH = 1000  # Closed trades waiting for the background log writer before it warns of a backlog
+TRADE_WRITER_BATCH_SIZE = 50  # Most trades the log writer writes in one batch
+TRADE_WRITER_FLUSH_INTERVAL = 1.0  # Seconds a queued trade waits for its batch to fill
+ANALYSIS_CHUNK_ROWS = 50000  # Journal rows held in memory at once by the streaming report
+ANALYSIS_CHART_POINTS = 5000  # Most cumulative P/L points the streaming report keeps for its chart
+ATTRIBUTION_TOP_K = 10  # Best and worst trades kept per attribution cube cell, the most top_trades() returns
+
 # Logging
 LOG_LEVEL = "INFO"
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
@@ -0,0 +1,99 @@
+"""
+Sector map and rolling return correlations of the ticker universe for position limits
+"""
+
+from datetime import date
+from typing import Dict, List, Optional
+import numpy as np
+from config import *
+
+UNKNOWN_SECTOR = "Unknown"
+
+class CorrelationIndex:
+    """Which tickers move together: shared sectors and rolling return correlation
+    
+    Sectors come from the feed's cached ticker metadata. Correlations are
+    over the last `window` price samples (one per feed refresh, or per bar in
+    backtests): a ring buffer of returns plus running sums of returns and of
+    their cross products are updated with each sample, so looking up the
+    correlation of two tickers at order time is O(1). Neither needs the
+    network.
+    """
+    
+    def __init__(self, tickers: List[str] = None, window: int = CORRELATION_WINDOW):
+        self.tickers = list(tickers or [])
+        self.codes = {ticker: code for code, ticker in enumerate(self.tickers)}
+        self.window = window
+        self.min_samples = max(2, window // 2)  # Fewer returns than this correlate with nothing
+        self.sectors = {}  # {ticker: sector}, known sectors only
+        self.sectors_as_of = None
+        
+        n = len(self.tickers)
+        self.returns = np.zeros((window, n))  # Ring buffer of the latest returns
+        self.sums = np.zeros(n)
+        self.cross = np.zeros((n, n))  # Sum of products of every pair's returns
+        self.last_prices = np.full(n, np.nan)
+        self.samples = 0
+    
+    def update_sectors(self, metadata: Dict[str, Dict], as_of: date = None):
+        """Rebuild the sector map from ticker metadata unless it is already as of that date"""
+        if as_of is not None and as_of == self.sectors_as_of:
+            return
+        self.sectors = {ticker: info['sector'] for ticker, info in metadata.items()
+                        if info.get('sector', UNKNOWN_SECTOR) != UNKNOWN_SECTOR}
+        self.sectors_as_of = as_of
+    
+    def update(self, prices: np.ndarray):
+        """Add one price sample (one entry per ticker, NaN where there is none)
+        
+        A ticker without a new price contributes a zero return.
+        """
+        with np.errstate(invalid="ignore", divide="ignore"):
+            returns = prices / self.last_prices - 1
+        returns[~np.isfinite(returns)] = 0.0
+        self.last_prices = np.where(np.isnan(prices), self.last_prices, prices)
+        
+        slot = self.samples % self.window
+        old = self.returns[slot]
+        self.sums += returns - old
+        self.cross += np.outer(returns, returns) - np.outer(old, old)
+        self.returns[slot] = returns
+        self.samples += 1
+        
+        # Re-sum from the buffer once per window so rounding cannot accumulate
+        if self.samples % self.window == 0:
+            self.sums = self.returns.sum(axis=0)
+            self.cross = self.returns.T @ self.returns
+    
+    def sample(self, data_feed):
+        """Add the feed's current prices as one sample"""
+        prices = np.array([data_feed.get_current_price(ticker) or np.nan for ticker in self.tickers],
+                          dtype=np.float64)
+        self.update(prices)
+    
+    def correlation(self, first: str, second: str) -> Optional[float]:
+        """Return correlation of two tickers over the window, None if unknown"""
+        i, j = self.codes.get(first), self.codes.get(second)
+        if i is None or j is None or self.samples < self.min_samples:
+            return None
+        if i == j:
+            return 1.0
+        
+        count = min(self.samples, self.window)
+        covariance = self.cross[i, j] - self.sums[i] * self.sums[j] / count
+        variance_i = self.cross[i, i] - self.sums[i] ** 2 / count
+        variance_j = self.cross[j, j] - self.sums[j] ** 2 / count
+        if variance_i <= 1e-18 or variance_j <= 1e-18:
+            return None
+        return float(covariance / np.sqrt(variance_i * variance_j))
+    
+    def same_sector(self, first: str, second: str) -> bool:
+        sector = self.sectors.get(first)
+        return sector is not None and sector == self.sectors.get(second)
+    
+    def is_correlated(self, first: str, second: str, threshold: float = CORRELATION_THRESHOLD) -> bool:
+        """Same ticker, same known sector, or return correlation at or above threshold"""
+        if first == second or self.same_sector(first, second):
+            return True
+        correlation = self.correlation(first, second)
+        return correlation is not None and correlation >= threshold
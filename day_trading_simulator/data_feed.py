@@ -1,31 +1,132 @@
 """
-Real-time market data feed using yfinance
+Real-time market data feed (yfinance by default, or any MarketDataProvider)
 """
 
-import yfinance as yf
 import pandas as pd
 import numpy as np
 import time
 import threading
+from collections import OrderedDict
 from datetime import datetime, timedelta
 import logging
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 from config import *
+from bar_store import BarStore, interval_to_timedelta, period_to_start
+from data_providers import MarketDataProvider, create_provider
+from clock import Clock, WallClock
+from event_loop import EventLoop, NEW_BAR, FEED_REFRESHED
+from indicators import (IndicatorEngine, add_indicators, calculate_rsi, calculate_macd,
+                        calculate_atr, calculate_bollinger_bands)
 
 logger = logging.getLogger(__name__)
 
+class HistoricalDataCache:
+    """Bounded LRU cache of history frames with a time-to-live per entry"""
+    
+    def __init__(self, max_size: int = HISTORICAL_CACHE_SIZE, ttl: float = HISTORICAL_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # {(ticker, period, interval): (stored_at, frame)}
+        self._lock = threading.Lock()
+    
+    def get(self, key: Tuple[str, str, str]) -> Optional[pd.DataFrame]:
+        """Return the cached frame for key, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            stored_at, frame = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return frame
+    
+    def put(self, key: Tuple[str, str, str], frame: pd.DataFrame):
+        """Store a frame, evicting the least recently used entries if full"""
+        with self._lock:
+            self._entries[key] = (time.monotonic(), frame)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def invalidate(self, ticker: str = None):
+        """Drop cached frames for a ticker, or everything if no ticker is given"""
+        with self._lock:
+            if ticker is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[0] == ticker]:
+                del self._entries[key]
+    
+    def get_stats(self) -> Dict:
+        """Get hit/miss counters for the cache"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
 class MarketDataFeed:
-    def __init__(self, tickers: List[str] = None):
+    def __init__(self, tickers: List[str] = None, provider: MarketDataProvider = None,
+                 clock: Clock = None):
         self.tickers = tickers or DEFAULT_TICKERS
-        self.data_cache = {}
+        self.provider = provider or create_provider()
+        self.clock = clock or WallClock()
+        self.data_cache = HistoricalDataCache()
+        self.last_bar_times = {}  # {ticker: timestamp of latest intraday bar seen}
+        self.ticker_metadata = {}  # {ticker: {'market_cap', 'sector', 'industry'}}
+        self.metadata_date = None
+        self.indicator_engines = {}  # {ticker: IndicatorEngine}
+        self.bar_store = BarStore()
         self.realtime_data = {}
+        self.subscribers = {}  # {ticker: [callback(ticker, price)]} notified when the price changes
+        self.event_loop = None  # Receives NEW_BAR and FEED_REFRESHED events
         self.is_running = False
         self.thread = None
+        self._stop_event = threading.Event()
         
+    def set_event_loop(self, event_loop: EventLoop):
+        self.event_loop = event_loop
+    
+    def subscribe(self, ticker: str, callback: Callable[[str, float], None]):
+        """Call callback(ticker, price) from the feed thread whenever the ticker's price changes"""
+        callbacks = self.subscribers.setdefault(ticker, [])
+        if callback not in callbacks:
+            callbacks.append(callback)
+    
+    def unsubscribe(self, ticker: str, callback: Callable[[str, float], None]):
+        callbacks = self.subscribers.get(ticker, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+        if not callbacks:
+            self.subscribers.pop(ticker, None)
+    
+    def _publish_price(self, ticker: str, price: float):
+        for callback in list(self.subscribers.get(ticker, ())):
+            try:
+                callback(ticker, price)
+            except Exception as e:
+                logger.error(f"Error in price subscriber for {ticker}: {e}")
+    
     def start_feed(self):
         """Start the real-time data feed in a separate thread"""
         if not self.is_running:
             self.is_running = True
+            self._stop_event.clear()
             self.thread = threading.Thread(target=self._update_loop)
             self.thread.daemon = True
             self.thread.start()
@@ -34,6 +135,7 @@ class MarketDataFeed:
     def stop_feed(self):
         """Stop the real-time data feed"""
         self.is_running = False
+        self._stop_event.set()
         if self.thread:
             self.thread.join()
         logger.info("Market data feed stopped")
@@ -43,37 +145,109 @@ class MarketDataFeed:
         while self.is_running:
             try:
                 self._fetch_realtime_data()
-                time.sleep(DATA_REFRESH_INTERVAL)
+                self._wait(DATA_REFRESH_INTERVAL)
             except Exception as e:
                 logger.error(f"Error in data feed loop: {e}")
-                time.sleep(5)  # Wait before retrying
+                self._wait(5)  # Wait before retrying
+    
+    def _wait(self, seconds: float):
+        """Sleep between refreshes, waking at once when the feed is stopped"""
+        if self.clock.is_simulated:
+            self.clock.sleep(seconds)
+        else:
+            self._stop_event.wait(seconds)
+    
+    def refresh(self):
+        """Fetch the latest bars once (used when the simulator drives the feed itself)"""
+        try:
+            self._fetch_realtime_data()
+        except Exception as e:
+            logger.error(f"Error refreshing market data: {e}")
     
     def _fetch_realtime_data(self):
-        """Fetch real-time data for all tickers"""
+        """Fetch real-time data for all tickers with one batched bar request"""
+        self.provider.set_time(self.clock.now())
+        self._refresh_metadata()
+        
         try:
-            for ticker in self.tickers:
-                stock = yf.Ticker(ticker)
-                info = stock.info
-                hist = stock.history(period="1d", interval="1m")
+            bars = self.provider.get_intraday_bars(self.tickers)
+        except Exception as e:
+            logger.error(f"Error fetching batched realtime data: {e}")
+            return
+        
+        for ticker in self.tickers:
+            try:
+                hist = bars.get(ticker)
+                if hist is None or hist.empty:
+                    continue
+                
+                # A new bar makes every cached history frame for the ticker stale
+                bar_time = hist.index[-1]
+                new_bar = self.last_bar_times.get(ticker) != bar_time
+                if new_bar:
+                    self.last_bar_times[ticker] = bar_time
+                    self.data_cache.invalidate(ticker)
+                    self._update_indicator_engine(ticker, hist)
                 
-                if not hist.empty:
-                    current_price = hist['Close'].iloc[-1]
-                    volume = hist['Volume'].iloc[-1]
-                    high = hist['High'].iloc[-1]
-                    low = hist['Low'].iloc[-1]
-                    
-                    self.realtime_data[ticker] = {
-                        'price': float(current_price),
-                        'volume': int(volume),
-                        'high': float(high),
-                        'low': float(low),
-                        'timestamp': datetime.now(),
-                        'market_cap': info.get('marketCap', 0),
-                        'sector': info.get('sector', 'Unknown'),
-                        'industry': info.get('industry', 'Unknown')
-                    }
+                self._persist_intraday_bars(ticker, hist)
+                
+                latest = hist.iloc[-1]
+                metadata = self.ticker_metadata.get(ticker, {})
+                previous = self.realtime_data.get(ticker)
+                
+                self.realtime_data[ticker] = {
+                    'price': float(latest['Close']),
+                    'volume': int(latest['Volume']),
+                    'high': float(latest['High']),
+                    'low': float(latest['Low']),
+                    'timestamp': self.clock.now(),
+                    'market_cap': metadata.get('market_cap', 0),
+                    'sector': metadata.get('sector', 'Unknown'),
+                    'industry': metadata.get('industry', 'Unknown')
+                }
+                
+                if new_bar and self.event_loop is not None:
+                    self.event_loop.post(NEW_BAR, ticker)
+                if previous is None or previous['price'] != self.realtime_data[ticker]['price']:
+                    self._publish_price(ticker, self.realtime_data[ticker]['price'])
+            except Exception as e:
+                logger.error(f"Error fetching data for {ticker}: {e}")
+        
+        if self.event_loop is not None:
+            self.event_loop.post(FEED_REFRESHED)
+    
+    def _persist_intraday_bars(self, ticker: str, hist: pd.DataFrame):
+        """Record the refreshed intraday bars in the bar store"""
+        if not self.provider.is_remote:
+            return
+        
+        try:
+            last = self.bar_store.last_timestamp(ticker, INTRADAY_INTERVAL)
+            if last is not None and last < hist.index[0] - interval_to_timedelta(INTRADAY_INTERVAL):
+                # Fill the gap since the previous session before appending today's bars
+                self._sync_bars(ticker, INTRADAY_INTERVAL)
+            self._store_bars(ticker, INTRADAY_INTERVAL, hist)
         except Exception as e:
-            logger.error(f"Error fetching data for {ticker}: {e}")
+            logger.error(f"Error storing intraday bars for {ticker}: {e}")
+    
+    def _refresh_metadata(self):
+        """Refresh static ticker metadata (sector, industry, market cap) once per day"""
+        today = self.clock.today()
+        missing = [ticker for ticker in self.tickers if ticker not in self.ticker_metadata]
+        if self.metadata_date == today and not missing:
+            return
+        
+        tickers = self.tickers if self.metadata_date != today else missing
+        for ticker in tickers:
+            try:
+                self.ticker_metadata[ticker] = self.provider.get_metadata(ticker)
+            except Exception as e:
+                logger.error(f"Error fetching metadata for {ticker}: {e}")
+                self.ticker_metadata.setdefault(ticker, {
+                    'market_cap': 0, 'sector': 'Unknown', 'industry': 'Unknown'
+                })
+        
+        self.metadata_date = today
     
     def get_current_price(self, ticker: str) -> Optional[float]:
         """Get current price for a ticker"""
@@ -81,69 +255,153 @@ class MarketDataFeed:
             return self.realtime_data[ticker]['price']
         return None
     
-    def get_historical_data(self, ticker: str, period: str = "30d") -> pd.DataFrame:
-        """Get historical data for a ticker"""
+    def get_historical_data(self, ticker: str, period: str = "30d", interval: str = "1d") -> pd.DataFrame:
+        """Get historical data for a ticker
+        
+        Frames are served from the in-memory cache while fresh. The returned
+        frame is shared between callers and must not be modified in place.
+        """
+        cache_key = (ticker, period, interval)
+        data = self.data_cache.get(cache_key)
+        if data is not None:
+            return data
+        
         try:
-            stock = yf.Ticker(ticker)
-            data = stock.history(period=period)
+            data = self._load_bars(ticker, period, interval)
+            if data.empty:
+                return data
             
             # Calculate technical indicators
-            data['SMA_20'] = data['Close'].rolling(window=20).mean()
-            data['SMA_50'] = data['Close'].rolling(window=50).mean()
-            data['RSI'] = self._calculate_rsi(data['Close'])
-            data['MACD'] = self._calculate_macd(data['Close'])
-            data['MACD_Signal'] = data['MACD'].ewm(span=9).mean()
-            data['ATR'] = self._calculate_atr(data)
-            data['BB_Upper'], data['BB_Middle'], data['BB_Lower'] = self._calculate_bollinger_bands(data['Close'])
+            add_indicators(data)
             
+            self.data_cache.put(cache_key, data)
             return data
         except Exception as e:
             logger.error(f"Error fetching historical data for {ticker}: {e}")
             return pd.DataFrame()
     
+    def _load_bars(self, ticker: str, period: str, interval: str) -> pd.DataFrame:
+        """Load OHLCV bars from the local bar store, fetching only what it is missing"""
+        if not self.provider.is_remote:
+            # Offline providers are already local; mirroring them would only add copies
+            return self.provider.get_history(ticker, interval, period=period)
+        
+        now = self.clock.now()
+        start = period_to_start(period, now)
+        if start is None:
+            # Open-ended periods such as "max" cannot be answered from the store
+            return self.provider.get_history(ticker, interval, period=period)
+        
+        first = self.bar_store.first_timestamp(ticker, interval)
+        if first is None or first > start + timedelta(days=STORE_COVERAGE_SLACK_DAYS):
+            self._sync_bars(ticker, interval, period=period)
+        elif self._needs_sync(ticker, interval, now):
+            self._sync_bars(ticker, interval)
+        
+        return self.bar_store.read(ticker, interval, start=start)
+    
+    def _needs_sync(self, ticker: str, interval: str, now: datetime) -> bool:
+        """Check whether the stored bars could be missing anything the network has"""
+        _, synced_at = self.bar_store.read_pending(ticker, interval)
+        if synced_at is None:
+            return True
+        if now - synced_at < timedelta(seconds=DATA_REFRESH_INTERVAL):
+            return False
+        if self.is_market_open():
+            return True
+        # No new bars can have printed since a sync made after the last close
+        return synced_at < self._last_session_close(now)
+    
+    def _sync_bars(self, ticker: str, interval: str, period: str = None):
+        """Download a full period, or just the tail after the last stored bar, into the store"""
+        last = self.bar_store.last_timestamp(ticker, interval)
+        if period or last is None:
+            bars = self.provider.get_history(ticker, interval, period=period)
+        else:
+            bars = self.provider.get_history(ticker, interval, start=last.tz_convert(MARKET_TIMEZONE))
+        self._store_bars(ticker, interval, bars)
+    
+    def _store_bars(self, ticker: str, interval: str, bars: pd.DataFrame):
+        """Append completed bars to the store and keep the still-forming ones as pending"""
+        now = self.clock.now()
+        if bars.empty:
+            self.bar_store.write_pending(ticker, interval, bars, synced_at=now)
+            return
+        
+        bar_end = bars.index + interval_to_timedelta(interval)
+        market_now = pd.Timestamp(now).tz_localize(MARKET_TIMEZONE)
+        if bar_end.tz is None:
+            bar_end = bar_end.tz_localize(MARKET_TIMEZONE)
+        completed = bar_end <= market_now
+        
+        first = self.bar_store.first_timestamp(ticker, interval)
+        if first is not None and completed.any() and bars.index[completed][0] < first:
+            self.bar_store.backfill(ticker, interval, bars[completed])
+        self.bar_store.append(ticker, interval, bars[completed])
+        self.bar_store.write_pending(ticker, interval, bars[~completed], synced_at=now)
+    
+    def _last_session_close(self, now: datetime) -> datetime:
+        """Most recent market close at or before now"""
+        close_hour, close_minute = map(int, MARKET_CLOSE.split(":"))
+        candidate = now.replace(hour=close_hour, minute=close_minute, second=0, microsecond=0)
+        if candidate > now:
+            candidate -= timedelta(days=1)
+        while candidate.strftime("%A") not in TRADING_DAYS:
+            candidate -= timedelta(days=1)
+        return candidate
+    
     def _calculate_rsi(self, prices: pd.Series, period: int = 14) -> pd.Series:
         """Calculate RSI indicator"""
-        delta = prices.diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-        rs = gain / loss
-        rsi = 100 - (100 / (1 + rs))
-        return rsi.fillna(50)  # Fill NaN values with neutral RSI
-    
-    def _calculate_macd(self, prices: pd.Series, fast: int = 12, slow: int = 26) -> pd.Series:
+        return calculate_rsi(prices, period)
+    
+    def _calculate_macd(self, prices: pd.Series, fast: int = MACD_FAST, slow: int = MACD_SLOW) -> pd.Series:
         """Calculate MACD indicator"""
-        ema_fast = prices.ewm(span=fast).mean()
-        ema_slow = prices.ewm(span=slow).mean()
-        macd = ema_fast - ema_slow
-        return macd.fillna(0)  # Fill NaN values with 0
+        return calculate_macd(prices, fast, slow)
     
     def _calculate_atr(self, data: pd.DataFrame, period: int = 14) -> pd.Series:
         """Calculate Average True Range"""
-        high_low = data['High'] - data['Low']
-        high_close = np.abs(data['High'] - data['Close'].shift())
-        low_close = np.abs(data['Low'] - data['Close'].shift())
-        
-        true_range = np.maximum(high_low, np.maximum(high_close, low_close))
-        atr = true_range.rolling(window=period).mean()
-        return atr.fillna(true_range.mean())  # Fill NaN with average true range
+        return calculate_atr(data, period)
     
     def _calculate_bollinger_bands(self, prices: pd.Series, period: int = 20, std_dev: float = 2) -> tuple:
         """Calculate Bollinger Bands"""
-        sma = prices.rolling(window=period).mean()
-        std = prices.rolling(window=period).std()
-        upper_band = sma + (std * std_dev)
-        lower_band = sma - (std * std_dev)
+        return calculate_bollinger_bands(prices, period, std_dev)
+    
+    def get_indicator_engine(self, ticker: str) -> Optional[IndicatorEngine]:
+        """Get the streaming indicator engine for a ticker, seeding it from intraday history"""
+        engine = self.indicator_engines.get(ticker)
+        if engine is not None:
+            return engine
         
-        # Fill NaN values
-        sma = sma.fillna(prices.mean())
-        upper_band = upper_band.fillna(prices.mean() * (1 + std_dev * 0.1))
-        lower_band = lower_band.fillna(prices.mean() * (1 - std_dev * 0.1))
+        hist = self.get_historical_data(ticker, INDICATOR_SEED_PERIOD, INTRADAY_INTERVAL)
+        if hist.empty:
+            return None
         
-        return upper_band, sma, lower_band
+        # The last bar may still be forming; it is fed once the next bar starts
+        engine = IndicatorEngine().seed(hist.iloc[:-1])
+        self.indicator_engines[ticker] = engine
+        return engine
+    
+    def get_latest_indicators(self, ticker: str) -> Dict[str, float]:
+        """Get the latest streaming indicator values for a ticker"""
+        engine = self.get_indicator_engine(ticker)
+        return engine.get_values() if engine else {}
+    
+    def _update_indicator_engine(self, ticker: str, hist: pd.DataFrame):
+        """Feed newly completed intraday bars into the ticker's streaming indicators"""
+        engine = self.indicator_engines.get(ticker)
+        if engine is None:
+            return
+        
+        completed = hist.iloc[:-1]
+        if engine.last_timestamp is not None:
+            completed = completed[completed.index > engine.last_timestamp]
+        
+        for timestamp, bar in completed.iterrows():
+            engine.update(bar['High'], bar['Low'], bar['Close'], timestamp)
     
     def is_market_open(self) -> bool:
         """Check if market is currently open"""
-        now = datetime.now()
+        now = self.clock.now()
         current_time = now.strftime("%H:%M")
         current_day = now.strftime("%A")
         
@@ -169,6 +427,18 @@ class MarketDataFeed:
             logger.error(f"Error determining market direction for {ticker}: {e}")
             return "Neutral"
     
+    def invalidate_cache(self, ticker: str = None):
+        """Force cached history for a ticker (or all tickers) to be refetched"""
+        self.data_cache.invalidate(ticker)
+    
+    def get_cache_stats(self) -> Dict:
+        """Get historical data cache statistics"""
+        return self.data_cache.get_stats()
+    
+    def get_ticker_metadata(self, ticker: str) -> Dict:
+        """Get cached static metadata (sector, industry, market cap) for a ticker"""
+        return self.ticker_metadata.get(ticker, {})
+    
     def get_ticker_info(self, ticker: str) -> Dict:
         """Get comprehensive ticker information"""
         if ticker in self.realtime_data:
@@ -0,0 +1,340 @@
+"""
+Market data providers behind MarketDataFeed: live yfinance, file replay and synthetic data
+"""
+
+import os
+import zlib
+import logging
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import yfinance as yf
+import pandas as pd
+import numpy as np
+from config import *
+from bar_store import period_to_start
+
+logger = logging.getLogger(__name__)
+
+OHLCV_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+UNKNOWN_METADATA = {'market_cap': 0, 'sector': 'Unknown', 'industry': 'Unknown'}
+
+class MarketDataProvider(ABC):
+    """Source of OHLCV bars and static ticker metadata"""
+    
+    # Remote providers are mirrored into the local bar store; offline ones are read directly
+    is_remote = False
+    
+    @abstractmethod
+    def get_history(self, ticker: str, interval: str = "1d", period: str = None,
+                    start=None) -> pd.DataFrame:
+        """Get OHLCV bars for a period (e.g. "30d") or from a start time onwards"""
+        pass
+    
+    @abstractmethod
+    def get_intraday_bars(self, tickers: List[str]) -> Dict[str, pd.DataFrame]:
+        """Get the current session's intraday bars for every ticker that has data"""
+        pass
+    
+    def get_metadata(self, ticker: str) -> Dict:
+        """Get static metadata (market cap, sector, industry) for a ticker"""
+        return dict(UNKNOWN_METADATA)
+    
+    def set_time(self, timestamp):
+        """Tell the provider what time it is (live providers ignore this)"""
+        pass
+
+class YFinanceProvider(MarketDataProvider):
+    """Live market data from Yahoo Finance"""
+    
+    is_remote = True
+    
+    def get_history(self, ticker: str, interval: str = "1d", period: str = None,
+                    start=None) -> pd.DataFrame:
+        stock = yf.Ticker(ticker)
+        if start is not None:
+            return stock.history(start=start, interval=interval)
+        return stock.history(period=period or f"{HISTORICAL_DAYS}d", interval=interval)
+    
+    def get_intraday_bars(self, tickers: List[str]) -> Dict[str, pd.DataFrame]:
+        # One batched request for the whole universe instead of one per ticker
+        bars = yf.download(
+            tickers, period="1d", interval=INTRADAY_INTERVAL, group_by="ticker",
+            threads=True, progress=False, auto_adjust=False
+        )
+        
+        result = {}
+        for ticker in tickers:
+            try:
+                hist = self._extract_ticker_bars(bars, ticker)
+                if not hist.empty:
+                    result[ticker] = hist
+            except Exception as e:
+                logger.error(f"Error extracting bars for {ticker}: {e}")
+        return result
+    
+    def _extract_ticker_bars(self, bars: pd.DataFrame, ticker: str) -> pd.DataFrame:
+        """Pull one ticker's bars out of a batched download"""
+        if bars.empty:
+            return pd.DataFrame()
+        
+        if isinstance(bars.columns, pd.MultiIndex):
+            if ticker not in bars.columns.get_level_values(0):
+                return pd.DataFrame()
+            hist = bars[ticker]
+        else:
+            hist = bars
+        
+        return hist.dropna(subset=['Close'])
+    
+    def get_metadata(self, ticker: str) -> Dict:
+        info = yf.Ticker(ticker).info
+        return {
+            'market_cap': info.get('marketCap', 0),
+            'sector': info.get('sector', 'Unknown'),
+            'industry': info.get('industry', 'Unknown')
+        }
+
+class ReplayProvider(MarketDataProvider):
+    """Deterministic replay of bars recorded to CSV or Parquet files
+    
+    Files are looked up as <data_dir>/<TICKER>_<interval>.csv (or .parquet),
+    falling back to <data_dir>/<TICKER>.csv for intraday data. The first column
+    (or a Datetime/Date column) is the bar timestamp. Daily bars, and intraday
+    bars coarser than INTRADAY_INTERVAL, are built from the intraday bars when
+    they have no file of their own; other intervals without a file raise
+    ValueError. A ticker without data has no bars. An optional metadata.csv
+    with ticker, sector, industry and market_cap columns provides sector data.
+    
+    Nothing after the replay cursor is ever returned, so strategies see the
+    market exactly as it was at that moment. The cursor defaults to the end
+    of the data and is moved with set_time().
+    """
+    
+    def __init__(self, data_dir: str = None):
+        self.data_dir = data_dir or REPLAY_DATA_DIR
+        self.current_time = None
+        self._frames = {}  # {(ticker, interval): DataFrame}
+        self._metadata = None
+    
+    def set_time(self, timestamp):
+        """Move the replay cursor; bars after this time are hidden"""
+        self.current_time = _as_market_time(timestamp)
+    
+    def _load_file(self, ticker: str, interval: str) -> Optional[pd.DataFrame]:
+        names = [f"{ticker}_{interval}"]
+        if interval == INTRADAY_INTERVAL:
+            names.append(ticker)
+        
+        for name in names:
+            for extension, reader in ((".parquet", pd.read_parquet), (".csv", pd.read_csv)):
+                path = os.path.join(self.data_dir, name + extension)
+                if os.path.exists(path):
+                    return _normalize_bars(reader(path))
+        return None
+    
+    def _frame(self, ticker: str, interval: str) -> pd.DataFrame:
+        """Full (uncursored) bar history for a ticker and interval"""
+        key = (ticker, interval)
+        if key not in self._frames:
+            frame = self._load_file(ticker, interval)
+            if frame is None and interval != INTRADAY_INTERVAL:
+                minutes, base = _interval_minutes(interval), _interval_minutes(INTRADAY_INTERVAL)
+                if interval != "1d" and not (minutes and base and minutes % base == 0):
+                    raise ValueError(f"Interval {interval} is not available for replay: no {ticker}_{interval} "
+                                     f"file, and it cannot be built from {INTRADAY_INTERVAL} bars")
+                intraday = self._frame(ticker, INTRADAY_INTERVAL)
+                if not intraday.empty:
+                    frame = _resample_daily(intraday) if interval == "1d" else _resample_intraday(intraday, minutes)
+            self._frames[key] = frame if frame is not None else _empty_bars()
+        return self._frames[key]
+    
+    def _daily_as_of(self, ticker: str, now: pd.Timestamp) -> pd.DataFrame:
+        """Daily bars up to now, with today's bar built only from minutes already printed"""
+        daily = self._frame(ticker, "1d")
+        intraday = self._frame(ticker, INTRADAY_INTERVAL)
+        if intraday.empty:
+            return daily[daily.index <= now]
+        
+        today = now.normalize()
+        completed = daily.iloc[:daily.index.searchsorted(today)]
+        lo = intraday.index.searchsorted(today)
+        hi = intraday.index.searchsorted(now, side="right")
+        if hi <= lo:
+            return completed
+        
+        session = intraday.iloc[lo:hi]
+        partial = pd.DataFrame({
+            'Open': [session['Open'].iat[0]],
+            'High': [session['High'].max()],
+            'Low': [session['Low'].min()],
+            'Close': [session['Close'].iat[-1]],
+            'Volume': [session['Volume'].sum()]
+        }, index=pd.DatetimeIndex([today]))
+        return pd.concat([completed, partial])
+    
+    def get_history(self, ticker: str, interval: str = "1d", period: str = None,
+                    start=None) -> pd.DataFrame:
+        now = self.current_time
+        if interval == "1d" and now is not None:
+            frame = self._daily_as_of(ticker, now)
+        else:
+            frame = self._frame(ticker, interval)
+            if now is not None:
+                # A coarser intraday bar is complete, and visible, once its last minute has printed
+                minutes, base = _interval_minutes(interval), _interval_minutes(INTRADAY_INTERVAL)
+                unprinted = minutes - base if minutes and base and minutes > base else 0
+                frame = frame[frame.index <= now - pd.Timedelta(minutes=unprinted)]
+        if frame.empty:
+            return frame.copy()
+        
+        if start is not None:
+            frame = frame[frame.index >= _as_market_time(start)]
+        else:
+            period_start = period_to_start(period or f"{HISTORICAL_DAYS}d", now or frame.index[-1])
+            if period_start is not None:
+                frame = frame[frame.index >= period_start]
+        return frame.copy()
+    
+    def get_intraday_bars(self, tickers: List[str]) -> Dict[str, pd.DataFrame]:
+        result = {}
+        for ticker in tickers:
+            frame = self._frame(ticker, INTRADAY_INTERVAL)
+            if frame.empty:
+                continue
+            now = self.current_time or frame.index[-1]
+            session = frame[(frame.index >= now.normalize()) & (frame.index <= now)]
+            if not session.empty:
+                result[ticker] = session
+        return result
+    
+    def get_metadata(self, ticker: str) -> Dict:
+        if self._metadata is None:
+            path = os.path.join(self.data_dir, "metadata.csv")
+            self._metadata = pd.read_csv(path).set_index("ticker") if os.path.exists(path) else pd.DataFrame()
+        
+        if ticker not in self._metadata.index:
+            return dict(UNKNOWN_METADATA)
+        row = self._metadata.loc[ticker]
+        return {
+            'market_cap': row.get('market_cap', 0),
+            'sector': row.get('sector', 'Unknown'),
+            'industry': row.get('industry', 'Unknown')
+        }
+    
+    def get_time_range(self, tickers: List[str]) -> tuple:
+        """First and last intraday bar timestamps across tickers"""
+        frames = [self._frame(ticker, INTRADAY_INTERVAL) for ticker in tickers]
+        frames = [frame for frame in frames if not frame.empty]
+        if not frames:
+            return None, None
+        return min(frame.index[0] for frame in frames), max(frame.index[-1] for frame in frames)
+
+class SyntheticProvider(ReplayProvider):
+    """Replay of reproducible random-walk minute bars generated in memory
+    
+    Each ticker gets its own seeded geometric random walk with overnight gaps
+    and occasional volume spikes, so every strategy sees tradeable setups.
+    """
+    
+    def __init__(self, start_date: str = None, days: int = SYNTHETIC_DAYS, seed: int = SYNTHETIC_SEED,
+                 sectors: Dict[str, str] = None):
+        super().__init__(data_dir="")
+        if start_date:
+            self.sessions = pd.bdate_range(start=start_date, periods=days)
+        else:
+            self.sessions = pd.bdate_range(end=datetime.now().date(), periods=days)
+        self.seed = seed
+        self.sectors = sectors or {}
+    
+    def _load_file(self, ticker: str, interval: str) -> Optional[pd.DataFrame]:
+        if interval != INTRADAY_INTERVAL:
+            return None
+        
+        rng = np.random.default_rng(self.seed + zlib.crc32(ticker.encode()))
+        open_hour, open_minute = map(int, MARKET_OPEN.split(":"))
+        minutes = pd.timedelta_range(start=timedelta(hours=open_hour, minutes=open_minute),
+                                     periods=SYNTHETIC_BARS_PER_SESSION, freq="min")
+        index = (self.sessions.values[:, None] + minutes.values[None, :]).ravel()
+        index = pd.DatetimeIndex(index).tz_localize(MARKET_TIMEZONE)
+        
+        sessions = len(self.sessions)
+        returns = rng.normal(0, 0.0012, (sessions, SYNTHETIC_BARS_PER_SESSION))
+        returns[:, 0] += rng.normal(0, 0.015, sessions)  # Overnight gaps
+        close = rng.uniform(50, 500) * np.exp(np.cumsum(returns.ravel()))
+        open_ = np.concatenate([[close[0]], close[:-1]])
+        spread = np.abs(rng.normal(0, 0.0008, close.size)) * close
+        volume = rng.lognormal(9, 0.5, close.size) * np.where(rng.random(close.size) < 0.02, 4, 1)
+        
+        return pd.DataFrame({
+            'Open': open_,
+            'High': np.maximum(open_, close) + spread,
+            'Low': np.minimum(open_, close) - spread,
+            'Close': close,
+            'Volume': volume.round()
+        }, index=index)
+    
+    def get_metadata(self, ticker: str) -> Dict:
+        return {'market_cap': 0, 'sector': self.sectors.get(ticker, 'Unknown'), 'industry': 'Unknown'}
+
+def create_provider(name: str = None, **kwargs) -> MarketDataProvider:
+    """Build a market data provider by name ("yfinance", "replay" or "synthetic")"""
+    providers = {
+        "yfinance": YFinanceProvider,
+        "replay": ReplayProvider,
+        "synthetic": SyntheticProvider
+    }
+    name = name or DATA_PROVIDER
+    if name not in providers:
+        raise ValueError(f"Unknown data provider: {name}")
+    return providers[name](**kwargs)
+
+def _as_market_time(timestamp) -> pd.Timestamp:
+    timestamp = pd.Timestamp(timestamp)
+    if timestamp.tz is None:
+        return timestamp.tz_localize(MARKET_TIMEZONE)
+    return timestamp.tz_convert(MARKET_TIMEZONE)
+
+def _normalize_bars(frame: pd.DataFrame) -> pd.DataFrame:
+    """Index a loaded file by market-time timestamps and keep the OHLCV columns"""
+    for column in ("Datetime", "Date", "timestamp"):
+        if column in frame.columns:
+            frame = frame.set_index(column)
+            break
+    else:
+        if not isinstance(frame.index, pd.DatetimeIndex):
+            frame = frame.set_index(frame.columns[0])
+    
+    try:
+        index = pd.DatetimeIndex(pd.to_datetime(frame.index))
+    except (ValueError, TypeError):
+        # Mixed UTC offsets (e.g. across a DST change) only parse via UTC
+        index = pd.DatetimeIndex(pd.to_datetime(frame.index, utc=True))
+    index = index.tz_localize(MARKET_TIMEZONE) if index.tz is None else index.tz_convert(MARKET_TIMEZONE)
+    frame.index = index
+    return frame[OHLCV_COLUMNS].sort_index()
+
+def _empty_bars() -> pd.DataFrame:
+    """OHLCV frame without rows, on a market-time index so time lookups still work"""
+    return pd.DataFrame(columns=OHLCV_COLUMNS, index=pd.DatetimeIndex([], tz=MARKET_TIMEZONE), dtype=np.float64)
+
+def _interval_minutes(interval: str) -> Optional[int]:
+    """Length of a minute or hour interval ("5m", "1h") in minutes; None for other intervals"""
+    if interval[-1:] in ("m", "h") and interval[:-1].isdigit():
+        return int(interval[:-1]) * (60 if interval.endswith("h") else 1)
+    return None
+
+def _resample_intraday(bars: pd.DataFrame, minutes: int) -> pd.DataFrame:
+    """Aggregate intraday bars into bars of `minutes`, aligned to the market open"""
+    open_hour, open_minute = map(int, MARKET_OPEN.split(":"))
+    resampled = bars.resample(f"{minutes}min", offset=pd.Timedelta(hours=open_hour, minutes=open_minute)).agg({
+        'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'
+    })
+    return resampled.dropna(subset=['Close'])
+
+def _resample_daily(bars: pd.DataFrame) -> pd.DataFrame:
+    """Aggregate intraday bars into one bar per session"""
+    daily = bars.resample("D").agg({
+        'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'
+    })
+    return daily.dropna(subset=['Close'])
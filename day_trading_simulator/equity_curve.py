@@ -0,0 +1,132 @@
+"""
+Mark-to-market equity curve rebuilt from closed trades and bar closes
+"""
+
+import logging
+from typing import Dict, List
+import pandas as pd
+import numpy as np
+from config import *
+from bar_store import BarStore, market_time_index
+
+logger = logging.getLogger(__name__)
+
+EQUITY_COLUMNS = ["equity", "realized_pl", "unrealized_pl", "open_positions"]
+
+def _market_nanos(times) -> np.ndarray:
+    """int64 nanoseconds of timestamps in naive market time"""
+    return market_time_index(pd.to_datetime(times)).as_unit("ns").asi8
+
+def trade_sides(trades: pd.DataFrame) -> np.ndarray:
+    """1 for long trades, -1 for short ones
+    
+    Trades do not record their side, but gross P/L has the sign of side times
+    the price move. Trades that exited at their entry price (or with zero
+    P/L) fall back to the stop loss, which sits below a long entry.
+    """
+    entry = trades["entry_fill_price"].to_numpy(dtype=np.float64)
+    exit_price = trades["exit_fill_price"].to_numpy(dtype=np.float64, na_value=np.nan)
+    gross_pl = trades["gross_pl"].to_numpy(dtype=np.float64, na_value=0.0)
+    stop = trades["stop_loss_price"].to_numpy(dtype=np.float64)
+    from_pl = np.sign(gross_pl * (exit_price - entry))
+    from_stop = np.where(stop > entry, -1.0, 1.0)
+    return np.where(np.nan_to_num(from_pl) != 0, from_pl, from_stop)
+
+def load_bar_closes(tickers: List[str], start=None, end=None, interval: str = INTRADAY_INTERVAL,
+                    bar_store: BarStore = None) -> Dict[str, pd.Series]:
+    """Cached closes per ticker from the bar store, indexed in market time"""
+    bar_store = bar_store or BarStore()
+    closes = {}
+    for ticker in tickers:
+        bars = bar_store.read(ticker, interval, start=start, end=end)
+        if not bars.empty:
+            closes[ticker] = bars["Close"]
+    return closes
+
+def reconstruct_equity(trades: pd.DataFrame, closes: Dict[str, pd.Series],
+                       initial_capital: float = INITIAL_PORTFOLIO_VALUE,
+                       commission: float = COMMISSION_PER_TRADE) -> pd.DataFrame:
+    """Equity at every bar time, with open positions marked to each ticker's latest close
+    
+    trades has Trade field columns (TradeLedger.to_frame, TradeStore.query).
+    The time grid is the union of the bar times in closes. Each trade is two
+    cash events (the entry commission at entry, P/L less the exit commission
+    at exit), and while it is open it adds side * shares * (close - entry)
+    per ticker, as the portfolio's get_equity does. Holdings are kept as
+    running sums of signed shares and signed cost per ticker, built from
+    searchsorted positions and cumulative sums rather than per-trade loops.
+    Returns EQUITY_COLUMNS indexed by time.
+    """
+    tickers = sorted(closes)
+    codes = {ticker: code for code, ticker in enumerate(tickers)}
+    bar_times = [_market_nanos(closes[ticker].index) for ticker in tickers]
+    timeline = np.unique(np.concatenate(bar_times)) if bar_times else np.empty(0, dtype=np.int64)
+    steps = len(timeline)
+    index = pd.DatetimeIndex(timeline.view("datetime64[ns]"))
+    if steps == 0:
+        return pd.DataFrame(columns=EQUITY_COLUMNS, index=index, dtype=np.float64)
+    
+    # Each ticker's last close at or before every grid time (NaN before its first bar)
+    marks = np.full((len(tickers), steps), np.nan)
+    for code, times in enumerate(bar_times):
+        values = closes[tickers[code]].to_numpy(dtype=np.float64)
+        latest = np.searchsorted(times, timeline, side="right") - 1
+        marks[code] = np.where(latest >= 0, values[np.maximum(latest, 0)], np.nan)
+    
+    trades = trades[trades["exit_time"].notna()]
+    ticker_codes = trades["ticker"].map(codes).fillna(-1).to_numpy(dtype=np.int64)
+    entries = np.searchsorted(timeline, _market_nanos(trades["entry_time"]), side="left")
+    exits = np.searchsorted(timeline, _market_nanos(trades["exit_time"]), side="left")
+    exits = np.maximum(exits, entries)
+    signed_shares = trade_sides(trades) * trades["shares"].to_numpy(dtype=np.float64)
+    signed_cost = signed_shares * trades["entry_fill_price"].to_numpy(dtype=np.float64)
+    gross_pl = trades["gross_pl"].to_numpy(dtype=np.float64, na_value=0.0)
+    
+    # Cash: entry commission at the entry step, P/L less the exit commission at the exit step
+    cash = np.zeros(steps + 1)
+    np.add.at(cash, entries, -commission)
+    np.add.at(cash, exits, gross_pl - commission)
+    realized = np.cumsum(cash[:steps])
+    
+    # Holdings per ticker: add at the entry step, remove at the exit step, then accumulate.
+    # Trades in tickers without bars only count once realized.
+    marked = ticker_codes >= 0
+    held = (ticker_codes[marked], entries[marked]), (ticker_codes[marked], exits[marked])
+    shares = np.zeros((len(tickers), steps + 1))
+    cost = np.zeros((len(tickers), steps + 1))
+    np.add.at(shares, held[0], signed_shares[marked])
+    np.add.at(shares, held[1], -signed_shares[marked])
+    np.add.at(cost, held[0], signed_cost[marked])
+    np.add.at(cost, held[1], -signed_cost[marked])
+    shares = np.cumsum(shares[:, :steps], axis=1)
+    cost = np.cumsum(cost[:, :steps], axis=1)
+    # Without a close yet a position is carried at its entry price
+    holding = np.where(np.isnan(marks), cost, shares * marks)
+    unrealized = (holding - cost).sum(axis=0)
+    # Rounding can leave tiny residues where nothing is held
+    unrealized[np.abs(unrealized) < 1e-9] = 0.0
+    
+    positions = np.zeros(steps + 1, dtype=np.int64)
+    np.add.at(positions, entries, 1)
+    np.add.at(positions, exits, -1)
+    
+    return pd.DataFrame({
+        "equity": initial_capital + realized + unrealized,
+        "realized_pl": realized,
+        "unrealized_pl": unrealized,
+        "open_positions": np.cumsum(positions[:steps])
+    }, index=index)
+
+def equity_from_bar_store(trades: pd.DataFrame, initial_capital: float = INITIAL_PORTFOLIO_VALUE,
+                          interval: str = INTRADAY_INTERVAL, bar_store: BarStore = None) -> pd.DataFrame:
+    """reconstruct_equity() over the cached bars of the traded tickers, from the first entry to the last exit"""
+    if trades.empty:
+        return pd.DataFrame(columns=EQUITY_COLUMNS, dtype=np.float64)
+    start = pd.to_datetime(trades["entry_time"]).min()
+    end = pd.to_datetime(trades["exit_time"]).max()
+    closes = load_bar_closes(list(trades["ticker"].unique()), start, end, interval, bar_store)
+    missing = set(trades["ticker"].unique()) - set(closes)
+    if missing:
+        logger.warning(f"No cached {interval} bars for {', '.join(sorted(missing))}; "
+                       f"their trades count only once closed")
+    return reconstruct_equity(trades, closes, initial_capital)
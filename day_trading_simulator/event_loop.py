@@ -0,0 +1,114 @@
+"""
+Event loop driving the simulator: timed events and data arrivals from one priority queue
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta, time as dt_time
+from typing import Callable, List, Optional
+from config import *
+from clock import Clock
+
+logger = logging.getLogger(__name__)
+
+# Event kinds
+NEW_BAR = "new_bar"  # A ticker printed a new bar
+PRICE_TICK = "price_tick"  # A subscribed ticker's current price changed
+FEED_REFRESHED = "feed_refreshed"  # The feed finished a refresh of all tickers
+FEED_POLL = "feed_poll"  # Time to refresh a feed that has no thread of its own
+POSITION_SWEEP = "position_sweep"  # Time to check every open position, for time-based exits
+DAILY_RESET = "daily_reset"
+EXPORT_LOG = "export_log"  # Time to rebuild the Excel workbook from the trade journal
+MARKET_OPENED = "market_opened"
+MARKET_CLOSED = "market_closed"
+
+@dataclass
+class Event:
+    kind: str
+    ticker: Optional[str] = None
+    time: Optional[datetime] = None  # When the event is due; posted events are due immediately
+
+class EventLoop:
+    """Dispatches events in time order from a single priority queue
+    
+    Timed events wait in the queue until the clock reaches them; events posted
+    from other threads (such as the data feed's) are due at once and wake the
+    loop immediately, as does stop(). On a simulated clock the loop jumps
+    straight to the next due event instead of waiting, or waits the scaled
+    real time when the clock has a speed.
+    """
+    
+    def __init__(self, clock: Clock):
+        self.clock = clock
+        self.handlers = {}  # {kind: [handler(event)]}
+        self.stopped = False
+        self._queue = []  # heap of (due time, sequence, Event)
+        self._sequence = itertools.count()  # Keeps events due at the same time in posting order
+        self._condition = threading.Condition()
+    
+    def on(self, kind: str, handler: Callable[[Event], None]):
+        """Call handler for every event of the given kind"""
+        self.handlers.setdefault(kind, []).append(handler)
+    
+    def post(self, kind: str, ticker: str = None):
+        """Queue an event that is due now (safe to call from any thread)"""
+        self.schedule(self.clock.now(), kind, ticker)
+    
+    def schedule(self, when: datetime, kind: str, ticker: str = None):
+        """Queue an event that becomes due at the given clock time"""
+        with self._condition:
+            heapq.heappush(self._queue, (when, next(self._sequence), Event(kind, ticker, when)))
+            self._condition.notify()
+    
+    def stop(self):
+        """Stop the loop for good; run() returns as soon as the current handler finishes"""
+        with self._condition:
+            self.stopped = True
+            self._condition.notify()
+    
+    def run(self):
+        """Dispatch events until stop() is called"""
+        while True:
+            event = self._next_event()
+            if event is None:
+                return
+            for handler in self.handlers.get(event.kind, []):
+                try:
+                    handler(event)
+                except Exception as e:
+                    logger.error(f"Error handling {event.kind} event: {e}")
+    
+    def _next_event(self) -> Optional[Event]:
+        """Block until an event is due and pop it, or return None once stopped"""
+        with self._condition:
+            while not self.stopped:
+                if not self._queue:
+                    self._condition.wait()
+                    continue
+                
+                when = self._queue[0][0]
+                delay = (when - self.clock.now()).total_seconds()
+                if delay > 0:
+                    if not self.clock.is_simulated:
+                        self._condition.wait(delay)
+                        continue
+                    speed = getattr(self.clock, "speed", None)
+                    if speed and self._condition.wait(delay / speed):
+                        continue  # Woken by a new event or stop(); look again
+                    self.clock.set_time(when)
+                
+                return heapq.heappop(self._queue)[2]
+            return None
+
+def next_time_of_day(now: datetime, time_of_day: str, days: List[str] = None) -> datetime:
+    """First datetime after now at the "HH:MM" time of day, on one of the given weekdays if any"""
+    hour, minute = (int(part) for part in time_of_day.split(":"))
+    candidate = datetime.combine(now.date(), dt_time(hour, minute))
+    if candidate <= now:
+        candidate += timedelta(days=1)
+    while days and candidate.strftime("%A") not in days:
+        candidate += timedelta(days=1)
+    return candidate
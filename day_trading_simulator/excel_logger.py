@@ -3,360 +3,387 @@ Excel Logging System for Trading Data
 """
 
 import pandas as pd
+import numpy as np
 import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.formatting.rule import CellIsRule
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from openpyxl.utils.dataframe import dataframe_to_rows
+from openpyxl.utils import get_column_letter
+from dataclasses import replace
 from datetime import datetime
 import os
 import logging
 from typing import List, Dict, Optional
 from config import *
 from portfolio_manager import Trade
+from trade_journal import TradeJournal, JOURNAL_COLUMNS
+from trade_store import TradeStore
+from performance_metrics import daily_pl_metrics
 
 logger = logging.getLogger(__name__)
 
+# Styles are created once and shared by every cell and rule that uses them
+HEADER_FONT = Font(bold=True, color="FFFFFF")
+HEADER_FILL = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+HEADER_ALIGNMENT = Alignment(horizontal="center", vertical="center")
+THIN_BORDER = Border(left=Side(style='thin'), right=Side(style='thin'),
+                     top=Side(style='thin'), bottom=Side(style='thin'))
+SUBHEADER_FONT = Font(bold=True)
+SUBHEADER_FILL = PatternFill(start_color="D9E1F2", end_color="D9E1F2", fill_type="solid")
+WIN_FILL = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
+LOSS_FILL = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
+
+# Widths of the "Trading Log" columns, in JOURNAL_COLUMNS order
+LOG_COLUMN_WIDTHS = [12, 10, 15, 12, 15, 20, 20, 18, 15, 18, 15, 15, 8, 12, 15, 18,
+                     20, 12, 18, 12, 18, 10, 18, 12, 12, 10, 12, 15, 15, 30, 30, 15]
+
+SUMMARY_METRICS = [
+    ("Total Trades", "Total number of completed trades"),
+    ("Winning Trades", "Number of profitable trades"),
+    ("Losing Trades", "Number of losing trades"),
+    ("Win Rate (%)", "Percentage of winning trades"),
+    ("Total Profit ($)", "Total profit from winning trades"),
+    ("Total Loss ($)", "Total loss from losing trades"),
+    ("Net Profit ($)", "Net profit/loss"),
+    ("Average Win ($)", "Average profit per winning trade"),
+    ("Average Loss ($)", "Average loss per losing trade"),
+    ("Profit Factor", "Total profit / Total loss"),
+    ("Max Drawdown (%)", "Maximum peak-to-trough decline"),
+    ("Sharpe Ratio", "Risk-adjusted return measure"),
+    ("Sortino Ratio", "Return per unit of downside risk"),
+    ("Calmar Ratio", "Annualized return / max daily drawdown"),
+    ("Last Updated", "Last time data was updated")
+]
+
+class _SummaryAccumulator:
+    """Summary sheet statistics accumulated over journal chunks"""
+    
+    def __init__(self):
+        self.total_trades = 0
+        self.winning_trades = 0
+        self.losing_trades = 0
+        self.total_profit = 0.0
+        self.total_loss = 0.0
+        self.peak = -np.inf  # Highest cumulative P/L so far
+        self.max_drawdown = 0.0
+        self.daily_pl = pd.Series(dtype=np.float64)  # P/L by exit date, for the ratios
+    
+    def add(self, chunk: pd.DataFrame):
+        if chunk.empty:
+            return
+        self.total_trades += len(chunk)
+        self.winning_trades += int((chunk['Win/Loss'] == 'Win').sum())
+        self.losing_trades += int((chunk['Win/Loss'] == 'Loss').sum())
+        pl = pd.to_numeric(chunk['Gross P/L ($)'], errors='coerce')
+        self.total_profit += float(pl[pl > 0].sum())
+        self.total_loss += float(-pl[pl < 0].sum())
+        exit_days = chunk['Exit Time'].fillna(chunk['Date']).astype(str).str[:10]
+        self.daily_pl = self.daily_pl.add(pl.fillna(0).groupby(exit_days.to_numpy()).sum(), fill_value=0)
+        
+        cumulative = pd.to_numeric(chunk['Cumulative P/L'], errors='coerce').fillna(0).to_numpy()
+        peak = np.maximum.accumulate(np.maximum(cumulative, self.peak))
+        drawdown = (cumulative - peak) / (peak + INITIAL_PORTFOLIO_VALUE) * 100
+        self.max_drawdown = min(self.max_drawdown, float(drawdown.min()))
+        self.peak = float(peak[-1])
+    
+    def result(self) -> Dict:
+        wins, losses = self.winning_trades, self.losing_trades
+        ratios = daily_pl_metrics(self.daily_pl.index.to_numpy(dtype="datetime64[D]"), self.daily_pl.to_numpy())
+        return {
+            "total_trades": self.total_trades,
+            "winning_trades": wins,
+            "losing_trades": losses,
+            "win_rate": wins / self.total_trades * 100 if self.total_trades else 0,
+            "total_profit": self.total_profit,
+            "total_loss": self.total_loss,
+            "net_profit": self.total_profit - self.total_loss,
+            "avg_win": self.total_profit / wins if wins else 0,
+            "avg_loss": self.total_loss / losses if losses else 0,
+            "profit_factor": self.total_profit / self.total_loss if self.total_loss > 0 else float('inf'),
+            "max_drawdown": self.max_drawdown,
+            "sharpe_ratio": ratios["sharpe_ratio"],
+            "sortino_ratio": ratios["sortino_ratio"],
+            "calmar_ratio": ratios["calmar_ratio"]
+        }
+
+def annotate_trades(trades: List[Trade], market_directions: Dict[str, str] = None,
+                    atr_data: Dict[str, float] = None, entry_signals: Dict[str, str] = None) -> List[Trade]:
+    """Copies of the trades with the per-ticker entry context filled in"""
+    market_directions = market_directions or {}
+    atr_data = atr_data or {}
+    entry_signals = entry_signals or {}
+    return [
+        replace(trade, market_direction=market_directions.get(trade.ticker, ""),
+                atr_at_entry=atr_data.get(trade.ticker, 0.0),
+                entry_signal=entry_signals.get(trade.ticker, ""))
+        for trade in trades
+    ]
+
 class ExcelLogger:
-    def __init__(self, excel_file: str = EXCEL_FILE):
+    """Trade log: an append-only journal, with the formatted workbook rebuilt from it
+    
+    Logging a trade only appends to the journal, and inserts it into the
+    SQLite trade store that answers queries. The workbook is regenerated by
+    export_excel(), which the simulator calls every EXCEL_EXPORT_INTERVAL
+    seconds and on stop.
+    """
+    
+    def __init__(self, excel_file: str = EXCEL_FILE, journal_file: str = JOURNAL_FILE,
+                 store_file: str = TRADE_STORE_FILE):
         self.excel_file = excel_file
-        self.columns = [
-            "Date", "Ticker", "Market Direction", "Strategy", "Strategy Version",
-            "Entry Time", "Exit Time", "Entry Price (intended)", "Entry Fill Price",
-            "Exit Price (intended)", "Exit Fill Price", "Stop Loss Price", "Shares",
-            "Total Price", "Account Size ($)", "$ Risked (per trade)", "% of Portfolio Risked",
-            "Gross P/L ($)", "% Return on Trade", "R Multiple", "Trade Duration (min)",
-            "Win/Loss", "Setup Quality (1–5)", "Order ID", "Commission", "Slippage",
-            "ATR at Entry", "Entry Signal", "Exit Signal", "Notes", "Closing Notes",
-            "Cumulative P/L"
-        ]
+        self.columns = list(JOURNAL_COLUMNS)
+        
+        is_new_journal = not os.path.exists(journal_file)
+        self.journal = TradeJournal(journal_file)
+        self.has_unexported_trades = False
+        if is_new_journal:
+            self._import_existing_workbook()
+        
+        self.store = TradeStore(store_file)
+        self.closed = False
+        if len(self.store) == 0:
+            self._import_journal()
         
         self._initialize_excel_file()
     
+    def _import_journal(self):
+        """Fill a new trade store from the journal"""
+        try:
+            journal = self.journal.read()
+            if not journal.empty:
+                self.store.insert_journal_rows(journal)
+                logger.info(f"Loaded {len(journal)} journaled trades into {self.store.path}")
+        except Exception as e:
+            logger.error(f"Error loading the trade journal into {self.store.path}: {e}")
+    
+    def _import_existing_workbook(self):
+        """Seed a new journal with the trades of a workbook written before the journal existed"""
+        if not os.path.exists(self.excel_file):
+            return
+        try:
+            df = pd.read_excel(self.excel_file, sheet_name="Trading Log")
+        except Exception as e:
+            logger.error(f"Error reading {self.excel_file} into the trade journal: {e}")
+            return
+        if not df.empty:
+            self.journal.append(df.reindex(columns=self.columns).to_dict("records"))
+            self.journal.sync()
+            logger.info(f"Imported {len(df)} trades from {self.excel_file} into the trade journal")
+    
     def _initialize_excel_file(self):
-        """Initialize Excel file with headers if it doesn't exist"""
+        """Create the workbook from the journal if it doesn't exist"""
         if not os.path.exists(self.excel_file):
-            try:
-                # Create new workbook
-                wb = openpyxl.Workbook()
-                ws = wb.active
-                ws.title = "Trading Log"
-                
-                # Add headers
-                for col, header in enumerate(self.columns, 1):
-                    cell = ws.cell(row=1, column=col, value=header)
-                    cell.font = Font(bold=True, color="FFFFFF")
-                    cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-                    cell.alignment = Alignment(horizontal="center", vertical="center")
-                    cell.border = Border(
-                        left=Side(style='thin'),
-                        right=Side(style='thin'),
-                        top=Side(style='thin'),
-                        bottom=Side(style='thin')
-                    )
-                
-                # Set column widths
-                column_widths = {
-                    'A': 12, 'B': 10, 'C': 15, 'D': 12, 'E': 15,
-                    'F': 20, 'G': 20, 'H': 18, 'I': 15, 'J': 18,
-                    'K': 15, 'L': 15, 'M': 8, 'N': 12, 'O': 15,
-                    'P': 18, 'Q': 20, 'R': 12, 'S': 18, 'T': 12,
-                    'U': 18, 'V': 10, 'W': 18, 'X': 12, 'Y': 12,
-                    'Z': 10, 'AA': 12, 'AB': 15, 'AC': 15, 'AD': 30,
-                    'AE': 30, 'AF': 15
-                }
-                
-                for col, width in column_widths.items():
-                    ws.column_dimensions[col].width = width
-                
-                # Create summary sheet
-                summary_ws = wb.create_sheet("Summary")
-                self._create_summary_sheet(summary_ws)
-                
-                # Create performance sheet
-                performance_ws = wb.create_sheet("Performance")
-                self._create_performance_sheet(performance_ws)
-                
-                wb.save(self.excel_file)
-                logger.info(f"Created new Excel file: {self.excel_file}")
-                
-            except Exception as e:
-                logger.error(f"Error creating Excel file: {e}")
+            self.export_excel()
+            logger.info(f"Created new Excel file: {self.excel_file}")
     
-    def _create_summary_sheet(self, ws):
-        """Create summary sheet with key metrics"""
-        headers = [
-            "Metric", "Value", "Description"
-        ]
-        
-        # Add headers
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.font = Font(bold=True)
-            cell.fill = PatternFill(start_color="D9E1F2", end_color="D9E1F2", fill_type="solid")
-        
-        # Add summary data placeholders
-        summary_data = [
-            ["Total Trades", "", "Total number of completed trades"],
-            ["Winning Trades", "", "Number of profitable trades"],
-            ["Losing Trades", "", "Number of losing trades"],
-            ["Win Rate (%)", "", "Percentage of winning trades"],
-            ["Total Profit ($)", "", "Total profit from winning trades"],
-            ["Total Loss ($)", "", "Total loss from losing trades"],
-            ["Net Profit ($)", "", "Net profit/loss"],
-            ["Average Win ($)", "", "Average profit per winning trade"],
-            ["Average Loss ($)", "", "Average loss per losing trade"],
-            ["Profit Factor", "", "Total profit / Total loss"],
-            ["Max Drawdown (%)", "", "Maximum peak-to-trough decline"],
-            ["Sharpe Ratio", "", "Risk-adjusted return measure"],
-            ["Last Updated", "", "Last time data was updated"]
-        ]
-        
-        for row, data in enumerate(summary_data, 2):
-            for col, value in enumerate(data, 1):
-                ws.cell(row=row, column=col, value=value)
-        
-        # Set column widths
+    def _styled_row(self, ws, values: List, font: Font, fill: PatternFill, alignment: Alignment = None,
+                    border: Border = None) -> List[WriteOnlyCell]:
+        """Header cells for a write-only sheet, sharing the given style objects"""
+        cells = []
+        for value in values:
+            cell = WriteOnlyCell(ws, value=value)
+            cell.font = font
+            cell.fill = fill
+            if alignment:
+                cell.alignment = alignment
+            if border:
+                cell.border = border
+            cells.append(cell)
+        return cells
+    
+    def _create_summary_sheet(self, ws, stats: Dict = None):
+        """Create summary sheet with key metrics (placeholders without stats)"""
         ws.column_dimensions['A'].width = 20
         ws.column_dimensions['B'].width = 15
         ws.column_dimensions['C'].width = 40
+        ws.append(self._styled_row(ws, ["Metric", "Value", "Description"], SUBHEADER_FONT, SUBHEADER_FILL))
+        
+        if stats:
+            values = [
+                stats["total_trades"], stats["winning_trades"], stats["losing_trades"],
+                f"{stats['win_rate']:.2f}", f"{stats['total_profit']:.2f}", f"{stats['total_loss']:.2f}",
+                f"{stats['net_profit']:.2f}", f"{stats['avg_win']:.2f}", f"{stats['avg_loss']:.2f}",
+                f"{stats['profit_factor']:.2f}", f"{stats['max_drawdown']:.2f}", f"{stats['sharpe_ratio']:.2f}",
+                f"{stats['sortino_ratio']:.2f}", f"{stats['calmar_ratio']:.2f}",
+                datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            ]
+        else:
+            values = [""] * len(SUMMARY_METRICS)
+        for (metric, description), value in zip(SUMMARY_METRICS, values):
+            ws.append([metric, value, description])
     
     def _create_performance_sheet(self, ws):
         """Create performance tracking sheet"""
+        column_widths = {'A': 12, 'B': 12, 'C': 15, 'D': 15, 'E': 12, 
+                        'F': 15, 'G': 15, 'H': 12, 'I': 20}
+        for col, width in column_widths.items():
+            ws.column_dimensions[col].width = width
+        
         headers = [
             "Date", "Total Trades", "Winning Trades", "Losing Trades", 
             "Win Rate (%)", "Daily P/L ($)", "Cumulative P/L ($)", 
             "Drawdown (%)", "Trades by Strategy"
         ]
-        
-        # Add headers
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.font = Font(bold=True)
-            cell.fill = PatternFill(start_color="D9E1F2", end_color="D9E1F2", fill_type="solid")
-        
-        # Set column widths
-        column_widths = {'A': 12, 'B': 12, 'C': 15, 'D': 15, 'E': 12, 
-                        'F': 15, 'G': 15, 'H': 12, 'I': 20}
-        for col, width in column_widths.items():
-            ws.column_dimensions[col].width = width
+        ws.append(self._styled_row(ws, headers, SUBHEADER_FONT, SUBHEADER_FILL))
+    
+    def _trade_row(self, trade: Trade, market_direction: str = "", atr_at_entry: float = 0.0,
+                   entry_signal: str = "") -> Dict:
+        """A trade as a "Trading Log" row"""
+        return {
+            "Date": trade.date,
+            "Ticker": trade.ticker,
+            "Market Direction": market_direction,
+            "Strategy": trade.strategy,
+            "Strategy Version": trade.strategy_version,
+            "Entry Time": trade.entry_time.strftime("%Y-%m-%d %H:%M:%S"),
+            "Exit Time": trade.exit_time.strftime("%Y-%m-%d %H:%M:%S") if trade.exit_time else "",
+            "Entry Price (intended)": trade.entry_price_intended,
+            "Entry Fill Price": trade.entry_fill_price,
+            "Exit Price (intended)": trade.exit_price_intended or "",
+            "Exit Fill Price": trade.exit_fill_price or "",
+            "Stop Loss Price": trade.stop_loss_price,
+            "Shares": trade.shares,
+            "Total Price": trade.total_price,
+            "Account Size ($)": trade.account_size,
+            "$ Risked (per trade)": trade.risk_amount,
+            "% of Portfolio Risked": trade.portfolio_risk_pct,
+            "Gross P/L ($)": trade.gross_pl or 0,
+            "% Return on Trade": trade.return_pct or 0,
+            "R Multiple": trade.r_multiple or 0,
+            "Trade Duration (min)": trade.trade_duration_min or 0,
+            "Win/Loss": trade.win_loss or "",
+            "Setup Quality (1–5)": trade.setup_quality,
+            "Order ID": trade.order_id,
+            "Commission": trade.commission,
+            "Slippage": trade.slippage,
+            "ATR at Entry": atr_at_entry,
+            "Entry Signal": entry_signal,
+            "Exit Signal": trade.exit_signal,
+            "Notes": trade.notes,
+            "Closing Notes": trade.closing_notes,
+            "Cumulative P/L": trade.cumulative_pl
+        }
     
     def log_trade(self, trade: Trade, market_direction: str = "", 
                   atr_at_entry: float = 0.0, entry_signal: str = ""):
-        """Log a completed trade to Excel"""
+        """Log a completed trade to the journal"""
         try:
-            # Read existing data
-            df = pd.read_excel(self.excel_file, sheet_name="Trading Log")
-            
-            # Create new row
-            new_row = {
-                "Date": trade.date,
-                "Ticker": trade.ticker,
-                "Market Direction": market_direction,
-                "Strategy": trade.strategy,
-                "Strategy Version": trade.strategy_version,
-                "Entry Time": trade.entry_time.strftime("%Y-%m-%d %H:%M:%S"),
-                "Exit Time": trade.exit_time.strftime("%Y-%m-%d %H:%M:%S") if trade.exit_time else "",
-                "Entry Price (intended)": trade.entry_price_intended,
-                "Entry Fill Price": trade.entry_fill_price,
-                "Exit Price (intended)": trade.exit_price_intended or "",
-                "Exit Fill Price": trade.exit_fill_price or "",
-                "Stop Loss Price": trade.stop_loss_price,
-                "Shares": trade.shares,
-                "Total Price": trade.total_price,
-                "Account Size ($)": trade.account_size,
-                "$ Risked (per trade)": trade.risk_amount,
-                "% of Portfolio Risked": trade.portfolio_risk_pct,
-                "Gross P/L ($)": trade.gross_pl or 0,
-                "% Return on Trade": trade.return_pct or 0,
-                "R Multiple": trade.r_multiple or 0,
-                "Trade Duration (min)": trade.trade_duration_min or 0,
-                "Win/Loss": trade.win_loss or "",
-                "Setup Quality (1–5)": trade.setup_quality,
-                "Order ID": trade.order_id,
-                "Commission": trade.commission,
-                "Slippage": trade.slippage,
-                "ATR at Entry": atr_at_entry,
-                "Entry Signal": entry_signal,
-                "Exit Signal": trade.exit_signal,
-                "Notes": trade.notes,
-                "Closing Notes": trade.closing_notes,
-                "Cumulative P/L": trade.cumulative_pl
-            }
-            
-            # Append new row
-            df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-            
-            # Write back to Excel
-            self._write_to_excel(df)
-            
-            logger.info(f"Logged trade {trade.order_id} to Excel")
+            self.journal.append([self._trade_row(trade, market_direction, atr_at_entry, entry_signal)])
+            self.store.insert_trades([replace(trade, market_direction=market_direction,
+                                              atr_at_entry=atr_at_entry, entry_signal=entry_signal)])
+            self.has_unexported_trades = True
+            logger.info(f"Logged trade {trade.order_id} to the journal")
             
         except Exception as e:
-            logger.error(f"Error logging trade to Excel: {e}")
+            logger.error(f"Error logging trade to the journal: {e}")
     
     def log_multiple_trades(self, trades: List[Trade], market_directions: Dict[str, str] = None,
                            atr_data: Dict[str, float] = None, entry_signals: Dict[str, str] = None):
         """Log multiple trades at once"""
+        self.log_annotated_trades(annotate_trades(trades, market_directions, atr_data, entry_signals))
+    
+    def log_annotated_trades(self, trades: List[Trade]):
+        """Log trades whose market direction, ATR and entry signal are already set (see annotate_trades)"""
         try:
-            # Read existing data
-            df = pd.read_excel(self.excel_file, sheet_name="Trading Log")
-            
-            new_rows = []
-            for trade in trades:
-                market_direction = market_directions.get(trade.ticker, "") if market_directions else ""
-                atr_at_entry = atr_data.get(trade.ticker, 0.0) if atr_data else 0.0
-                entry_signal = entry_signals.get(trade.ticker, "") if entry_signals else ""
-                
-                new_row = {
-                    "Date": trade.date,
-                    "Ticker": trade.ticker,
-                    "Market Direction": market_direction,
-                    "Strategy": trade.strategy,
-                    "Strategy Version": trade.strategy_version,
-                    "Entry Time": trade.entry_time.strftime("%Y-%m-%d %H:%M:%S"),
-                    "Exit Time": trade.exit_time.strftime("%Y-%m-%d %H:%M:%S") if trade.exit_time else "",
-                    "Entry Price (intended)": trade.entry_price_intended,
-                    "Entry Fill Price": trade.entry_fill_price,
-                    "Exit Price (intended)": trade.exit_price_intended or "",
-                    "Exit Fill Price": trade.exit_fill_price or "",
-                    "Stop Loss Price": trade.stop_loss_price,
-                    "Shares": trade.shares,
-                    "Total Price": trade.total_price,
-                    "Account Size ($)": trade.account_size,
-                    "$ Risked (per trade)": trade.risk_amount,
-                    "% of Portfolio Risked": trade.portfolio_risk_pct,
-                    "Gross P/L ($)": trade.gross_pl or 0,
-                    "% Return on Trade": trade.return_pct or 0,
-                    "R Multiple": trade.r_multiple or 0,
-                    "Trade Duration (min)": trade.trade_duration_min or 0,
-                    "Win/Loss": trade.win_loss or "",
-                    "Setup Quality (1–5)": trade.setup_quality,
-                    "Order ID": trade.order_id,
-                    "Commission": trade.commission,
-                    "Slippage": trade.slippage,
-                    "ATR at Entry": atr_at_entry,
-                    "Entry Signal": entry_signal,
-                    "Exit Signal": trade.exit_signal,
-                    "Notes": trade.notes,
-                    "Closing Notes": trade.closing_notes,
-                    "Cumulative P/L": trade.cumulative_pl
-                }
-                new_rows.append(new_row)
-            
-            # Append new rows
-            df = pd.concat([df, pd.DataFrame(new_rows)], ignore_index=True)
-            
-            # Write back to Excel
-            self._write_to_excel(df)
-            
-            logger.info(f"Logged {len(trades)} trades to Excel")
+            self.journal.append([
+                self._trade_row(trade, trade.market_direction, trade.atr_at_entry, trade.entry_signal)
+                for trade in trades
+            ])
+            self.store.insert_trades(trades)
+            self.has_unexported_trades = True
+            logger.info(f"Logged {len(trades)} trades to the journal")
             
         except Exception as e:
-            logger.error(f"Error logging multiple trades to Excel: {e}")
+            logger.error(f"Error logging multiple trades to the journal: {e}")
     
-    def _write_to_excel(self, df: pd.DataFrame):
-        """Write DataFrame to Excel with formatting"""
+    def export_excel(self):
+        """Rebuild the formatted workbook from the journal"""
         try:
-            with pd.ExcelWriter(self.excel_file, engine='openpyxl', mode='w') as writer:
-                # Write main trading log
-                df.to_excel(writer, sheet_name='Trading Log', index=False)
-                
-                # Get workbook and worksheet for formatting
-                wb = writer.book
-                ws = wb['Trading Log']
-                
-                # Format headers
-                for col in range(1, len(self.columns) + 1):
-                    cell = ws.cell(row=1, column=col)
-                    cell.font = Font(bold=True, color="FFFFFF")
-                    cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-                    cell.alignment = Alignment(horizontal="center", vertical="center")
-                
-                # Format data rows
-                for row in range(2, len(df) + 2):
-                    for col in range(1, len(self.columns) + 1):
-                        cell = ws.cell(row=row, column=col)
-                        
-                        # Color code win/loss
-                        if col == self.columns.index("Win/Loss") + 1:  # Win/Loss column
-                            if cell.value == "Win":
-                                cell.fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
-                            elif cell.value == "Loss":
-                                cell.fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
-                        
-                        # Color code P/L
-                        elif col == self.columns.index("Gross P/L ($)") + 1:  # P/L column
-                            if isinstance(cell.value, (int, float)):
-                                if cell.value > 0:
-                                    cell.fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
-                                elif cell.value < 0:
-                                    cell.fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
-                
-                # Recreate summary and performance sheets
-                summary_ws = wb.create_sheet("Summary")
-                performance_ws = wb.create_sheet("Performance")
-                self._create_summary_sheet(summary_ws)
-                self._create_performance_sheet(performance_ws)
-                
-                # Update summary with current data
-                self._update_summary_sheet(summary_ws, df)
-                
+            if self._write_to_excel():
+                self.has_unexported_trades = False
+                logger.info(f"Exported the trade journal to {self.excel_file}")
         except Exception as e:
-            logger.error(f"Error writing to Excel: {e}")
+            logger.error(f"Error exporting the trade journal to Excel: {e}")
     
-    def _update_summary_sheet(self, ws, df: pd.DataFrame):
-        """Update summary sheet with current statistics"""
+    def sync(self):
+        """Force the journal to disk and bring the workbook up to date"""
+        self.journal.sync()
+        if self.has_unexported_trades:
+            self.export_excel()
+    
+    def close(self):
+        if self.closed:
+            return
+        self.sync()
+        self.journal.close()
+        self.store.close()
+        self.closed = True
+    
+    def open(self):
+        """Reopen the journal and the trade store after close()"""
+        if self.closed:
+            self.journal = TradeJournal(self.journal.path)
+            self.store = TradeStore(self.store.path)
+            self.closed = False
+    
+    def _write_to_excel(self):
+        """Stream the journal into a freshly written workbook
+        
+        Rows go through openpyxl's write-only mode a chunk at a time, so memory
+        stays bounded however long the journal is. Win/Loss and Gross P/L are
+        colored by sheet-level conditional formatting instead of per-cell
+        fills, and the summary statistics are accumulated while streaming.
+        The workbook is written to a temporary file and moved into place.
+        """
+        temp_file = f"{self.excel_file}.tmp"
         try:
-            if df.empty:
-                return
+            wb = openpyxl.Workbook(write_only=True)
+            ws = wb.create_sheet("Trading Log")
+            for col, width in enumerate(LOG_COLUMN_WIDTHS, 1):
+                ws.column_dimensions[get_column_letter(col)].width = width
+            ws.freeze_panes = "A2"
+            ws.append(self._styled_row(ws, self.columns, HEADER_FONT, HEADER_FILL, HEADER_ALIGNMENT,
+                                       THIN_BORDER))
             
-            # Calculate metrics
-            total_trades = len(df)
-            winning_trades = len(df[df['Win/Loss'] == 'Win'])
-            losing_trades = len(df[df['Win/Loss'] == 'Loss'])
-            win_rate = (winning_trades / total_trades * 100) if total_trades > 0 else 0
+            stats = _SummaryAccumulator()
+            rows = 0
+            for chunk in self.journal.read_chunks(EXCEL_EXPORT_CHUNK_ROWS):
+                chunk = chunk.reindex(columns=self.columns)
+                stats.add(chunk)
+                for row in chunk.astype(object).where(chunk.notna(), None).itertuples(index=False, name=None):
+                    ws.append(row)
+                rows += len(chunk)
             
-            total_profit = df[df['Gross P/L ($)'] > 0]['Gross P/L ($)'].sum() if winning_trades > 0 else 0
-            total_loss = abs(df[df['Gross P/L ($)'] < 0]['Gross P/L ($)'].sum()) if losing_trades > 0 else 0
-            net_profit = total_profit - total_loss
+            if rows:
+                last_row = rows + 1
+                win_loss = get_column_letter(self.columns.index("Win/Loss") + 1)
+                ws.conditional_formatting.add(f"{win_loss}2:{win_loss}{last_row}",
+                                              CellIsRule(operator="equal", formula=['"Win"'], fill=WIN_FILL))
+                ws.conditional_formatting.add(f"{win_loss}2:{win_loss}{last_row}",
+                                              CellIsRule(operator="equal", formula=['"Loss"'], fill=LOSS_FILL))
+                gross_pl = get_column_letter(self.columns.index("Gross P/L ($)") + 1)
+                ws.conditional_formatting.add(f"{gross_pl}2:{gross_pl}{last_row}",
+                                              CellIsRule(operator="greaterThan", formula=["0"], fill=WIN_FILL))
+                ws.conditional_formatting.add(f"{gross_pl}2:{gross_pl}{last_row}",
+                                              CellIsRule(operator="lessThan", formula=["0"], fill=LOSS_FILL))
             
-            avg_win = total_profit / winning_trades if winning_trades > 0 else 0
-            avg_loss = total_loss / losing_trades if losing_trades > 0 else 0
-            profit_factor = total_profit / total_loss if total_loss > 0 else float('inf')
+            self._create_summary_sheet(wb.create_sheet("Summary"), stats.result() if rows else None)
+            self._create_performance_sheet(wb.create_sheet("Performance"))
             
-            # Calculate drawdown
-            df['Cumulative P/L'] = df['Cumulative P/L'].fillna(0)
-            peak = df['Cumulative P/L'].expanding().max()
-            drawdown = (df['Cumulative P/L'] - peak) / (peak + INITIAL_PORTFOLIO_VALUE) * 100
-            max_drawdown = drawdown.min()
+            wb.save(temp_file)
+            os.replace(temp_file, self.excel_file)
+            return True
             
-            # Update summary data
-            summary_data = [
-                ["Total Trades", total_trades, "Total number of completed trades"],
-                ["Winning Trades", winning_trades, "Number of profitable trades"],
-                ["Losing Trades", losing_trades, "Number of losing trades"],
-                ["Win Rate (%)", f"{win_rate:.2f}", "Percentage of winning trades"],
-                ["Total Profit ($)", f"{total_profit:.2f}", "Total profit from winning trades"],
-                ["Total Loss ($)", f"{total_loss:.2f}", "Total loss from losing trades"],
-                ["Net Profit ($)", f"{net_profit:.2f}", "Net profit/loss"],
-                ["Average Win ($)", f"{avg_win:.2f}", "Average profit per winning trade"],
-                ["Average Loss ($)", f"{avg_loss:.2f}", "Average loss per losing trade"],
-                ["Profit Factor", f"{profit_factor:.2f}", "Total profit / Total loss"],
-                ["Max Drawdown (%)", f"{max_drawdown:.2f}", "Maximum peak-to-trough decline"],
-                ["Sharpe Ratio", "TBD", "Risk-adjusted return measure"],
-                ["Last Updated", datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "Last time data was updated"]
-            ]
-            
-            for row, data in enumerate(summary_data, 2):
-                for col, value in enumerate(data, 1):
-                    ws.cell(row=row, column=col, value=value)
-                    
         except Exception as e:
-            logger.error(f"Error updating summary sheet: {e}")
+            logger.error(f"Error writing to Excel: {e}")
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+            return False
     
     def get_trading_history(self) -> pd.DataFrame:
-        """Get all trading history from Excel"""
+        """Get all trading history from the journal"""
         try:
-            return pd.read_excel(self.excel_file, sheet_name="Trading Log")
+            return self.journal.read()
         except Exception as e:
             logger.error(f"Error reading trading history: {e}")
             return pd.DataFrame()
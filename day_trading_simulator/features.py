@@ -0,0 +1,99 @@
+"""
+Per-ticker feature snapshots shared by every strategy evaluating the same bar
+"""
+
+from typing import Callable, Dict, Iterable, Optional, Tuple
+import numpy as np
+from config import *
+
+def _close_ago(data, bars: int) -> float:
+    # NaN rather than IndexError when the window is too short
+    return data['Close'].iloc[-1 - bars] if len(data) > bars else np.nan
+
+def _volume_ratio(data, window: int) -> float:
+    volume_avg = data['Volume'].rolling(window=window).mean().iloc[-1]
+    return data['Volume'].iloc[-1] / volume_avg if volume_avg > 0 else 1
+
+# Feature name -> function(history window, argument). Parameterized features
+# are requested as "name:argument", e.g. "sma:10" or "volume_ratio:20"
+FEATURES = {
+    "bars": lambda data, _: len(data),
+    "close": lambda data, _: data['Close'].iloc[-1],
+    "close_ago": _close_ago,  # Close the given number of bars before the latest
+    "volume_ratio": _volume_ratio,  # Latest volume over its rolling mean
+    "sma": lambda data, window: data['Close'].rolling(window=window).mean().iloc[-1],
+    # Highest 5-bar high / lowest 5-bar low over the last given number of bars
+    "resistance": lambda data, bars: data['High'].rolling(window=5).max().iloc[-bars:].max(),
+    "support": lambda data, bars: data['Low'].rolling(window=5).min().iloc[-bars:].min(),
+    "rsi": lambda data, _: data['RSI'].iloc[-1],
+    "macd_histogram": lambda data, _: data['MACD'].iloc[-1] - data['MACD_Signal'].iloc[-1],
+    "bb_upper": lambda data, _: data['BB_Upper'].iloc[-1],
+    "bb_middle": lambda data, _: data['BB_Middle'].iloc[-1],
+    "bb_lower": lambda data, _: data['BB_Lower'].iloc[-1]
+}
+
+def parse_features(names: Iterable[str]) -> Dict[str, Tuple[Callable, Optional[int]]]:
+    """Map feature names to (function, argument), raising ValueError for unknown features"""
+    specs = {}
+    for name in names:
+        feature, _, argument = name.partition(":")
+        if feature not in FEATURES:
+            raise ValueError(f"Unknown feature: {name}")
+        specs[name] = (FEATURES[feature], int(argument) if argument else None)
+    return specs
+
+class FeatureSnapshot(dict):
+    """Features of one ticker over one history window at one bar
+    
+    Every strategy reading the same history period of a ticker gets the same
+    snapshot, and each feature is computed the first time any of them reads
+    it. "price" is the current price; only features declared for the period
+    can be read.
+    """
+    
+    __slots__ = ("data", "specs")
+    
+    def __init__(self, data, price: Optional[float], specs: Dict[str, Tuple[Callable, Optional[int]]]):
+        super().__init__(price=price)
+        self.data = data
+        self.specs = specs
+    
+    @property
+    def price(self) -> Optional[float]:
+        return self["price"]
+    
+    def __missing__(self, name: str) -> float:
+        if name not in self.specs:
+            raise KeyError(f"Feature {name} was not declared by any strategy")
+        function, argument = self.specs[name]
+        value = self[name] = function(self.data, argument)
+        return value
+
+class FeatureBuilder:
+    """Hands out one FeatureSnapshot per ticker and history period per bar
+    
+    requirements maps each history period to the features the strategies
+    reading it declared. A snapshot is reused until the feed returns a
+    different history frame or a new current price.
+    """
+    
+    def __init__(self, data_feed, requirements: Dict[str, Iterable[str]]):
+        self.data_feed = data_feed
+        self.specs = {period: parse_features(["bars", *names]) for period, names in requirements.items()}
+        self._snapshots = {}  # {(ticker, period): FeatureSnapshot}
+    
+    def get(self, ticker: str, period: str) -> FeatureSnapshot:
+        data = self.data_feed.get_historical_data(ticker, period)
+        price = self.data_feed.get_current_price(ticker)
+        
+        snapshot = self._snapshots.get((ticker, period))
+        # The snapshot keeps its frame alive, so an identity match cannot be a recycled object
+        if snapshot is not None and snapshot.data is data and snapshot.price == price:
+            return snapshot
+        
+        specs = self.specs.get(period)
+        if specs is None:
+            specs = self.specs[period] = parse_features(["bars"])
+        snapshot = FeatureSnapshot(data, price, specs)
+        self._snapshots[(ticker, period)] = snapshot
+        return snapshot
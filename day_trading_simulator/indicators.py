@@ -0,0 +1,280 @@
+"""
+Technical indicators: batch (pandas) and streaming (constant time per bar) versions
+"""
+
+import math
+from collections import deque
+from typing import Dict, Optional
+import pandas as pd
+import numpy as np
+from config import *
+
+# Updates between exact recomputations of running window sums, to stop
+# floating point drift from accumulating over long streams
+RESYNC_INTERVAL = 1000
+
+def calculate_rsi(prices: pd.Series, period: int = 14) -> pd.Series:
+    """Calculate RSI indicator"""
+    delta = prices.diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
+    rs = gain / loss
+    rsi = 100 - (100 / (1 + rs))
+    return rsi.fillna(50)  # Fill NaN values with neutral RSI
+
+def calculate_macd(prices: pd.Series, fast: int = MACD_FAST, slow: int = MACD_SLOW) -> pd.Series:
+    """Calculate MACD indicator"""
+    ema_fast = prices.ewm(span=fast).mean()
+    ema_slow = prices.ewm(span=slow).mean()
+    macd = ema_fast - ema_slow
+    return macd.fillna(0)  # Fill NaN values with 0
+
+def calculate_atr(data: pd.DataFrame, period: int = 14) -> pd.Series:
+    """Calculate Average True Range"""
+    high_low = data['High'] - data['Low']
+    high_close = np.abs(data['High'] - data['Close'].shift())
+    low_close = np.abs(data['Low'] - data['Close'].shift())
+    
+    true_range = np.maximum(high_low, np.maximum(high_close, low_close))
+    atr = true_range.rolling(window=period).mean()
+    return atr.fillna(true_range.mean())  # Fill NaN with average true range
+
+def calculate_bollinger_bands(prices: pd.Series, period: int = 20, std_dev: float = 2) -> tuple:
+    """Calculate Bollinger Bands"""
+    sma = prices.rolling(window=period).mean()
+    std = prices.rolling(window=period).std()
+    upper_band = sma + (std * std_dev)
+    lower_band = sma - (std * std_dev)
+    
+    # Fill NaN values
+    sma = sma.fillna(prices.mean())
+    upper_band = upper_band.fillna(prices.mean() * (1 + std_dev * 0.1))
+    lower_band = lower_band.fillna(prices.mean() * (1 - std_dev * 0.1))
+    
+    return upper_band, sma, lower_band
+
+def indicator_columns(data: pd.DataFrame, macd_fast: int = MACD_FAST, macd_slow: int = MACD_SLOW,
+                      macd_signal: int = MACD_SIGNAL) -> pd.DataFrame:
+    """The standard indicator columns of an OHLCV frame, as a new frame on its index"""
+    indicators = pd.DataFrame(index=data.index)
+    indicators['SMA_20'] = data['Close'].rolling(window=20).mean()
+    indicators['SMA_50'] = data['Close'].rolling(window=50).mean()
+    indicators['RSI'] = calculate_rsi(data['Close'])
+    indicators['MACD'] = calculate_macd(data['Close'], macd_fast, macd_slow)
+    indicators['MACD_Signal'] = indicators['MACD'].ewm(span=macd_signal).mean()
+    indicators['ATR'] = calculate_atr(data)
+    indicators['BB_Upper'], indicators['BB_Middle'], indicators['BB_Lower'] = calculate_bollinger_bands(data['Close'])
+    return indicators
+
+def add_indicators(data: pd.DataFrame, macd_fast: int = MACD_FAST, macd_slow: int = MACD_SLOW,
+                   macd_signal: int = MACD_SIGNAL) -> pd.DataFrame:
+    """Add the standard indicator columns to an OHLCV frame in place"""
+    indicators = indicator_columns(data, macd_fast, macd_slow, macd_signal)
+    for column in indicators.columns:
+        data[column] = indicators[column]
+    return data
+
+class StreamingSMA:
+    """Simple moving average over a fixed window"""
+    
+    def __init__(self, period: int):
+        self.period = period
+        self.window = deque()
+        self.total = 0.0
+        self.updates = 0
+        self.value = float('nan')
+    
+    def update(self, value: float) -> float:
+        self.window.append(value)
+        self.total += value
+        if len(self.window) > self.period:
+            self.total -= self.window.popleft()
+        
+        self.updates += 1
+        if self.updates % RESYNC_INTERVAL == 0:
+            self.total = math.fsum(self.window)
+        
+        if len(self.window) == self.period:
+            self.value = self.total / self.period
+        return self.value
+
+class StreamingEMA:
+    """Exponential moving average matching pandas ewm(span=...).mean() (adjust=True)"""
+    
+    def __init__(self, span: int):
+        self.decay = 1 - 2 / (span + 1)
+        self.weighted_sum = 0.0
+        self.weight_total = 0.0
+        self.value = float('nan')
+    
+    def update(self, value: float) -> float:
+        self.weighted_sum = value + self.decay * self.weighted_sum
+        self.weight_total = 1 + self.decay * self.weight_total
+        self.value = self.weighted_sum / self.weight_total
+        return self.value
+
+class StreamingRSI:
+    """RSI over a rolling window of gains and losses, matching calculate_rsi"""
+    
+    def __init__(self, period: int = 14):
+        self.gains = StreamingSMA(period)
+        self.losses = StreamingSMA(period)
+        self.prev_close = None
+        self.value = 50.0
+    
+    def update(self, close: float) -> float:
+        # The first bar has no change; calculate_rsi counts it as a zero move
+        delta = 0.0 if self.prev_close is None else close - self.prev_close
+        self.prev_close = close
+        avg_gain = self.gains.update(max(delta, 0.0))
+        avg_loss = self.losses.update(max(-delta, 0.0))
+        
+        if math.isnan(avg_gain):
+            self.value = 50.0
+        elif avg_loss <= 0:
+            self.value = 100.0 if avg_gain > 0 else 50.0
+        else:
+            self.value = 100 - (100 / (1 + avg_gain / avg_loss))
+        return self.value
+
+class StreamingMACD:
+    """MACD line, signal line and histogram from three running EMAs"""
+    
+    def __init__(self, fast: int = MACD_FAST, slow: int = MACD_SLOW, signal: int = MACD_SIGNAL):
+        self.fast = StreamingEMA(fast)
+        self.slow = StreamingEMA(slow)
+        self.signal_ema = StreamingEMA(signal)
+        self.value = 0.0
+        self.signal = 0.0
+        self.histogram = 0.0
+    
+    def update(self, close: float) -> float:
+        self.value = self.fast.update(close) - self.slow.update(close)
+        self.signal = self.signal_ema.update(self.value)
+        self.histogram = self.value - self.signal
+        return self.value
+
+class StreamingATR:
+    """Rolling mean of true range, matching calculate_atr once the window is full"""
+    
+    def __init__(self, period: int = 14):
+        self.true_range = StreamingSMA(period)
+        self.prev_close = None
+        self.range_total = 0.0
+        self.range_count = 0
+        self.value = float('nan')
+    
+    def update(self, high: float, low: float, close: float) -> float:
+        if self.prev_close is None:
+            # No previous close, so no true range yet (NaN in the batch version)
+            self.prev_close = close
+            self.value = high - low
+            return self.value
+        
+        true_range = max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+        self.prev_close = close
+        self.range_total += true_range
+        self.range_count += 1
+        
+        atr = self.true_range.update(true_range)
+        # Until the window is full fall back to the average true range seen so far
+        self.value = self.range_total / self.range_count if math.isnan(atr) else atr
+        return self.value
+
+class StreamingBollingerBands:
+    """Bollinger Bands from a Welford-style rolling mean and variance"""
+    
+    def __init__(self, period: int = 20, std_dev: float = 2):
+        self.period = period
+        self.std_dev = std_dev
+        self.window = deque()
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.price_total = 0.0
+        self.price_count = 0
+        self.upper = self.middle = self.lower = float('nan')
+    
+    def update(self, close: float) -> tuple:
+        self.price_total += close
+        self.price_count += 1
+        
+        self.window.append(close)
+        delta = close - self.mean
+        self.mean += delta / len(self.window)
+        self.m2 += delta * (close - self.mean)
+        
+        if len(self.window) > self.period:
+            removed = self.window.popleft()
+            delta = removed - self.mean
+            self.mean -= delta / len(self.window)
+            self.m2 -= delta * (removed - self.mean)
+        
+        if self.price_count % RESYNC_INTERVAL == 0:
+            values = np.fromiter(self.window, dtype=float)
+            self.mean = values.mean()
+            self.m2 = float(((values - self.mean) ** 2).sum())
+        
+        if len(self.window) < self.period:
+            # Warm-up fill mirrors calculate_bollinger_bands, using the mean so far
+            average = self.price_total / self.price_count
+            self.middle = average
+            self.upper = average * (1 + self.std_dev * 0.1)
+            self.lower = average * (1 - self.std_dev * 0.1)
+        else:
+            std = math.sqrt(max(self.m2, 0.0) / (self.period - 1))
+            self.middle = self.mean
+            self.upper = self.mean + std * self.std_dev
+            self.lower = self.mean - std * self.std_dev
+        
+        return self.upper, self.middle, self.lower
+
+class IndicatorEngine:
+    """Incremental version of add_indicators for a single ticker"""
+    
+    def __init__(self):
+        self.sma_20 = StreamingSMA(20)
+        self.sma_50 = StreamingSMA(50)
+        self.rsi = StreamingRSI()
+        self.macd = StreamingMACD()
+        self.atr = StreamingATR()
+        self.bollinger = StreamingBollingerBands()
+        self.last_timestamp = None
+        self.bars = 0
+    
+    def seed(self, data: pd.DataFrame) -> 'IndicatorEngine':
+        """Replay an OHLCV history frame to warm up the indicators"""
+        highs = data['High'].to_numpy(dtype=float)
+        lows = data['Low'].to_numpy(dtype=float)
+        closes = data['Close'].to_numpy(dtype=float)
+        for high, low, close in zip(highs, lows, closes):
+            self.update(high, low, close)
+        if len(data):
+            self.last_timestamp = data.index[-1]
+        return self
+    
+    def update(self, high: float, low: float, close: float, timestamp=None) -> Dict[str, float]:
+        """Feed one new bar and return the latest indicator values"""
+        self.sma_20.update(close)
+        self.sma_50.update(close)
+        self.rsi.update(close)
+        self.macd.update(close)
+        self.atr.update(high, low, close)
+        self.bollinger.update(close)
+        self.bars += 1
+        if timestamp is not None:
+            self.last_timestamp = timestamp
+        return self.get_values()
+    
+    def get_values(self) -> Dict[str, float]:
+        """Latest values keyed like the columns added by add_indicators"""
+        return {
+            'SMA_20': self.sma_20.value,
+            'SMA_50': self.sma_50.value,
+            'RSI': self.rsi.value,
+            'MACD': self.macd.value,
+            'MACD_Signal': self.macd.signal,
+            'ATR': self.atr.value,
+            'BB_Upper': self.bollinger.upper,
+            'BB_Middle': self.bollinger.middle,
+            'BB_Lower': self.bollinger.lower
+        }
@@ -6,6 +6,8 @@ import subprocess
 import sys
 import os
 
+MIN_PYTHON = (3, 10)  # Slotted dataclasses
+
 def install_with_pip():
     """Install packages using pip"""
     print("Installing packages with pip...")
@@ -15,9 +17,7 @@ def install_with_pip():
         "numpy",
         "openpyxl",
         "requests",
-        "schedule",
-        "matplotlib",
-        "seaborn"
+        "matplotlib"
     ]
     
     for package in packages:
@@ -34,8 +34,7 @@ def install_with_conda():
     packages = [
         "pandas",
         "numpy", 
-        "matplotlib",
-        "seaborn"
+        "matplotlib"
     ]
     
     # Install with conda first
@@ -48,7 +47,7 @@ def install_with_conda():
             print(f"✗ {package}")
     
     # Install remaining with pip
-    pip_packages = ["yfinance", "openpyxl", "requests", "schedule"]
+    pip_packages = ["yfinance", "openpyxl", "requests"]
     for package in pip_packages:
         try:
             print(f"Installing {package} with pip...")
@@ -74,16 +73,14 @@ def manual_install_instructions():
     print("   pip install numpy") 
     print("   pip install openpyxl")
     print("   pip install requests")
-    print("   pip install schedule")
     print("   pip install matplotlib")
-    print("   pip install seaborn")
     print()
     print("3. IF YOU HAVE CONDA:")
-    print("   conda install pandas numpy matplotlib seaborn")
-    print("   pip install yfinance openpyxl requests schedule")
+    print("   conda install pandas numpy matplotlib")
+    print("   pip install yfinance openpyxl requests")
     print()
     print("4. IF STILL FAILING, TRY:")
-    print("   pip install --user yfinance pandas numpy openpyxl requests schedule matplotlib seaborn")
+    print("   pip install --user yfinance pandas numpy openpyxl requests matplotlib")
     print()
     print("5. FOR WINDOWS USERS:")
     print("   Download pre-compiled wheels from:")
@@ -99,9 +96,7 @@ def check_installations():
         "numpy": "numpy",
         "openpyxl": "openpyxl",
         "requests": "requests",
-        "schedule": "schedule",
-        "matplotlib": "matplotlib",
-        "seaborn": "seaborn"
+        "matplotlib": "matplotlib"
     }
     
     installed = []
@@ -123,6 +118,10 @@ def main():
     print("="*50)
     print()
     
+    if sys.version_info < MIN_PYTHON:
+        print(f"Python {'.'.join(map(str, MIN_PYTHON))} or higher is required (found {sys.version.split()[0]}).")
+        return
+    
     # Check what's already installed
     installed, missing = check_installations()
     
@@ -0,0 +1,217 @@
+"""
+Report aggregates folded over the trade journal one chunk at a time
+"""
+
+import logging
+from typing import Dict
+import pandas as pd
+import numpy as np
+from config import *
+from trade_journal import read_journal_chunks
+from trade_store import JOURNAL_TO_STORE
+from performance_metrics import holding_blocks, session_time, daily_equity, daily_metrics
+
+logger = logging.getLogger(__name__)
+
+STORE_TO_JOURNAL = {store: journal for journal, store in JOURNAL_TO_STORE.items()}
+# Trade fields the report needs, read from the journal under their workbook names
+REPORT_COLUMNS = ["date", "ticker", "strategy", "entry_time", "exit_time", "entry_fill_price",
+                  "exit_fill_price", "shares", "risk_amount", "gross_pl", "trade_duration_min",
+                  "win_loss", "exit_signal", "cumulative_pl"]
+GROUP_SUMS = ["trades", "wins", "total_pl", "gross_profit", "gross_loss"]  # Partials per group
+GROUPINGS = ["strategy", "date", "entry_hour", "exit_reason"]  # As the attribution cube's dimensions
+TRADE_COLUMNS = ["ticker", "strategy", "gross_pl", "date"]  # Best and worst trade listings
+TOP_TRADES = 3
+
+def _group_sums(trades: pd.DataFrame, pl: pd.Series, keys: pd.Series) -> pd.DataFrame:
+    return pd.DataFrame({
+        "trades": 1,
+        "wins": (trades["win_loss"] == "Win").astype(np.int64),
+        "total_pl": pl,
+        "gross_profit": pl.clip(lower=0),
+        "gross_loss": -pl.clip(upper=0)
+    }).groupby(keys.to_numpy()).sum()
+
+def _performance_frame(sums: pd.DataFrame, name: str) -> pd.DataFrame:
+    """Group partials in the layout of TradeStore.performance_by"""
+    frame = sums.sort_index().rename_axis(name)
+    frame = frame.rename(columns={"trades": "total_trades"}).astype({"total_trades": np.int64, "wins": np.int64})
+    frame["avg_pl"] = frame["total_pl"] / frame["total_trades"]
+    frame["win_rate"] = frame["wins"] / frame["total_trades"] * 100
+    frame["profit_factor"] = frame["gross_profit"] / frame["gross_loss"].replace(0, np.nan)
+    return frame[["total_trades", "wins", "total_pl", "avg_pl", "gross_profit", "gross_loss",
+                  "win_rate", "profit_factor"]]
+
+class JournalAggregates:
+    """Everything analyze_results reports, updated from one journal chunk at a time
+    
+    Each chunk only adds to counts and sums, running minima and maxima,
+    partials per strategy, day, hour of entry and exit reason, P/L per exit day, a few best and worst
+    trades, a thinned cumulative P/L curve and the merged holding periods
+    behind the exposure (a few blocks per day), so memory grows with the
+    number of strategies and trading days rather than trades.
+    """
+    
+    def __init__(self, initial_capital: float = INITIAL_PORTFOLIO_VALUE, chart_points: int = ANALYSIS_CHART_POINTS):
+        self.initial_capital = initial_capital
+        self.chart_points = chart_points
+        
+        self.total_trades = 0
+        self.winning_trades = 0
+        self.losing_trades = 0
+        self.total_profit = 0.0
+        self.total_loss = 0.0
+        self.min_cumulative_pl = np.nan
+        self.risk_sum = 0.0
+        self.risk_count = 0
+        self.max_risk = np.nan
+        self.duration_sum = 0.0
+        self.duration_count = 0
+        self.traded_value = 0.0  # Entries plus exits, for the turnover
+        
+        self.partials = {grouping: pd.DataFrame(columns=GROUP_SUMS, dtype=np.float64) for grouping in GROUPINGS}
+        self.exit_day_pl = pd.Series(dtype=np.float64)
+        self.best = None  # TOP_TRADES rows of TRADE_COLUMNS
+        self.worst = None
+        self.duration_counts = pd.Series(dtype=np.int64)
+        
+        # Cumulative P/L at every `stride`-th trade, plus the latest one
+        self.stride = 1
+        self.curve = pd.Series(dtype=np.float64)
+        self.last_point = pd.Series(dtype=np.float64)
+        
+        # Stretches with a position open, as int64 ns
+        self.block_starts = np.empty(0, dtype=np.int64)
+        self.block_ends = np.empty(0, dtype=np.int64)
+    
+    def add(self, trades: pd.DataFrame):
+        """Fold in a chunk of trades with Trade field columns"""
+        if trades.empty:
+            return
+        pl = pd.to_numeric(trades["gross_pl"], errors="coerce").fillna(0.0)
+        first_number = self.total_trades
+        self.total_trades += len(trades)
+        self.winning_trades += int((trades["win_loss"] == "Win").sum())
+        self.losing_trades += int((trades["win_loss"] == "Loss").sum())
+        self.total_profit += float(pl[pl > 0].sum())
+        self.total_loss += float(-pl[pl < 0].sum())
+        
+        cumulative = pd.to_numeric(trades["cumulative_pl"], errors="coerce")
+        risk = pd.to_numeric(trades["risk_amount"], errors="coerce").dropna()
+        durations = pd.to_numeric(trades["trade_duration_min"], errors="coerce").dropna()
+        self.min_cumulative_pl = np.fmin(self.min_cumulative_pl, cumulative.min())
+        self.risk_sum += float(risk.sum())
+        self.risk_count += len(risk)
+        self.max_risk = np.fmax(self.max_risk, risk.max())
+        self.duration_sum += float(durations.sum())
+        self.duration_count += len(durations)
+        self.duration_counts = self.duration_counts.add(durations.value_counts(), fill_value=0)
+        
+        shares = np.abs(np.nan_to_num(pd.to_numeric(trades["shares"], errors="coerce").to_numpy(dtype=np.float64)))
+        prices = [np.nan_to_num(pd.to_numeric(trades[column], errors="coerce").to_numpy(dtype=np.float64))
+                  for column in ("entry_fill_price", "exit_fill_price")]
+        self.traded_value += float((shares * (prices[0] + prices[1])).sum())
+        
+        entry_times = pd.to_datetime(trades["entry_time"])
+        exit_times = pd.to_datetime(trades["exit_time"])
+        keys = {
+            "strategy": trades["strategy"].astype(str),
+            "date": trades["date"].astype(str),
+            "entry_hour": entry_times.dt.hour,
+            "exit_reason": trades["exit_signal"].fillna("").astype(str)
+        }
+        for grouping, partials in self.partials.items():
+            self.partials[grouping] = partials.add(_group_sums(trades, pl, keys[grouping]), fill_value=0)
+        
+        closed = exit_times.notna().to_numpy()
+        exit_days = exit_times[closed].dt.normalize().to_numpy()
+        self.exit_day_pl = self.exit_day_pl.add(pl[closed].groupby(exit_days).sum(), fill_value=0)
+        self._add_holding_periods(entry_times[closed].to_numpy("datetime64[ns]"),
+                                  exit_times[closed].to_numpy("datetime64[ns]"))
+        
+        ranked = trades[TRADE_COLUMNS].assign(gross_pl=pd.to_numeric(trades["gross_pl"], errors="coerce"))
+        self.best = pd.concat([self.best, ranked.nlargest(TOP_TRADES, "gross_pl")]).nlargest(TOP_TRADES, "gross_pl")
+        self.worst = pd.concat([self.worst, ranked.nsmallest(TOP_TRADES, "gross_pl")]).nsmallest(TOP_TRADES, "gross_pl")
+        self.best, self.worst = (frame.reset_index(drop=True) for frame in (self.best, self.worst))
+        
+        curve = cumulative.fillna(0).set_axis(np.arange(first_number, self.total_trades))
+        self.last_point = curve.iloc[-1:]
+        self.curve = pd.concat([self.curve, curve[curve.index % self.stride == 0]])
+        while len(self.curve) > self.chart_points:
+            self.stride *= 2
+            self.curve = self.curve[self.curve.index % self.stride == 0]
+    
+    def _add_holding_periods(self, entries: np.ndarray, exits: np.ndarray):
+        if len(entries):
+            self.block_starts, self.block_ends = holding_blocks(
+                np.concatenate([self.block_starts.view("datetime64[ns]"), entries]),
+                np.concatenate([self.block_ends.view("datetime64[ns]"), exits])
+            )
+    
+    def summary(self) -> Dict:
+        """Overall performance, with the keys of TradeStore.summary"""
+        total, wins, losses = self.total_trades, self.winning_trades, self.losing_trades
+        return {
+            "total_trades": total,
+            "winning_trades": wins,
+            "losing_trades": losses,
+            "total_profit": self.total_profit,
+            "total_loss": self.total_loss,
+            "min_cumulative_pl": float(self.min_cumulative_pl),
+            "avg_risk": self.risk_sum / self.risk_count if self.risk_count else np.nan,
+            "max_risk": float(self.max_risk),
+            "avg_duration_min": self.duration_sum / self.duration_count if self.duration_count else np.nan,
+            "win_rate": wins / total * 100 if total else 0.0,
+            "net_profit": self.total_profit - self.total_loss,
+            "avg_win": self.total_profit / wins if wins else 0.0,
+            "avg_loss": self.total_loss / losses if losses else 0.0,
+            "profit_factor": self.total_profit / self.total_loss if self.total_loss else float("inf")
+        }
+    
+    def performance_by(self, column: str, limit: int = None) -> pd.DataFrame:
+        """Partials per GROUPINGS column in the layout of TradeStore.performance_by"""
+        if column not in self.partials:
+            raise ValueError(f"Cannot group trades by {column}")
+        frame = _performance_frame(self.partials[column], column)
+        return frame if limit is None else frame.iloc[-limit:]
+    
+    def metrics(self) -> Dict[str, float]:
+        """The risk metrics of performance_metrics.ledger_metrics"""
+        pl = self.exit_day_pl.sort_index()
+        calendar, equity = daily_equity(pl.index.to_numpy(dtype="datetime64[D]"), pl.to_numpy(), self.initial_capital)
+        metrics = daily_metrics(equity, calendar if len(calendar) else None)
+        
+        exposure = 0.0
+        if len(self.block_starts):
+            available = session_time(self.block_starts[0].astype("datetime64[ns]"),
+                                     self.block_ends[-1].astype("datetime64[ns]"))
+            held = (self.block_ends - self.block_starts).sum()
+            exposure = min(1.0, held / available) if available > 0 else 0.0
+        metrics["exposure"] = float(exposure)
+        average_equity = equity.mean()
+        metrics["turnover"] = float(self.traded_value / average_equity) if average_equity > 0 else 0.0
+        return metrics
+    
+    def best_trades(self) -> pd.DataFrame:
+        return self.best if self.best is not None else pd.DataFrame(columns=TRADE_COLUMNS)
+    
+    def worst_trades(self) -> pd.DataFrame:
+        return self.worst if self.worst is not None else pd.DataFrame(columns=TRADE_COLUMNS)
+    
+    def cumulative_pl(self) -> pd.Series:
+        """Cumulative P/L by trade number, thinned to at most about chart_points points"""
+        return pd.concat([self.curve, self.last_point[~self.last_point.index.isin(self.curve.index)]])
+    
+    def trade_durations(self) -> pd.Series:
+        """Number of trades per duration in minutes"""
+        return self.duration_counts.sort_index()
+
+def aggregate_journal(journal_file: str = JOURNAL_FILE, chunk_rows: int = ANALYSIS_CHUNK_ROWS,
+                      initial_capital: float = INITIAL_PORTFOLIO_VALUE) -> JournalAggregates:
+    """JournalAggregates of every journaled trade, reading `chunk_rows` rows at a time"""
+    aggregates = JournalAggregates(initial_capital)
+    columns = [STORE_TO_JOURNAL[name] for name in REPORT_COLUMNS]
+    for chunk in read_journal_chunks(journal_file, chunk_rows, columns):
+        aggregates.add(chunk.rename(columns=JOURNAL_TO_STORE))
+    logger.info(f"Aggregated {aggregates.total_trades} trades from {journal_file}")
+    return aggregates
@@ -3,18 +3,25 @@ Main Day Trading Simulator - Orchestrates all components
 """
 
 import logging
+import math
 import time
 import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
-import schedule
 import random
 
 from config import *
 from data_feed import MarketDataFeed
+from data_providers import MarketDataProvider
+from clock import Clock, create_clock
+from event_loop import (EventLoop, Event, next_time_of_day, PRICE_TICK, FEED_REFRESHED, FEED_POLL,
+                        POSITION_SWEEP, DAILY_RESET, EXPORT_LOG, MARKET_OPENED, MARKET_CLOSED)
 from trading_strategies import StrategyManager, TradingSignal
-from portfolio_manager import PortfolioManager
+from portfolio_manager import PortfolioManager, Trade
+from correlation_index import CorrelationIndex
 from excel_logger import ExcelLogger
+from trade_log_writer import TradeLogWriter
 
 # Set up logging
 logging.basicConfig(
@@ -29,15 +36,30 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 class DayTradingSimulator:
-    def __init__(self, initial_capital: float = INITIAL_PORTFOLIO_VALUE):
-        self.data_feed = MarketDataFeed()
-        self.strategy_manager = StrategyManager(self.data_feed)
-        self.portfolio_manager = PortfolioManager(initial_capital)
-        self.excel_logger = ExcelLogger()
+    def __init__(self, initial_capital: float = INITIAL_PORTFOLIO_VALUE,
+                 provider: MarketDataProvider = None, clock: Clock = None,
+                 data_feed: MarketDataFeed = None, excel_logger: ExcelLogger = None,
+                 strategy_params: Dict = None, scan_workers: int = SCAN_MAX_WORKERS):
+        self.clock = clock or create_clock()
+        self.data_feed = data_feed or MarketDataFeed(provider=provider, clock=self.clock)
+        self.strategy_manager = StrategyManager(self.data_feed, params=strategy_params)
+        self.correlations = CorrelationIndex(self.data_feed.tickers)
+        self.portfolio_manager = PortfolioManager(initial_capital, self.clock, self.correlations)
+        self.excel_logger = excel_logger if excel_logger is not None else ExcelLogger()
+        # Journal, store and workbook writes happen off the trading thread; in-memory
+        # loggers (the backtester's ledger) are written to directly
+        self.trade_writer = None
+        self._open_trade_log()
         
         self.is_running = False
         self.trading_thread = None
+        self.event_loop = None
+        self.price_subscriptions = set()  # Tickers whose price updates we receive (those with open positions)
         self.daily_trades_completed = {}  # Track trades per strategy per day
+        self.tracking_date = None
+        self.scan_workers = scan_workers
+        self.scan_pool = None  # Created on the first concurrent scan
+        self.stuck_scans = {}  # {ticker: future} of timed-out scan tasks whose thread is still busy
         
         # Initialize daily tracking
         self._reset_daily_tracking()
@@ -46,10 +68,11 @@ class DayTradingSimulator:
     
     def _reset_daily_tracking(self):
         """Reset daily tracking variables"""
-        current_date = datetime.now().date()
+        current_date = self.clock.today()
         self.daily_trades_completed = {
             strategy: 0 for strategy in self.strategy_manager.strategies.keys()
         }
+        self.tracking_date = current_date
         logger.info(f"Daily tracking reset for {current_date}")
     
     def start_simulation(self):
@@ -59,71 +82,144 @@ class DayTradingSimulator:
             return
         
         self.is_running = True
+        self._open_trade_log()
+        self.event_loop = self._create_event_loop()
         
-        # Start data feed
-        self.data_feed.start_feed()
+        # Start data feed (on simulated time FEED_POLL events refresh it instead)
+        if not self.clock.is_simulated:
+            self.data_feed.start_feed()
         
         # Start trading loop in separate thread
-        self.trading_thread = threading.Thread(target=self._trading_loop)
+        self.trading_thread = threading.Thread(target=self.event_loop.run)
         self.trading_thread.daemon = True
         self.trading_thread.start()
         
-        # Schedule daily reset
-        schedule.every().day.at("00:01").do(self._reset_daily_tracking)
-        
         logger.info("Day Trading Simulation started")
     
     def stop_simulation(self):
         """Stop the trading simulation"""
         self.is_running = False
+        if self.event_loop:
+            self.event_loop.stop()
         
         # Stop data feed
         self.data_feed.stop_feed()
+        self.data_feed.set_event_loop(None)
         
         # Wait for trading thread to finish
         if self.trading_thread:
             self.trading_thread.join(timeout=5)
         
+        if self.scan_pool:
+            self.scan_pool.shutdown(wait=False, cancel_futures=True)
+            self.scan_pool = None
+        
+        self._close_trade_log()
+        
         logger.info("Day Trading Simulation stopped")
     
-    def _trading_loop(self):
-        """Main trading loop"""
-        logger.info("Trading loop started")
+    def _open_trade_log(self):
+        """Open the trade log and its writer thread, as created or after _close_trade_log"""
+        if isinstance(self.excel_logger, ExcelLogger):
+            self.excel_logger.open()
+            if self.trade_writer is None:
+                self.trade_writer = TradeLogWriter(self.excel_logger)
+    
+    def _close_trade_log(self):
+        """Write the trades still queued, bring the workbook up to date and close the journal and store"""
+        if self.trade_writer:
+            self.trade_writer.close()
+            self.trade_writer = None
+        if isinstance(self.excel_logger, ExcelLogger):
+            self.excel_logger.close()
+    
+    def _create_event_loop(self) -> EventLoop:
+        """Event loop with the trading handlers registered and the first timed events queued
         
-        while self.is_running:
-            try:
-                current_time = datetime.now()
-                current_date = current_time.date()
-                
-                # Check if market is open
-                if not self.data_feed.is_market_open():
-                    time.sleep(60)  # Check every minute when market is closed
-                    continue
-                
-                # Update existing positions
-                self._update_positions()
-                
-                # Look for new trading opportunities
-                self._scan_for_opportunities()
-                
-                # Run scheduled tasks
-                schedule.run_pending()
-                
-                # Sleep before next iteration
-                time.sleep(30)  # Check every 30 seconds during market hours
-                
-            except Exception as e:
-                logger.error(f"Error in trading loop: {e}")
-                time.sleep(60)  # Wait before retrying
+        Positions are re-checked when their ticker's price changes, and all of
+        them every POSITION_SWEEP_INTERVAL for time-based exits. Opportunities
+        are scanned once each feed refresh has delivered all tickers. Both only
+        happen while the market is open.
+        """
+        loop = EventLoop(self.clock)
+        loop.on(PRICE_TICK, self._on_price_tick)
+        loop.on(POSITION_SWEEP, self._on_position_sweep)
+        loop.on(FEED_REFRESHED, self._on_feed_refreshed)
+        loop.on(FEED_POLL, self._on_feed_poll)
+        loop.on(DAILY_RESET, self._on_daily_reset)
+        loop.on(MARKET_OPENED, self._on_market_open)
+        loop.on(MARKET_CLOSED, self._on_market_close)
+        self.data_feed.set_event_loop(loop)
+        
+        now = self.clock.now()
+        loop.schedule(next_time_of_day(now, DAILY_RESET_TIME), DAILY_RESET)
+        loop.schedule(next_time_of_day(now, MARKET_OPEN, TRADING_DAYS), MARKET_OPENED)
+        loop.schedule(next_time_of_day(now, MARKET_CLOSE, TRADING_DAYS), MARKET_CLOSED)
+        loop.schedule(now + timedelta(seconds=POSITION_SWEEP_INTERVAL), POSITION_SWEEP)
+        if EXCEL_EXPORT_INTERVAL and self.trade_writer:
+            loop.on(EXPORT_LOG, self._on_export_log)
+            loop.schedule(now + timedelta(seconds=EXCEL_EXPORT_INTERVAL), EXPORT_LOG)
+        if self.clock.is_simulated:
+            loop.post(FEED_POLL)
+        return loop
     
-    def _update_positions(self):
-        """Update all open positions"""
+    def _on_price_update(self, ticker: str, price: float):
+        """Price subscription callback (runs on the feed thread): hand the tick to the event loop"""
+        if self.event_loop is not None:
+            self.event_loop.post(PRICE_TICK, ticker)
+    
+    def _on_price_tick(self, event: Event):
+        if self.data_feed.is_market_open():
+            self._update_positions([event.ticker])
+    
+    def _on_position_sweep(self, event: Event):
+        if self.data_feed.is_market_open():
+            self._update_positions()
+        self.event_loop.schedule(event.time + timedelta(seconds=POSITION_SWEEP_INTERVAL), POSITION_SWEEP)
+    
+    def _on_feed_refreshed(self, event: Event):
+        if self.data_feed.is_market_open():
+            self._sample_correlations()
+            self._scan_for_opportunities()
+    
+    def _on_feed_poll(self, event: Event):
+        """Refresh a feed that runs on simulated time and queue the next refresh"""
+        self.data_feed.refresh()
+        # Fixed-step clocks poll once per step so every bar is seen
+        step = getattr(self.clock, "step", None)
+        interval = step if step else timedelta(seconds=DATA_REFRESH_INTERVAL)
+        self.event_loop.schedule(event.time + interval, FEED_POLL)
+    
+    def _on_export_log(self, event: Event):
+        self.trade_writer.request_sync()
+        self.event_loop.schedule(event.time + timedelta(seconds=EXCEL_EXPORT_INTERVAL), EXPORT_LOG)
+    
+    def _on_daily_reset(self, event: Event):
+        self._reset_daily_tracking()
+        self.event_loop.schedule(next_time_of_day(event.time, DAILY_RESET_TIME), DAILY_RESET)
+    
+    def _on_market_open(self, event: Event):
+        logger.info("Market open")
+        self.event_loop.schedule(next_time_of_day(event.time, MARKET_OPEN, TRADING_DAYS), MARKET_OPENED)
+    
+    def _on_market_close(self, event: Event):
+        logger.info("Market closed")
+        self.event_loop.schedule(next_time_of_day(event.time, MARKET_CLOSE, TRADING_DAYS), MARKET_CLOSED)
+    
+    def _sample_correlations(self):
+        """Add the current prices to the correlation index, picking up refreshed sector metadata"""
+        self.correlations.update_sectors(self.data_feed.ticker_metadata, self.data_feed.metadata_date)
+        self.correlations.sample(self.data_feed)
+    
+    def _update_positions(self, tickers: List[str] = None):
+        """Update open positions, all of them or only those in the given tickers"""
         try:
             closed_trades = self.portfolio_manager.update_positions(
-                self.data_feed, self.strategy_manager
+                self.data_feed, self.strategy_manager, tickers
             )
             
             if closed_trades:
+                self._sync_price_subscriptions()
                 # Log closed trades to Excel
                 market_directions = {}
                 atr_data = {}
@@ -141,29 +237,44 @@ class DayTradingSimulator:
                     
                     entry_signals[trade.ticker] = f"{trade.strategy} signal"
                 
-                self.excel_logger.log_multiple_trades(
-                    closed_trades, market_directions, atr_data, entry_signals
-                )
+                self._log_trades(closed_trades, market_directions, atr_data, entry_signals)
                 
                 logger.info(f"Updated {len(closed_trades)} positions")
                 
         except Exception as e:
             logger.error(f"Error updating positions: {e}")
     
+    def _log_trades(self, trades: List[Trade], market_directions: Dict[str, str],
+                    atr_data: Dict[str, float], entry_signals: Dict[str, str]):
+        """Queue closed trades for the background log writer, or log them directly without one"""
+        if self.trade_writer:
+            self.trade_writer.submit(trades, market_directions, atr_data, entry_signals)
+        elif isinstance(self.excel_logger, ExcelLogger) and self.excel_logger.closed:
+            # Closed while the simulation is stopped (a force close): reopen the log just for them
+            self.excel_logger.open()
+            self.excel_logger.log_multiple_trades(trades, market_directions, atr_data, entry_signals)
+            self.excel_logger.close()
+        else:
+            self.excel_logger.log_multiple_trades(trades, market_directions, atr_data, entry_signals)
+    
     def _scan_for_opportunities(self):
         """Scan for new trading opportunities"""
         try:
-            current_date = datetime.now().date()
-            
             # Check if we can trade more today
-            for strategy_name in self.strategy_manager.strategies.keys():
-                if self.daily_trades_completed[strategy_name] >= STRATEGIES_PER_DAY:
-                    continue
-                
-                # Look for opportunities with this strategy
-                opportunities = self._find_opportunities(strategy_name)
-                
-                for ticker, signal in opportunities:
+            strategy_names = [name for name in self.strategy_manager.strategies
+                              if self.daily_trades_completed[name] < STRATEGIES_PER_DAY]
+            if not strategy_names:
+                return
+            
+            # Signals do not depend on the portfolio, so all of them are generated
+            # before any trade is executed
+            if self.scan_workers > 1:
+                all_opportunities = self._find_opportunities_concurrently(strategy_names)
+            else:
+                all_opportunities = {name: self._find_opportunities(name) for name in strategy_names}
+            
+            for strategy_name in strategy_names:
+                for ticker, signal in all_opportunities[strategy_name]:
                     if self._can_take_trade(strategy_name):
                         success = self._execute_trade(ticker, strategy_name, signal)
                         if success:
@@ -172,12 +283,84 @@ class DayTradingSimulator:
                                       f"({self.daily_trades_completed[strategy_name]}/{STRATEGIES_PER_DAY})")
                             break  # Move to next strategy
                 
-                # Small delay between strategies
-                time.sleep(2)
-                
         except Exception as e:
             logger.error(f"Error scanning for opportunities: {e}")
     
+    def _find_opportunities_concurrently(self, strategy_names: List[str]) -> Dict[str, List[tuple]]:
+        """_find_opportunities for several strategies, one pool task per ticker
+        
+        A task evaluates every strategy on one ticker, so the strategies share
+        its history fetch and feature snapshot. Tasks still running after
+        SCAN_TASK_TIMEOUT seconds are skipped for this scan; a running thread
+        cannot be cancelled, so their tickers are left out of later scans
+        until the task finishes. Results are merged in ticker order before
+        sorting, so the outcome matches a sequential scan.
+        """
+        if self.scan_pool is None:
+            self.scan_pool = ThreadPoolExecutor(self.scan_workers, thread_name_prefix="scan")
+        
+        self.stuck_scans = {ticker: future for ticker, future in self.stuck_scans.items() if not future.done()}
+        if self.stuck_scans:
+            logger.warning(f"{len(self.stuck_scans)} of {self.scan_workers} scan threads are stuck on earlier tasks, "
+                           f"skipping {', '.join(sorted(self.stuck_scans))}")
+        workers = self.scan_workers - len(self.stuck_scans)
+        if workers <= 0:
+            return {strategy_name: [] for strategy_name in strategy_names}
+        
+        tickers = [ticker for ticker in self.data_feed.tickers if ticker not in self.stuck_scans]
+        started = {}  # {ticker: monotonic time its task began}
+        
+        def scan_ticker(ticker: str) -> Dict[str, TradingSignal]:
+            started[ticker] = time.monotonic()
+            return self._generate_signals(ticker, strategy_names)
+        
+        futures = {self.scan_pool.submit(scan_ticker, ticker): ticker for ticker in tickers}
+        results = {}
+        pending = set(futures)
+        # Bound the whole scan too, in case hung tasks keep the queued ones from starting
+        deadline = time.monotonic() + SCAN_TASK_TIMEOUT * math.ceil(len(tickers) / workers)
+        while pending:
+            now = time.monotonic()
+            timed_out = {future for future in pending
+                         if futures[future] in started and now - started[futures[future]] > SCAN_TASK_TIMEOUT}
+            if now > deadline:
+                timed_out = pending
+            for future in timed_out:
+                if not future.cancel():
+                    self.stuck_scans[futures[future]] = future
+                logger.warning(f"Signal generation for {futures[future]} timed out, skipping it this scan")
+            pending -= timed_out
+            if not pending:
+                break
+            
+            done, pending = wait(pending, timeout=min(1.0, max(deadline - now, 0.0)), return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    results[futures[future]] = future.result()
+                except Exception as e:
+                    logger.error(f"Error generating signals for {futures[future]}: {e}")
+        
+        all_opportunities = {}
+        for strategy_name in strategy_names:
+            opportunities = [(ticker, results[ticker][strategy_name]) for ticker in tickers
+                             if strategy_name in results.get(ticker, {})]
+            # Sort by confidence (highest first); ties keep ticker order
+            opportunities.sort(key=lambda x: x[1].confidence, reverse=True)
+            all_opportunities[strategy_name] = opportunities
+        return all_opportunities
+    
+    def _generate_signals(self, ticker: str, strategy_names: List[str]) -> Dict[str, TradingSignal]:
+        """High confidence signals of the given strategies for one ticker"""
+        signals = {}
+        for strategy_name in strategy_names:
+            try:
+                signal = self.strategy_manager.strategies[strategy_name].generate_signal(ticker)
+                if signal and signal.confidence > 0.7:  # High confidence signals only
+                    signals[strategy_name] = signal
+            except Exception as e:
+                logger.error(f"Error generating signal for {ticker} with {strategy_name}: {e}")
+        return signals
+    
     def _find_opportunities(self, strategy_name: str) -> List[tuple]:
         """Find trading opportunities for a specific strategy"""
         opportunities = []
@@ -251,6 +434,7 @@ class DayTradingSimulator:
             
             if order_id:
                 logger.info(f"Opened {signal.action} position in {ticker} using {strategy_name}")
+                self._sync_price_subscriptions()
                 return True
             else:
                 logger.warning(f"Failed to open position in {ticker}")
@@ -260,19 +444,29 @@ class DayTradingSimulator:
             logger.error(f"Error executing trade in {ticker}: {e}")
             return False
     
+    def _sync_price_subscriptions(self):
+        """Subscribe to the price of every ticker with an open position, and only those"""
+        held = set(self.portfolio_manager.ticker_positions)
+        for ticker in held - self.price_subscriptions:
+            self.data_feed.subscribe(ticker, self._on_price_update)
+        for ticker in self.price_subscriptions - held:
+            self.data_feed.unsubscribe(ticker, self._on_price_update)
+        self.price_subscriptions = held
+    
     def get_status(self) -> Dict:
         """Get current simulation status"""
-        portfolio_summary = self.portfolio_manager.get_portfolio_summary()
+        portfolio_summary = self.portfolio_manager.get_portfolio_summary(self.data_feed)
         risk_metrics = self.portfolio_manager.get_risk_metrics()
         
         return {
             "is_running": self.is_running,
             "market_open": self.data_feed.is_market_open(),
-            "current_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "current_time": self.clock.now().strftime("%Y-%m-%d %H:%M:%S"),
             "portfolio": portfolio_summary,
             "risk": risk_metrics,
             "daily_trades": self.daily_trades_completed,
-            "open_positions": len(self.portfolio_manager.positions)
+            "open_positions": len(self.portfolio_manager.positions),
+            "trade_log": self.trade_writer.metrics() if self.trade_writer else None
         }
     
     def force_close_all_positions(self):
@@ -290,6 +484,8 @@ class DayTradingSimulator:
                         closed_trades.append(trade)
             
             if closed_trades:
+                self._sync_price_subscriptions()
+                
                 # Log to Excel
                 market_directions = {}
                 atr_data = {}
@@ -300,22 +496,26 @@ class DayTradingSimulator:
                     atr_data[trade.ticker] = 0.0  # Placeholder
                     entry_signals[trade.ticker] = "Force close"
                 
-                self.excel_logger.log_multiple_trades(
-                    closed_trades, market_directions, atr_data, entry_signals
-                )
+                self._log_trades(closed_trades, market_directions, atr_data, entry_signals)
                 
                 logger.info(f"Force closed {len(closed_trades)} positions")
             
         except Exception as e:
             logger.error(f"Error force closing positions: {e}")
     
-    def run_backtest(self, start_date: str, end_date: str, tickers: List[str] = None):
-        """Run a backtest simulation (for testing purposes)"""
-        logger.info(f"Starting backtest from {start_date} to {end_date}")
+    def run_backtest(self, start_date: str, end_date: str, tickers: List[str] = None,
+                     interval: str = BACKTEST_INTERVAL):
+        """Run a backtest on historical bars with this simulator's data provider
+        
+        The backtest uses its own clock, portfolio and in-memory trade ledger,
+        so it never touches the live portfolio or the Excel log.
+        """
+        from backtester import BacktestEngine
         
-        # This would implement backtesting logic
-        # For now, just log the request
-        logger.info("Backtest functionality not yet implemented")
+        logger.info(f"Starting backtest from {start_date} to {end_date}")
+        engine = BacktestEngine(start_date, end_date, tickers or self.data_feed.tickers, interval,
+                                self.data_feed.provider, self.portfolio_manager.initial_capital)
+        return engine.run()
 
 def main():
     """Main function to run the simulator"""
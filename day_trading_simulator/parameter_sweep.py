@@ -0,0 +1,214 @@
+"""
+Parallel parameter sweeps: backtests over grids or random samples of strategy parameters
+"""
+
+import os
+import time
+import random
+import logging
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Tuple
+import pandas as pd
+import numpy as np
+from config import *
+from data_providers import MarketDataProvider, create_provider
+from backtester import BacktestEngine, backtest_range, load_backtest_bars, load_backtest_metadata
+from vectorized_backtest import VectorizedBacktestEngine
+from trading_strategies import strategy_parameters
+
+logger = logging.getLogger(__name__)
+
+BAR_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+ENGINES = {"vectorized": VectorizedBacktestEngine, "event": BacktestEngine}
+RUN_STATS = ["total_return", "max_drawdown", "sharpe_ratio", "sortino_ratio", "calmar_ratio",
+             "total_trades", "win_rate", "net_profit", "final_equity", "bars", "elapsed_seconds"]
+
+def parameter_grid(space: Dict[str, list]) -> List[Dict]:
+    """Every combination of the values listed for each parameter"""
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+def random_parameters(space: Dict, samples: int, seed: int = SWEEP_SEED) -> List[Dict]:
+    """Random draws from a search space
+    
+    A (low, high) tuple is sampled uniformly, as an integer when both bounds
+    are integers; a list is a set of choices.
+    """
+    rng = random.Random(seed)
+    combinations = []
+    for _ in range(samples):
+        params = {}
+        for name, values in space.items():
+            if isinstance(values, tuple):
+                low, high = values
+                if isinstance(low, int) and isinstance(high, int):
+                    params[name] = rng.randint(low, high)
+                else:
+                    params[name] = rng.uniform(low, high)
+            else:
+                params[name] = rng.choice(list(values))
+        combinations.append(params)
+    return combinations
+
+class SharedBars:
+    """OHLCV bars of every ticker packed into one shared memory block
+    
+    The block holds all timestamps (int64) followed by the OHLCV columns
+    (float64), ticker after ticker. Workers attach to it by name and rebuild
+    their frames from views into the block, so the price data is written
+    once instead of being pickled to every worker.
+    """
+    
+    def __init__(self, bars: Dict[str, pd.DataFrame]):
+        self.rows = sum(len(frame) for frame in bars.values())
+        self.layout = []  # (ticker, first row, number of rows)
+        self.shm = shared_memory.SharedMemory(create=True, size=max(self.rows * 8 * (1 + len(BAR_COLUMNS)), 1))
+        timestamps, values = _block_views(self.shm, self.rows)
+        
+        offset = 0
+        for ticker, frame in bars.items():
+            timestamps[offset:offset + len(frame)] = frame.index.as_unit("ns").asi8
+            values[:, offset:offset + len(frame)] = frame[BAR_COLUMNS].to_numpy(dtype=np.float64).T
+            self.layout.append((ticker, offset, len(frame)))
+            offset += len(frame)
+    
+    @property
+    def handle(self) -> Tuple[str, int, list]:
+        """Everything a worker needs to attach"""
+        return self.shm.name, self.rows, self.layout
+    
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+def _block_views(shm: shared_memory.SharedMemory, rows: int) -> Tuple[np.ndarray, np.ndarray]:
+    timestamps = np.ndarray((rows,), dtype=np.int64, buffer=shm.buf)
+    values = np.ndarray((len(BAR_COLUMNS), rows), dtype=np.float64, buffer=shm.buf, offset=rows * 8)
+    return timestamps, values
+
+# Per-process state set up once by _init_worker
+_worker = {}
+
+def _init_worker(handle: Tuple[str, int, list], settings: Dict):
+    """Attach to the shared bars and rebuild each ticker's frame"""
+    # Per-backtest info logging from every worker would swamp the log
+    logging.disable(logging.INFO)
+    name, rows, layout = handle
+    shm = shared_memory.SharedMemory(name=name)
+    timestamps, values = _block_views(shm, rows)
+    
+    bars = {}
+    for ticker, offset, length in layout:
+        index = pd.DatetimeIndex(timestamps[offset:offset + length].view("datetime64[ns]"))
+        bars[ticker] = pd.DataFrame(values[:, offset:offset + length].T, index=index, columns=BAR_COLUMNS,
+                                    copy=False)
+    
+    _worker.update(settings, shm=shm, bars=bars)
+
+def _run_combination(params: Dict) -> Dict:
+    """Backtest one parameter combination in a worker"""
+    engine_class = ENGINES[_worker["engine"]]
+    try:
+        engine = engine_class(_worker["start_date"], _worker["end_date"], list(_worker["bars"]),
+                              _worker["interval"], None, _worker["initial_capital"], params,
+                              _worker["bars"], _worker["metadata"])
+        stats = engine.run().stats
+    except Exception as e:
+        return {**params, "error": str(e)}
+    return {**params, **{key: stats[key] for key in RUN_STATS}}
+
+class ParameterSweep:
+    """Runs backtests for many strategy parameter combinations across a process pool
+    
+    Bars are loaded once in the parent and shared with the workers through
+    shared memory; each worker then only recomputes indicators and signals for
+    the parameters it is given. Parameters not in a combination keep their
+    config.py values.
+    """
+    
+    def __init__(self, start_date, end_date, tickers: List[str] = None,
+                 interval: str = BACKTEST_INTERVAL, provider: MarketDataProvider = None,
+                 initial_capital: float = INITIAL_PORTFOLIO_VALUE, engine: str = "vectorized",
+                 max_workers: int = SWEEP_MAX_WORKERS):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown backtest engine: {engine}")
+        self.start_date = start_date
+        self.end_date = end_date
+        self.tickers = tickers or DEFAULT_TICKERS
+        self.interval = interval
+        self.provider = provider or create_provider()
+        self.initial_capital = initial_capital
+        self.engine = engine
+        self.max_workers = max_workers or os.cpu_count() or 1
+    
+    def grid(self, space: Dict[str, list], rank_by: str = SWEEP_RANK_METRIC) -> pd.DataFrame:
+        """Backtest every combination in a parameter grid"""
+        return self.run(parameter_grid(space), rank_by)
+    
+    def random(self, space: Dict, samples: int, seed: int = SWEEP_SEED,
+               rank_by: str = SWEEP_RANK_METRIC) -> pd.DataFrame:
+        """Backtest random samples from a parameter search space"""
+        return self.run(random_parameters(space, samples, seed), rank_by)
+    
+    def run(self, combinations: List[Dict], rank_by: str = SWEEP_RANK_METRIC) -> pd.DataFrame:
+        """Backtest each combination and return the results ranked by rank_by (best first)"""
+        for params in combinations:
+            # Fail on misspelled parameters before any work is done
+            strategy_parameters(params)
+        if not combinations:
+            return pd.DataFrame()
+        
+        started = time.perf_counter()
+        start, end = backtest_range(self.start_date, self.end_date)
+        bars = load_backtest_bars(self.provider, self.tickers, self.interval, start, end)
+        if not bars:
+            logger.warning("No bars to sweep over")
+            return pd.DataFrame()
+        
+        # The provider stays in the parent: workers read every bar from the shared block
+        settings = {
+            "engine": self.engine,
+            "metadata": load_backtest_metadata(self.provider, list(bars)),
+            "start_date": self.start_date,
+            "end_date": self.end_date,
+            "interval": self.interval,
+            "initial_capital": self.initial_capital
+        }
+        workers = min(self.max_workers, len(combinations))
+        # Several combinations per task keep the pool's messaging overhead small
+        chunksize = max(1, len(combinations) // (workers * 4))
+        logger.info(f"Sweeping {len(combinations)} parameter combinations over {len(bars)} tickers "
+                    f"with {workers} workers")
+        
+        shared = SharedBars(bars)
+        try:
+            with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                     initargs=(shared.handle, settings)) as pool:
+                results = list(pool.map(_run_combination, combinations, chunksize=chunksize))
+        finally:
+            shared.close()
+        
+        failed = [result for result in results if "error" in result]
+        for result in failed:
+            logger.error(f"Backtest failed for {result}")
+        
+        table = pd.DataFrame([result for result in results if "error" not in result])
+        if not table.empty:
+            ascending = rank_by == "max_drawdown"
+            table = table.sort_values(rank_by, ascending=ascending, kind="stable").reset_index(drop=True)
+            table.insert(0, "rank", np.arange(1, len(table) + 1))
+        
+        logger.info(f"Sweep finished in {time.perf_counter() - started:.1f}s: "
+                    f"{len(table)} backtests, {len(failed)} failed")
+        return table
+
+def run_parameter_sweep(space: Dict, start_date, end_date, tickers: List[str] = None,
+                        interval: str = BACKTEST_INTERVAL, provider: MarketDataProvider = None,
+                        samples: int = None, rank_by: str = SWEEP_RANK_METRIC) -> pd.DataFrame:
+    """Grid search over space, or random search with the given number of samples"""
+    sweep = ParameterSweep(start_date, end_date, tickers, interval, provider)
+    if samples is None:
+        return sweep.grid(space, rank_by)
+    return sweep.random(space, samples, rank_by=rank_by)
@@ -0,0 +1,224 @@
+"""
+Vectorized performance metrics for equity curves and trade ledgers
+"""
+
+from typing import Dict, Tuple
+import numpy as np
+import pandas as pd
+from config import *
+
+NANOSECONDS_PER_DAY = 86_400 * 10**9
+
+def simple_returns(equity: np.ndarray) -> np.ndarray:
+    """Period-over-period returns of an equity curve (one fewer than its points)"""
+    equity = np.asarray(equity, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = equity[1:] / equity[:-1] - 1
+    return np.where(np.isfinite(returns), returns, 0.0)
+
+def sharpe_ratio(returns: np.ndarray, periods_per_year: int = PERIODS_PER_YEAR,
+                 risk_free_rate: float = RISK_FREE_RATE) -> float:
+    """Annualized mean excess return over its standard deviation; 0 without variation"""
+    returns = np.asarray(returns, dtype=np.float64)
+    if len(returns) < 2:
+        return 0.0
+    excess = returns - risk_free_rate / periods_per_year
+    deviation = excess.std(ddof=1)
+    return float(excess.mean() / deviation * np.sqrt(periods_per_year)) if deviation > 1e-12 else 0.0
+
+def sortino_ratio(returns: np.ndarray, periods_per_year: int = PERIODS_PER_YEAR,
+                  risk_free_rate: float = RISK_FREE_RATE) -> float:
+    """Like the Sharpe ratio, but only returns below the risk-free rate count as risk"""
+    returns = np.asarray(returns, dtype=np.float64)
+    if len(returns) < 2:
+        return 0.0
+    excess = returns - risk_free_rate / periods_per_year
+    downside = np.sqrt(np.mean(np.minimum(excess, 0.0) ** 2))
+    return float(excess.mean() / downside * np.sqrt(periods_per_year)) if downside > 1e-12 else 0.0
+
+def drawdowns(equity: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Per point: drawdown from the running peak (a fraction) and index of that peak"""
+    equity = np.asarray(equity, dtype=np.float64)
+    peak = np.maximum.accumulate(equity)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        depth = np.where(peak > 0, 1 - equity / peak, 0.0)
+    index = np.arange(len(equity))
+    peak_index = np.maximum.accumulate(np.where(equity >= peak, index, 0))
+    return depth, peak_index
+
+def max_drawdown(equity: np.ndarray, timestamps: np.ndarray = None) -> Tuple[float, float]:
+    """Deepest drawdown (fraction of the peak) and longest time spent below a previous peak
+    
+    The duration is in days when timestamps are given, otherwise in periods.
+    A drawdown still open at the end counts up to the last point.
+    """
+    if len(equity) == 0:
+        return 0.0, 0.0
+    depth, peak_index = drawdowns(equity)
+    if timestamps is None:
+        duration = np.arange(len(depth)) - peak_index
+    else:
+        times = np.asarray(timestamps, dtype="datetime64[ns]").astype(np.int64)
+        duration = (times - times[peak_index]) / NANOSECONDS_PER_DAY
+    return float(depth.max()), float(duration.max())
+
+def annualized_return(equity: np.ndarray, periods_per_year: int = PERIODS_PER_YEAR) -> float:
+    """Compound annual growth rate of an equity curve sampled once per period"""
+    if len(equity) < 2 or equity[0] <= 0:
+        return 0.0
+    growth = equity[-1] / equity[0]
+    if growth <= 0:
+        return -1.0
+    return float(growth ** (periods_per_year / (len(equity) - 1)) - 1)
+
+def calmar_ratio(equity: np.ndarray, periods_per_year: int = PERIODS_PER_YEAR) -> float:
+    """Annualized return over the maximum drawdown; 0 without a drawdown"""
+    depth, _ = max_drawdown(equity)
+    return annualized_return(equity, periods_per_year) / depth if depth > 1e-12 else 0.0
+
+def daily_closes(timestamps: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Last value of each calendar day in a time-ordered series"""
+    days = np.asarray(timestamps, dtype="datetime64[ns]").astype("datetime64[D]")
+    if len(days) == 0:
+        return days, np.asarray(values, dtype=np.float64)
+    last = np.append(np.flatnonzero(days[1:] != days[:-1]), len(days) - 1)
+    return days[last], np.asarray(values, dtype=np.float64)[last]
+
+def daily_pl(days: np.ndarray, pl: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """P/L summed per business day from the first to the last day, zero on days without trades"""
+    days = np.asarray(days, dtype="datetime64[D]")
+    pl = np.nan_to_num(np.asarray(pl, dtype=np.float64))
+    if len(days) == 0:
+        return days, pl
+    first, last = days.min(), days.max()
+    calendar = np.arange(first, last + np.timedelta64(1, "D"))
+    calendar = calendar[np.is_busday(calendar) | np.isin(calendar, days)]
+    totals = np.zeros(len(calendar))
+    np.add.at(totals, np.searchsorted(calendar, days), pl)
+    return calendar, totals
+
+def holding_blocks(entry_times: np.ndarray, exit_times: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Start and end (ns) of each stretch with at least one position open
+    
+    Overlapping holding periods are merged, so ten positions held over the
+    same hour make one block of an hour.
+    """
+    entries = np.asarray(entry_times, dtype="datetime64[ns]").astype(np.int64)
+    exits = np.asarray(exit_times, dtype="datetime64[ns]").astype(np.int64)
+    if len(entries) == 0:
+        return entries, exits
+    order = np.argsort(entries, kind="stable")
+    entries, exits = entries[order], np.maximum(exits[order], entries[order])
+    
+    # A position starts a new block unless it opens before every earlier one has closed
+    covered_until = np.maximum.accumulate(exits)
+    new_block = np.ones(len(entries), dtype=bool)
+    new_block[1:] = entries[1:] > covered_until[:-1]
+    return entries[new_block], np.maximum.reduceat(exits, np.flatnonzero(new_block))
+
+def session_time(first, last) -> int:
+    """Nanoseconds of trading session (MARKET_OPEN to MARKET_CLOSE) over the business days from first to last"""
+    days = np.arange(np.datetime64(first, "D"), np.datetime64(last, "D") + np.timedelta64(1, "D"))
+    session = pd.Timedelta(MARKET_CLOSE + ":00") - pd.Timedelta(MARKET_OPEN + ":00")
+    return int(np.count_nonzero(np.is_busday(days)) * session.value)
+
+def exposure_time(entry_times: np.ndarray, exit_times: np.ndarray, timeline: np.ndarray = None) -> float:
+    """Fraction of the time with at least one position open
+    
+    With a timeline (e.g. a backtest's bar times) it is the fraction of those
+    times inside a holding period. Otherwise it is the time held over the
+    trading session (MARKET_OPEN to MARKET_CLOSE) of every business day from
+    the first entry to the last exit.
+    """
+    starts, ends = holding_blocks(entry_times, exit_times)
+    if len(starts) == 0:
+        return 0.0
+    if timeline is not None:
+        times = np.asarray(timeline, dtype="datetime64[ns]").astype(np.int64)
+        if len(times) == 0:
+            return 0.0
+        block = np.searchsorted(starts, times, side="right") - 1
+        held = (block >= 0) & (times < ends[np.maximum(block, 0)])
+        return float(held.mean())
+    
+    available = session_time(starts[0].astype("datetime64[ns]"), ends[-1].astype("datetime64[ns]"))
+    return float(min(1.0, (ends - starts).sum() / available)) if available > 0 else 0.0
+
+def turnover(shares: np.ndarray, entry_prices: np.ndarray, exit_prices: np.ndarray,
+             average_equity: float) -> float:
+    """Value traded, entries plus exits, as a multiple of average equity"""
+    shares = np.abs(np.asarray(shares, dtype=np.float64))
+    traded = shares * (np.nan_to_num(np.asarray(entry_prices, dtype=np.float64))
+                       + np.nan_to_num(np.asarray(exit_prices, dtype=np.float64)))
+    return float(traded.sum() / average_equity) if average_equity > 0 else 0.0
+
+def daily_metrics(equity: np.ndarray, days: np.ndarray = None,
+                  periods_per_year: int = PERIODS_PER_YEAR,
+                  risk_free_rate: float = RISK_FREE_RATE) -> Dict[str, float]:
+    """Sharpe, Sortino, Calmar, annual return and drawdown of a daily equity curve"""
+    equity = np.asarray(equity, dtype=np.float64)
+    returns = simple_returns(equity)
+    depth, duration = max_drawdown(equity, days)
+    return {
+        "sharpe_ratio": sharpe_ratio(returns, periods_per_year, risk_free_rate),
+        "sortino_ratio": sortino_ratio(returns, periods_per_year, risk_free_rate),
+        "calmar_ratio": calmar_ratio(equity, periods_per_year),
+        "annualized_return": annualized_return(equity, periods_per_year),
+        "max_drawdown": depth,
+        "max_drawdown_days": duration
+    }
+
+def daily_equity(days: np.ndarray, pl: np.ndarray,
+                 initial_capital: float = INITIAL_PORTFOLIO_VALUE) -> Tuple[np.ndarray, np.ndarray]:
+    """Equity at each business day's close from P/L per day, starting from initial_capital the day before"""
+    calendar, totals = daily_pl(days, pl)
+    equity = initial_capital + np.concatenate([[0.0], np.cumsum(totals)])
+    if len(calendar):
+        calendar = np.concatenate([[calendar[0] - np.timedelta64(1, "D")], calendar])
+    return calendar, equity
+
+def daily_pl_metrics(days: np.ndarray, pl: np.ndarray, initial_capital: float = INITIAL_PORTFOLIO_VALUE,
+                     **kwargs) -> Dict[str, float]:
+    """daily_metrics() of the equity built from P/L per day (e.g. trade P/L by date)"""
+    calendar, equity = daily_equity(days, pl, initial_capital)
+    return daily_metrics(equity, calendar if len(calendar) else None, **kwargs)
+
+def equity_curve_metrics(equity_curve: pd.Series, initial_capital: float = None, **kwargs) -> Dict[str, float]:
+    """Metrics of an equity curve indexed by time (e.g. a backtest's, one point per bar)
+    
+    Ratios use daily closes, starting from initial_capital when given; the
+    drawdown depth and duration use every point.
+    """
+    timestamps = equity_curve.index.to_numpy()
+    values = equity_curve.to_numpy(dtype=np.float64)
+    days, closes = daily_closes(timestamps, values)
+    if initial_capital is not None and len(days):
+        days = np.concatenate([[days[0] - np.timedelta64(1, "D")], days])
+        closes = np.concatenate([[initial_capital], closes])
+    metrics = daily_metrics(closes, days, **kwargs)
+    metrics["max_drawdown"], metrics["max_drawdown_days"] = max_drawdown(values, timestamps)
+    return metrics
+
+def ledger_metrics(trades: pd.DataFrame, initial_capital: float = INITIAL_PORTFOLIO_VALUE,
+                   timeline: np.ndarray = None, **kwargs) -> Dict[str, float]:
+    """Metrics of closed trades with Trade field columns (TradeLedger.to_frame, TradeStore.query)
+    
+    Equity is initial_capital plus the P/L of the trades closed each day.
+    Exposure is as in exposure_time(); turnover is the value traded over
+    that equity's average.
+    """
+    if trades.empty:
+        return {**daily_metrics(np.array([initial_capital]), **kwargs), "exposure": 0.0, "turnover": 0.0}
+    
+    entry_times = pd.to_datetime(trades["entry_time"]).to_numpy()
+    exit_times = pd.to_datetime(trades["exit_time"]).to_numpy()
+    pl = trades["gross_pl"].to_numpy(dtype=np.float64, na_value=0.0)
+    
+    calendar, equity = daily_equity(exit_times.astype("datetime64[D]"), pl, initial_capital)
+    metrics = daily_metrics(equity, calendar, **kwargs)
+    metrics["exposure"] = exposure_time(entry_times, exit_times, timeline)
+    metrics["turnover"] = turnover(trades["shares"].to_numpy(dtype=np.float64),
+                                   trades["entry_fill_price"].to_numpy(dtype=np.float64, na_value=np.nan),
+                                   trades["exit_fill_price"].to_numpy(dtype=np.float64, na_value=np.nan),
+                                   equity.mean())
+    return metrics
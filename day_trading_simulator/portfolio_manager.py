@@ -5,15 +5,18 @@ Portfolio Management System with Risk Assessment
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, get_type_hints
 import logging
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from config import *
 from data_feed import MarketDataFeed
+from clock import Clock, WallClock
+from position_book import PositionBook
+from correlation_index import CorrelationIndex
 
 logger = logging.getLogger(__name__)
 
-@dataclass
+@dataclass(slots=True)
 class Position:
     ticker: str
     strategy: str
@@ -27,7 +30,7 @@ class Position:
     setup_quality: int = 3  # 1-5 scale
     notes: str = ""
 
-@dataclass
+@dataclass(slots=True)
 class Trade:
     date: str
     ticker: str
@@ -62,14 +65,142 @@ class Trade:
     closing_notes: str
     cumulative_pl: float
 
+# Storage dtype of each TradeLedger column kind
+LEDGER_DTYPES = {"datetime": np.int64, "str": np.int32, "int": np.int64, "optional_int": np.float64,
+                 "float": np.float64}
+NAT = np.iinfo(np.int64).min  # Nanosecond value of NaT
+
+def _column_kind(hint) -> str:
+    if hint in (datetime, Optional[datetime]):
+        return "datetime"
+    if hint in (str, Optional[str]):
+        return "str"
+    if hint is int:
+        return "int"
+    if hint == Optional[int]:
+        return "optional_int"
+    return "float"  # Optional floats store None as NaN, as do optional ints
+
+class TradeLedger:
+    """Closed trades stored column by column in typed NumPy arrays
+    
+    Numbers are float64/int64 columns, times int64 nanoseconds (NaT for None)
+    and strings int32 codes into a per-column vocabulary (-1 for None, which
+    pandas reads as missing), so a trade takes a couple of hundred bytes
+    instead of a Trade object with boxed fields.
+    to_frame() wraps the arrays without copying the numeric columns; indexing
+    or iterating rebuilds Trade records. The ExcelLogger logging methods let
+    it stand in as the simulator's trade log.
+    """
+    
+    def __init__(self, capacity: int = 256):
+        hints = get_type_hints(Trade)
+        self.kinds = {column.name: _column_kind(hints[column.name]) for column in fields(Trade)}
+        self.columns = {name: np.empty(capacity, dtype=LEDGER_DTYPES[kind]) for name, kind in self.kinds.items()}
+        self.vocabularies = {name: ([], {}) for name, kind in self.kinds.items() if kind == "str"}  # (values, {value: code})
+        self.size = 0
+    
+    def __len__(self) -> int:
+        return self.size
+    
+    def __getitem__(self, row: int) -> Trade:
+        if row < 0:
+            row += self.size
+        if not 0 <= row < self.size:
+            raise IndexError("trade index out of range")
+        
+        values = {}
+        for name, kind in self.kinds.items():
+            value = self.columns[name][row]
+            if kind == "str":
+                values[name] = self.vocabularies[name][0][value] if value >= 0 else None
+            elif kind == "datetime":
+                values[name] = None if value == NAT else pd.Timestamp(int(value)).to_pydatetime()
+            elif kind == "int":
+                values[name] = int(value)
+            elif np.isnan(value):
+                values[name] = None
+            else:
+                values[name] = int(value) if kind == "optional_int" else float(value)
+        return Trade(**values)
+    
+    def __iter__(self) -> Iterator[Trade]:
+        for row in range(self.size):
+            yield self[row]
+    
+    def append(self, trade: Trade):
+        if self.size == len(self.columns["date"]):
+            for name, column in self.columns.items():
+                self.columns[name] = np.concatenate([column, np.empty_like(column)])
+        
+        row = self.size
+        for name, kind in self.kinds.items():
+            value = getattr(trade, name)
+            if kind == "str" and value is None:
+                value = -1
+            elif kind == "str":
+                values, codes = self.vocabularies[name]
+                code = codes.get(value)
+                if code is None:
+                    code = codes[value] = len(values)
+                    values.append(value)
+                value = code
+            elif kind == "datetime":
+                value = NAT if value is None else pd.Timestamp(value).value
+            elif value is None:
+                value = np.nan
+            self.columns[name][row] = value
+        self.size += 1
+    
+    def log_trade(self, trade: Trade, market_direction: str = "", atr_at_entry: float = 0.0,
+                  entry_signal: str = ""):
+        trade.market_direction = market_direction
+        trade.atr_at_entry = atr_at_entry
+        trade.entry_signal = entry_signal
+        self.append(trade)
+    
+    def log_multiple_trades(self, trades: List[Trade], market_directions: Dict[str, str] = None,
+                            atr_data: Dict[str, float] = None, entry_signals: Dict[str, str] = None):
+        market_directions = market_directions or {}
+        atr_data = atr_data or {}
+        entry_signals = entry_signals or {}
+        for trade in trades:
+            self.log_trade(trade, market_directions.get(trade.ticker, ""),
+                           atr_data.get(trade.ticker, 0.0), entry_signals.get(trade.ticker, ""))
+    
+    def to_frame(self) -> pd.DataFrame:
+        """All trades as a DataFrame, one row per trade
+        
+        Numeric and time columns are views of the ledger's arrays (appending
+        later never writes into them); strings become categoricals over the
+        column vocabularies.
+        """
+        data = {}
+        for name, kind in self.kinds.items():
+            column = self.columns[name][:self.size]
+            if kind == "str":
+                data[name] = pd.Categorical.from_codes(column, categories=self.vocabularies[name][0],
+                                                       validate=False)
+            elif kind == "datetime":
+                data[name] = column.view("datetime64[ns]")
+            else:
+                data[name] = column
+        return pd.DataFrame(data, copy=False)
+
 class PortfolioManager:
-    def __init__(self, initial_capital: float = INITIAL_PORTFOLIO_VALUE):
+    def __init__(self, initial_capital: float = INITIAL_PORTFOLIO_VALUE, clock: Clock = None,
+                 correlations: CorrelationIndex = None):
+        self.clock = clock or WallClock()
+        self.correlations = correlations or CorrelationIndex()  # Sector map and return correlations
         self.initial_capital = initial_capital
         self.current_capital = initial_capital
         self.positions = {}  # {order_id: Position}
-        self.completed_trades = []
+        self.ticker_positions = {}  # {ticker: [order_id]} of the open positions, in opening order
+        self.book = PositionBook()  # Numeric columns of the open positions for vectorized checks
+        self.order_sequence = 0  # Suffix that keeps order IDs opened within the same second apart
+        self.completed_trades = TradeLedger()
         self.daily_risk_used = 0.0
-        self.last_reset_date = datetime.now().date()
+        self.last_reset_date = self.clock.today()
         
         # Risk tracking
         self.max_drawdown = 0.0
@@ -85,14 +216,18 @@ class PortfolioManager:
         
     def reset_daily_risk(self):
         """Reset daily risk tracking at start of new day"""
-        current_date = datetime.now().date()
+        current_date = self.clock.today()
         if current_date != self.last_reset_date:
             self.daily_risk_used = 0.0
             self.last_reset_date = current_date
             logger.info(f"Daily risk reset for {current_date}")
     
-    def can_take_position(self, risk_amount: float, ticker: str) -> Tuple[bool, str]:
-        """Check if we can take a new position based on risk limits"""
+    def can_take_position(self, risk_amount: float, ticker: str, position_value: float = None) -> Tuple[bool, str]:
+        """Check if we can take a new position based on risk limits
+        
+        position_value is the notional of the sized position (shares times
+        entry price), checked against MAX_POSITION_SIZE when given.
+        """
         self.reset_daily_risk()
         
         # Check daily risk limit
@@ -104,8 +239,7 @@ class PortfolioManager:
             return False, f"Maximum positions reached: {len(self.positions)}"
         
         # Check position size limit
-        position_value = risk_amount / (STOP_LOSS_PERCENTAGE / 100)  # Calculate position size
-        if position_value > self.current_capital * MAX_POSITION_SIZE:
+        if position_value is not None and position_value > self.current_capital * MAX_POSITION_SIZE:
             return False, f"Position size too large: {position_value:.2f} > {self.current_capital * MAX_POSITION_SIZE:.2f}"
         
         # Check correlated positions (same sector)
@@ -116,10 +250,9 @@ class PortfolioManager:
         return True, "OK"
     
     def _count_sector_positions(self, ticker: str) -> int:
-        """Count positions in the same sector as the given ticker"""
-        # This would need market data to determine sector
-        # For now, we'll use a simple approach
-        return len(self.positions)
+        """Count open positions in the same ticker or sector as the given ticker, or correlated with it"""
+        return sum(len(order_ids) for held, order_ids in self.ticker_positions.items()
+                   if self.correlations.is_correlated(ticker, held))
     
     def calculate_position_size(self, ticker: str, entry_price: float, 
                               stop_loss: float, risk_per_trade: float) -> Tuple[int, float]:
@@ -153,23 +286,25 @@ class PortfolioManager:
                      notes: str = "") -> Optional[str]:
         """Open a new position"""
         try:
-            # Check if we can take the position
-            can_trade, reason = self.can_take_position(risk_amount, ticker)
-            if not can_trade:
-                logger.warning(f"Cannot open position in {ticker}: {reason}")
-                return None
-            
             # Calculate position size
             shares, actual_risk = self.calculate_position_size(
                 ticker, entry_price, stop_loss, risk_amount
             )
             
+            # Check if we can take the position
+            can_trade, reason = self.can_take_position(risk_amount, ticker, shares * entry_price)
+            if not can_trade:
+                logger.warning(f"Cannot open position in {ticker}: {reason}")
+                return None
+            
             if shares <= 0:
                 logger.warning(f"Invalid position size for {ticker}")
                 return None
             
             # Create order ID
-            order_id = f"{ticker}_{strategy}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            now = self.clock.now()
+            self.order_sequence += 1
+            order_id = f"{ticker}_{strategy}_{now.strftime('%Y%m%d_%H%M%S')}_{self.order_sequence}"
             
             # Create position
             position = Position(
@@ -178,7 +313,7 @@ class PortfolioManager:
                 action=signal_action,
                 shares=shares,
                 entry_price=entry_price,
-                entry_time=datetime.now(),
+                entry_time=now,
                 stop_loss=stop_loss,
                 target_price=target_price,
                 order_id=order_id,
@@ -186,8 +321,10 @@ class PortfolioManager:
                 notes=notes
             )
             
-            # Add to positions
+            # Add to positions; the book goes first, since it is the one that can refuse
+            self.book.add(order_id, ticker, signal_action, shares, entry_price, stop_loss, target_price)
             self.positions[order_id] = position
+            self.ticker_positions.setdefault(ticker, []).append(order_id)
             
             # Update risk tracking
             self.daily_risk_used += actual_risk
@@ -219,7 +356,7 @@ class PortfolioManager:
                 return None
             
             position = self.positions[order_id]
-            exit_time = datetime.now()
+            exit_time = self.clock.now()
             
             # Calculate trade metrics
             if position.action == "BUY":
@@ -302,6 +439,11 @@ class PortfolioManager:
             
             # Remove position and add to completed trades
             del self.positions[order_id]
+            order_ids = self.ticker_positions[position.ticker]
+            order_ids.remove(order_id)
+            if not order_ids:
+                del self.ticker_positions[position.ticker]
+            self.book.remove(order_id)
             self.completed_trades.append(trade)
             
             logger.info(f"Closed position {order_id}: {win_loss} ${gross_pl:.2f} ({return_pct:.2%})")
@@ -312,33 +454,42 @@ class PortfolioManager:
             logger.error(f"Error closing position {order_id}: {e}")
             return None
     
-    def update_positions(self, data_feed: MarketDataFeed, strategy_manager) -> List[Trade]:
-        """Update all open positions and close if necessary"""
+    def update_positions(self, data_feed: MarketDataFeed, strategy_manager,
+                         tickers: Iterable[str] = None) -> List[Trade]:
+        """Update open positions (all, or only those in the given tickers) and close if necessary"""
         closed_trades = []
         
-        for order_id, position in list(self.positions.items()):
+        if tickers is None:
+            order_ids = list(self.positions)
+        else:
+            order_ids = [order_id for ticker in tickers for order_id in self.ticker_positions.get(ticker, ())]
+        if not order_ids:
+            return closed_trades
+        
+        # Stops and targets of every position are checked in one pass; rows are
+        # looked up first since closing a position moves another into its row
+        prices = self.book.prices(data_feed)
+        marks = self.book.marks(prices)
+        stop_hit, target_hit = self.book.exit_hits(prices)
+        rows = [self.book.index[order_id] for order_id in order_ids]
+        
+        for order_id, row in zip(order_ids, rows):
+            position = self.positions.get(order_id)
+            if position is None:
+                continue
             try:
-                current_price = data_feed.get_current_price(position.ticker)
-                if not current_price:
+                current_price = float(marks[row])
+                if np.isnan(current_price):
                     continue
                 
                 # Check if position should be closed
                 should_close = False
                 exit_reason = ""
                 
-                # Check stop loss
-                if position.action == "BUY" and current_price <= position.stop_loss:
+                if stop_hit[row]:
                     should_close = True
                     exit_reason = "Stop Loss"
-                elif position.action == "SELL" and current_price >= position.stop_loss:
-                    should_close = True
-                    exit_reason = "Stop Loss"
-                
-                # Check target price
-                elif position.action == "BUY" and current_price >= position.target_price:
-                    should_close = True
-                    exit_reason = "Target Hit"
-                elif position.action == "SELL" and current_price <= position.target_price:
+                elif target_hit[row]:
                     should_close = True
                     exit_reason = "Target Hit"
                 
@@ -361,17 +512,11 @@ class PortfolioManager:
         
         return closed_trades
     
-    def get_portfolio_summary(self) -> Dict:
-        """Get current portfolio summary"""
+    def get_portfolio_summary(self, data_feed: MarketDataFeed = None) -> Dict:
+        """Get current portfolio summary, with open positions marked to market when a feed is given"""
         total_positions = len(self.positions)
-        total_value = self.current_capital
         
-        # Add unrealized P&L from open positions
-        for position in self.positions.values():
-            # This would need current market prices to calculate unrealized P&L
-            pass
-        
-        return {
+        summary = {
             "current_capital": self.current_capital,
             "total_positions": total_positions,
             "daily_risk_used": self.daily_risk_used,
@@ -385,6 +530,20 @@ class PortfolioManager:
             "total_loss": self.total_loss,
             "net_profit": self.total_profit - self.total_loss
         }
+        
+        if data_feed is not None:
+            prices = self.book.prices(data_feed)
+            summary["unrealized_pl"] = float(np.nansum(self.book.unrealized_pl(prices)))
+            summary["equity"] = self.current_capital + float(self.book.market_values(prices).sum())
+            summary.update(self.book.exposure(prices))
+        
+        return summary
+    
+    def get_equity(self, data_feed: MarketDataFeed) -> float:
+        """Cash plus open positions marked to the current price (long value minus short liability)"""
+        if not self.book:
+            return self.current_capital
+        return self.current_capital + float(self.book.market_values(self.book.prices(data_feed)).sum())
     
     def get_risk_metrics(self) -> Dict:
         """Get risk management metrics"""
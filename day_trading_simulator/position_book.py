@@ -0,0 +1,122 @@
+"""
+Columnar book of open positions for vectorized exit checks and mark-to-market
+"""
+
+from typing import Dict, Tuple
+import numpy as np
+
+SIDES = {"BUY": 1, "SELL": -1}
+
+POSITION_DTYPE = np.dtype([
+    ("ticker", np.int32),  # Index into PositionBook.tickers
+    ("side", np.int8),  # 1 long, -1 short
+    ("shares", np.int64),
+    ("entry_price", np.float64),
+    ("stop_loss", np.float64),
+    ("target_price", np.float64)
+])
+
+class PositionBook:
+    """Open positions as rows of one structured NumPy array
+    
+    Rows are kept packed: closing a position moves the last row into its
+    place, so the first len(book) rows are always the open positions and
+    order_id -> row lookups go through the index. Every check takes a price
+    vector with one entry per known ticker (see prices()) and covers all
+    positions in a single pass. Row order is arbitrary; callers that need
+    opening order keep it themselves.
+    """
+    
+    def __init__(self, capacity: int = 64):
+        self.rows = np.zeros(capacity, dtype=POSITION_DTYPE)
+        self.size = 0
+        self.order_ids = []  # order_id of each row
+        self.index = {}  # {order_id: row}
+        self.tickers = []  # Every ticker ever held; a ticker's code is its position here
+        self.ticker_codes = {}  # {ticker: code}
+    
+    def __len__(self) -> int:
+        return self.size
+    
+    def __contains__(self, order_id: str) -> bool:
+        return order_id in self.index
+    
+    def add(self, order_id: str, ticker: str, action: str, shares: int,
+            entry_price: float, stop_loss: float, target_price: float):
+        if order_id in self.index:
+            raise ValueError(f"Position {order_id} is already in the book")
+        if self.size == len(self.rows):
+            self.rows = np.concatenate([self.rows, np.zeros(len(self.rows), dtype=POSITION_DTYPE)])
+        
+        code = self.ticker_codes.get(ticker)
+        if code is None:
+            code = self.ticker_codes[ticker] = len(self.tickers)
+            self.tickers.append(ticker)
+        
+        self.rows[self.size] = (code, SIDES[action], shares, entry_price, stop_loss, target_price)
+        self.index[order_id] = self.size
+        self.order_ids.append(order_id)
+        self.size += 1
+    
+    def remove(self, order_id: str):
+        row = self.index.pop(order_id)
+        last = self.size - 1
+        if row != last:
+            self.rows[row] = self.rows[last]
+            moved = self.order_ids[last]
+            self.order_ids[row] = moved
+            self.index[moved] = row
+        self.order_ids.pop()
+        self.size = last
+    
+    def open_rows(self) -> np.ndarray:
+        """View of the rows of the open positions"""
+        return self.rows[:self.size]
+    
+    def prices(self, data_feed) -> np.ndarray:
+        """Current price of every known ticker by code, NaN where the feed has none"""
+        prices = np.full(len(self.tickers), np.nan)
+        for code, ticker in enumerate(self.tickers):
+            price = data_feed.get_current_price(ticker)
+            if price:
+                prices[code] = price
+        return prices
+    
+    def marks(self, prices: np.ndarray) -> np.ndarray:
+        """Each open position's price, in row order"""
+        return prices[self.open_rows()["ticker"]]
+    
+    def exit_hits(self, prices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Per-row (stop hit, target hit) masks; positions without a price hit neither"""
+        rows = self.open_rows()
+        marks = self.marks(prices)
+        side = rows["side"]
+        # Multiplying by the side folds long and short comparisons into one
+        # (exact, since side is +-1); NaN compares False
+        stop_hit = side * (marks - rows["stop_loss"]) <= 0
+        target_hit = side * (marks - rows["target_price"]) >= 0
+        return stop_hit, target_hit
+    
+    def unrealized_pl(self, prices: np.ndarray) -> np.ndarray:
+        """Per-row P&L at the given prices (NaN without a price)"""
+        rows = self.open_rows()
+        return rows["side"] * rows["shares"] * (self.marks(prices) - rows["entry_price"])
+    
+    def market_values(self, prices: np.ndarray) -> np.ndarray:
+        """Per-row signed value (long value, minus short liability), marked at entry without a price"""
+        rows = self.open_rows()
+        marks = self.marks(prices)
+        marks = np.where(np.isnan(marks), rows["entry_price"], marks)
+        return rows["side"] * rows["shares"] * marks
+    
+    def exposure(self, prices: np.ndarray) -> Dict[str, float]:
+        """Gross, net, long and short exposure at the given prices"""
+        values = self.market_values(prices)
+        long_value = float(values[values > 0].sum())
+        short_value = float(-values[values < 0].sum())
+        return {
+            "gross_exposure": long_value + short_value,
+            "net_exposure": long_value - short_value,
+            "long_exposure": long_value,
+            "short_exposure": short_value
+        }
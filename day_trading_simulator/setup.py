@@ -6,6 +6,17 @@ import os
 import subprocess
 import sys
 
+MIN_PYTHON = (3, 10)  # Slotted dataclasses
+
+def check_python_version():
+    """Check that the running Python is recent enough for the simulator"""
+    if sys.version_info < MIN_PYTHON:
+        print(f"✗ Python {'.'.join(map(str, MIN_PYTHON))} or higher is required "
+              f"(found {sys.version.split()[0]})")
+        return False
+    print(f"✓ Python {sys.version.split()[0]}")
+    return True
+
 def install_requirements():
     """Install required packages with better error handling"""
     print("Installing required packages...")
@@ -13,13 +24,11 @@ def install_requirements():
     # List of packages to install individually
     packages = [
         "yfinance>=0.2.18",
-        "pandas>=1.5.0", 
+        "pandas>=2.0", 
         "numpy>=1.21.0",
         "openpyxl>=3.0.0",
         "requests>=2.25.0",
-        "schedule>=1.1.0",
-        "matplotlib>=3.5.0",
-        "seaborn>=0.11.0"
+        "matplotlib>=3.5.0"
     ]
     
     failed_packages = []
@@ -72,8 +81,7 @@ def test_imports():
         "numpy",
         "openpyxl",
         "ta",
-        "requests",
-        "schedule"
+        "requests"
     ]
     
     failed_imports = []
@@ -98,6 +106,10 @@ def main():
     print("=" * 40)
     print()
     
+    if not check_python_version():
+        return False
+    print()
+    
     # Create directories
     create_directories()
     print()
@@ -0,0 +1,116 @@
+"""
+Append-only CSV journal of closed trades, the system of record behind the Excel log
+"""
+
+import os
+import csv
+import time
+import logging
+from typing import Dict, Iterator, List
+import pandas as pd
+from config import *
+
+logger = logging.getLogger(__name__)
+
+# One column per "Trading Log" column of the Excel workbook
+JOURNAL_COLUMNS = [
+    "Date", "Ticker", "Market Direction", "Strategy", "Strategy Version",
+    "Entry Time", "Exit Time", "Entry Price (intended)", "Entry Fill Price",
+    "Exit Price (intended)", "Exit Fill Price", "Stop Loss Price", "Shares",
+    "Total Price", "Account Size ($)", "$ Risked (per trade)", "% of Portfolio Risked",
+    "Gross P/L ($)", "% Return on Trade", "R Multiple", "Trade Duration (min)",
+    "Win/Loss", "Setup Quality (1–5)", "Order ID", "Commission", "Slippage",
+    "ATR at Entry", "Entry Signal", "Exit Signal", "Notes", "Closing Notes",
+    "Cumulative P/L"
+]
+
+def read_journal_chunks(path: str, rows: int, columns: List[str] = None) -> Iterator[pd.DataFrame]:
+    """Journaled trades in logging order, `rows` at a time, optionally only some columns
+    
+    Reads the file without opening it for appending, so a report can run
+    while the simulator is writing.
+    """
+    with pd.read_csv(path, encoding="utf-8", chunksize=rows, usecols=columns) as reader:
+        yield from reader
+
+class TradeJournal:
+    """Closed trades appended as CSV rows to a file that is never rewritten
+    
+    Every append is written and flushed to the OS at once, so its cost does
+    not depend on how many trades came before. fsync, which makes the rows
+    survive a power loss, is batched: it runs once JOURNAL_FSYNC_BATCH rows
+    are pending or JOURNAL_FSYNC_INTERVAL seconds have passed since the last
+    one, and on close(). A row torn by a crash mid-write is cut off when the
+    journal is reopened.
+    """
+    
+    def __init__(self, path: str = JOURNAL_FILE, fsync_batch: int = JOURNAL_FSYNC_BATCH,
+                 fsync_interval: float = JOURNAL_FSYNC_INTERVAL):
+        self.path = path
+        self.fsync_batch = fsync_batch
+        self.fsync_interval = fsync_interval
+        self.pending = 0  # Rows written since the last fsync
+        self.last_sync = time.monotonic()
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._repair_tail()
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, "a", newline="", encoding="utf-8")
+        self.writer = csv.DictWriter(self.file, fieldnames=JOURNAL_COLUMNS, extrasaction="ignore")
+        if is_new:
+            self.writer.writeheader()
+            self.sync()
+    
+    def _repair_tail(self):
+        """Truncate a partial last row left behind by a crash"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb+") as file:
+            end = file.seek(0, os.SEEK_END)
+            position = end
+            while position > 0:
+                chunk_start = max(0, position - 4096)
+                file.seek(chunk_start)
+                chunk = file.read(position - chunk_start)
+                newline = chunk.rfind(b"\n")
+                if newline >= 0:
+                    position = chunk_start + newline + 1
+                    break
+                position = chunk_start
+            if position != end:
+                logger.warning(f"Discarding {end - position} bytes of a partial row at the end of {self.path}")
+                file.truncate(position)
+    
+    def append(self, rows: List[Dict]):
+        """Append rows (dicts keyed by JOURNAL_COLUMNS) and fsync if the batch is due"""
+        if not rows:
+            return
+        self.writer.writerows(rows)
+        self.file.flush()
+        self.pending += len(rows)
+        if self.pending >= self.fsync_batch or time.monotonic() - self.last_sync >= self.fsync_interval:
+            self.sync()
+    
+    def sync(self):
+        """Force everything written so far to disk"""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.pending = 0
+        self.last_sync = time.monotonic()
+    
+    def read(self) -> pd.DataFrame:
+        """Every journaled trade, in the order they were logged"""
+        self.file.flush()
+        return pd.read_csv(self.path, encoding="utf-8")
+    
+    def read_chunks(self, rows: int) -> Iterator[pd.DataFrame]:
+        """Every journaled trade, in logging order, `rows` at a time"""
+        self.file.flush()
+        yield from read_journal_chunks(self.path, rows)
+    
+    def close(self):
+        if not self.file.closed:
+            self.sync()
+            self.file.close()
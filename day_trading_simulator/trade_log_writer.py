@@ -0,0 +1,183 @@
+"""
+Background thread that writes closed trades to the trade log in batches
+"""
+
+import time
+import logging
+import threading
+from collections import deque
+from typing import Dict, List
+from config import *
+from portfolio_manager import Trade
+from excel_logger import ExcelLogger, annotate_trades
+
+logger = logging.getLogger(__name__)
+
+class TradeLogWriter:
+    """Hands closed trades from the trading thread to a writer thread
+    
+    submit() only copies the trades into a queue, so the trading loop never
+    waits on the journal, the trade store or the workbook. The writer thread
+    coalesces queued trades into batches of up to `batch_size`, writing once
+    a batch is full or its oldest trade has waited `flush_interval` seconds.
+    Workbook rebuilds (request_sync) run on the same thread after the trades
+    queued before them.
+    
+    The queue is not bounded: closed trades are the record of what
+    happened, so submit() never drops one or holds up the trading thread.
+    `warn_depth` is only a warning threshold. Trades queued beyond it are
+    counted as backlogged, and metrics() reports them with the queue depth,
+    its high-water mark and how long trades wait, so a writer that cannot
+    keep up shows before it matters.
+    """
+    
+    def __init__(self, trade_logger: ExcelLogger, warn_depth: int = TRADE_WRITER_WARN_DEPTH,
+                 batch_size: int = TRADE_WRITER_BATCH_SIZE,
+                 flush_interval: float = TRADE_WRITER_FLUSH_INTERVAL):
+        self.trade_logger = trade_logger
+        self.warn_depth = warn_depth
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        
+        self._condition = threading.Condition()
+        self._pending = deque()  # (monotonic time queued, annotated Trade)
+        self._sync_requested = False
+        self._flush_waiters = 0  # Callers blocked in flush(), which skip the batching delay
+        self._stopping = False
+        
+        # Backpressure metrics
+        self.submitted = 0
+        self.written = 0  # Trades handed to the trade logger, including any it failed to store
+        self.synced_through = 0  # `written` as of the last completed sync
+        self.batches = 0
+        self.backlogged = 0  # Trades queued beyond warn_depth
+        self.high_water = 0
+        self.in_flight = 0
+        self.max_wait = 0.0  # Longest time from submit() to written, in seconds
+        self.last_batch_seconds = 0.0
+        
+        self.thread = threading.Thread(target=self._run, name="trade-log-writer", daemon=True)
+        self.thread.start()
+    
+    def submit(self, trades: List[Trade], market_directions: Dict[str, str] = None,
+               atr_data: Dict[str, float] = None, entry_signals: Dict[str, str] = None):
+        """Queue closed trades for logging; never blocks on I/O"""
+        annotated = annotate_trades(trades, market_directions, atr_data, entry_signals)
+        if not annotated:
+            return
+        queued = time.monotonic()
+        with self._condition:
+            if self._stopping:
+                raise RuntimeError("Trade log writer is closed")
+            excess = len(self._pending) + len(annotated) - self.warn_depth
+            if excess > 0:
+                if self.backlogged == 0:
+                    logger.warning(f"More than {self.warn_depth} trades are waiting for the trade log; "
+                                   f"the writer is falling behind")
+                self.backlogged += min(excess, len(annotated))
+            self._pending.extend((queued, trade) for trade in annotated)
+            self.submitted += len(annotated)
+            self.high_water = max(self.high_water, len(self._pending))
+            self._condition.notify_all()
+    
+    def request_sync(self):
+        """Fsync the journal and rebuild the workbook on the writer thread, after the queued trades"""
+        with self._condition:
+            self._sync_requested = True
+            self._condition.notify_all()
+    
+    def flush(self, sync: bool = False, timeout: float = None) -> bool:
+        """Wait until every trade submitted so far is written (and synced); False on timeout"""
+        with self._condition:
+            target = self.submitted
+            if sync:
+                self._sync_requested = True
+            self._flush_waiters += 1
+            self._condition.notify_all()
+            try:
+                return self._condition.wait_for(
+                    lambda: self.written >= target and (not sync or self.synced_through >= target),
+                    timeout
+                )
+            finally:
+                self._flush_waiters -= 1
+    
+    def close(self, timeout: float = None):
+        """Write everything queued, sync, and stop the writer thread"""
+        with self._condition:
+            self._stopping = True
+            self._sync_requested = True
+            self._condition.notify_all()
+        self.thread.join(timeout)
+    
+    def metrics(self) -> Dict:
+        with self._condition:
+            oldest_wait = time.monotonic() - self._pending[0][0] if self._pending else 0.0
+            return {
+                "queue_depth": len(self._pending),
+                "in_flight": self.in_flight,
+                "warn_depth": self.warn_depth,
+                "high_water": self.high_water,
+                "backlogged": self.backlogged,
+                "submitted": self.submitted,
+                "written": self.written,
+                "batches": self.batches,
+                "avg_batch_size": self.written / self.batches if self.batches else 0.0,
+                "oldest_wait_s": oldest_wait,
+                "max_wait_s": self.max_wait,
+                "last_batch_s": self.last_batch_seconds
+            }
+    
+    def _urgent(self) -> bool:
+        return self._flush_waiters > 0 or self._sync_requested or self._stopping
+    
+    def _next_batch(self):
+        """Block until there is work; return (batch, sync), or None once closed and drained"""
+        with self._condition:
+            self._condition.wait_for(lambda: self._pending or self._sync_requested or self._stopping)
+            if self._pending and len(self._pending) < self.batch_size and not self._urgent():
+                deadline = self._pending[0][0] + self.flush_interval
+                self._condition.wait_for(lambda: len(self._pending) >= self.batch_size or self._urgent(),
+                                         max(0.0, deadline - time.monotonic()))
+            
+            batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+            sync = self._sync_requested and not self._pending
+            if sync:
+                self._sync_requested = False
+            if not batch and not sync and self._stopping:
+                return None
+            self.in_flight = len(batch)
+            return batch, sync
+    
+    def _run(self):
+        while True:
+            work = self._next_batch()
+            if work is None:
+                return
+            batch, sync = work
+            
+            if batch:
+                started = time.monotonic()
+                try:
+                    self.trade_logger.log_annotated_trades([trade for _, trade in batch])
+                except Exception as e:
+                    logger.error(f"Error writing {len(batch)} trades to the trade log: {e}")
+                finished = time.monotonic()
+                with self._condition:
+                    self.written += len(batch)
+                    self.batches += 1
+                    self.in_flight = 0
+                    self.last_batch_seconds = finished - started
+                    self.max_wait = max(self.max_wait, finished - batch[0][0])
+                    self._condition.notify_all()
+            
+            if sync:
+                with self._condition:
+                    written = self.written
+                try:
+                    self.trade_logger.sync()
+                except Exception as e:
+                    logger.error(f"Error syncing the trade log: {e}")
+                with self._condition:
+                    self.synced_through = written
+                    self._condition.notify_all()
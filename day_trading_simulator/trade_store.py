@@ -0,0 +1,261 @@
+"""
+Embedded SQLite store of closed trades with indexed queries and aggregations
+"""
+
+import os
+import sqlite3
+import logging
+import threading
+from dataclasses import fields
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple, get_type_hints
+import pandas as pd
+import numpy as np
+from config import *
+from portfolio_manager import Trade
+from trade_journal import JOURNAL_COLUMNS
+from attribution_cube import AttributionCube, CUBE_SUMS, create_cube_schema, fold_into_cube
+
+logger = logging.getLogger(__name__)
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"  # As in the journal and workbook
+STORE_COLUMNS = [column.name for column in fields(Trade)]
+# Journal columns are the Trade fields in the same order, under their workbook names
+JOURNAL_TO_STORE = dict(zip(JOURNAL_COLUMNS, STORE_COLUMNS))
+INDEXED_COLUMNS = ["date", "ticker", "strategy", "order_id", "gross_pl"]  # gross_pl: best/worst trades
+ROLLUP_KEY = ["date", "ticker", "strategy"]  # Reports can filter and group by these
+
+# Per-trade contributions to the daily_rollup aggregates, summed per ROLLUP_KEY
+ROLLUP_SUMS = {
+    **CUBE_SUMS,
+    "risk_sum": "COALESCE(SUM(risk_amount), 0)",
+    "risk_count": "COUNT(risk_amount)",
+    "duration_sum": "COALESCE(SUM(trade_duration_min), 0)",
+    "duration_count": "COUNT(trade_duration_min)"
+}
+ROLLUP_EXTREMES = {"min_cumulative_pl": ("MIN", "cumulative_pl"), "max_risk": ("MAX", "risk_amount")}
+
+def _sql_type(hint) -> str:
+    if hint in (int, Optional[int]):
+        return "INTEGER"
+    if hint in (float, Optional[float]):
+        return "REAL"
+    return "TEXT"  # Strings, and datetimes stored as TIME_FORMAT text
+
+class TradeStore:
+    """Closed trades in one indexed SQLite table, plus a daily rollup for reports
+    
+    Columns are the Trade fields; date, ticker, strategy, order_id and
+    gross_pl are indexed for filtered and ranked queries. Each insert batch is one transaction that
+    also folds the new trades into daily_rollup, which holds counts and sums
+    per date, ticker and strategy, and into the attribution cube (`cube`).
+    summary() and performance_by() aggregate the rollup, so their cost grows
+    with the number of trading days rather than trades. The database runs in
+    WAL mode, so reports can read it while the simulator writes. One
+    connection is shared under a lock.
+    """
+    
+    def __init__(self, path: str = TRADE_STORE_FILE):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+        self.cube = AttributionCube(self)
+    
+    def _create_schema(self):
+        hints = get_type_hints(Trade)
+        columns = ", ".join(f"{name} {_sql_type(hints[name])}" for name in STORE_COLUMNS)
+        with self._lock, self.connection:
+            self.connection.execute(f"CREATE TABLE IF NOT EXISTS trades (id INTEGER PRIMARY KEY, {columns})")
+            for column in INDEXED_COLUMNS:
+                self.connection.execute(f"CREATE INDEX IF NOT EXISTS trades_{column} ON trades ({column})")
+            
+            aggregates = [f"{name} REAL" for name in [*ROLLUP_SUMS, *ROLLUP_EXTREMES]]
+            self.connection.execute(
+                f"CREATE TABLE IF NOT EXISTS daily_rollup ({', '.join(ROLLUP_KEY)}, {', '.join(aggregates)}, "
+                f"PRIMARY KEY ({', '.join(ROLLUP_KEY)}))"
+            )
+            for column in ROLLUP_KEY[1:]:
+                self.connection.execute(f"CREATE INDEX IF NOT EXISTS daily_rollup_{column} ON daily_rollup ({column})")
+            create_cube_schema(self.connection)
+    
+    def _fold_into_rollup(self, after_id: int):
+        """Add the trades with ids above after_id to daily_rollup (inside the insert transaction)"""
+        key = ", ".join(ROLLUP_KEY)
+        selected = [f"{expression} AS {name}" for name, expression in ROLLUP_SUMS.items()]
+        selected += [f"{function}({column}) AS {name}" for name, (function, column) in ROLLUP_EXTREMES.items()]
+        updates = [f"{name} = {name} + excluded.{name}" for name in ROLLUP_SUMS]
+        # SQLite's two-argument MIN/MAX return NULL if either side is NULL
+        updates += [f"{name} = COALESCE({function}({name}, excluded.{name}), {name}, excluded.{name})"
+                    for name, (function, _) in ROLLUP_EXTREMES.items()]
+        self.connection.execute(f"""
+            INSERT INTO daily_rollup ({key}, {', '.join([*ROLLUP_SUMS, *ROLLUP_EXTREMES])})
+            SELECT {key}, {', '.join(selected)} FROM trades WHERE id > ? GROUP BY {key}
+            ON CONFLICT ({key}) DO UPDATE SET {', '.join(updates)}""", (after_id,))
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return self.connection.execute("SELECT COUNT(*) FROM trades").fetchone()[0]
+    
+    def insert_trades(self, trades: Iterable[Trade]):
+        """Insert trades in one transaction"""
+        self.insert_rows([self._trade_values(trade) for trade in trades])
+    
+    def insert_journal_rows(self, journal: pd.DataFrame):
+        """Insert rows read from the trade journal (workbook column names)"""
+        frame = journal.rename(columns=JOURNAL_TO_STORE).reindex(columns=STORE_COLUMNS)
+        frame = frame.astype(object).where(frame.notna(), None)
+        # The journal writes missing optional values as empty strings
+        frame = frame.replace("", None)
+        self.insert_rows(list(frame.itertuples(index=False, name=None)))
+    
+    def insert_rows(self, rows: List[Tuple]):
+        """Insert tuples of STORE_COLUMNS values in one transaction"""
+        if not rows:
+            return
+        placeholders = ", ".join("?" for _ in STORE_COLUMNS)
+        with self._lock, self.connection:
+            last_id = self.connection.execute("SELECT COALESCE(MAX(id), 0) FROM trades").fetchone()[0]
+            self.connection.executemany(
+                f"INSERT INTO trades ({', '.join(STORE_COLUMNS)}) VALUES ({placeholders})", rows
+            )
+            self._fold_into_rollup(last_id)
+            fold_into_cube(self.connection, last_id)
+    
+    def _trade_values(self, trade: Trade) -> Tuple:
+        values = []
+        for name in STORE_COLUMNS:
+            value = getattr(trade, name)
+            if isinstance(value, datetime):
+                value = value.strftime(TIME_FORMAT)
+            elif isinstance(value, np.generic):
+                value = value.item()
+            values.append(value)
+        return tuple(values)
+    
+    def _where(self, start_date=None, end_date=None, ticker: str = None,
+               strategy: str = None) -> Tuple[str, list]:
+        """WHERE clause for the common filters; dates are inclusive"""
+        conditions, params = [], []
+        if start_date is not None:
+            conditions.append("date >= ?")
+            params.append(str(pd.Timestamp(start_date).date()))
+        if end_date is not None:
+            conditions.append("date <= ?")
+            params.append(str(pd.Timestamp(end_date).date()))
+        if ticker is not None:
+            conditions.append("ticker = ?")
+            params.append(ticker)
+        if strategy is not None:
+            conditions.append("strategy = ?")
+            params.append(strategy)
+        return (" WHERE " + " AND ".join(conditions) if conditions else ""), params
+    
+    def read_sql(self, sql: str, params: list = None) -> pd.DataFrame:
+        """Result of a read-only query, under the connection lock"""
+        with self._lock:
+            return pd.read_sql_query(sql, self.connection, params=params)
+    
+    def get_trade(self, order_id: str) -> Optional[Trade]:
+        with self._lock:
+            row = self.connection.execute(
+                f"SELECT {', '.join(STORE_COLUMNS)} FROM trades WHERE order_id = ? ORDER BY id LIMIT 1",
+                (order_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        values = dict(zip(STORE_COLUMNS, row))
+        for name in ("entry_time", "exit_time"):
+            if values[name]:
+                values[name] = datetime.strptime(values[name], TIME_FORMAT)
+        return Trade(**values)
+    
+    def query(self, columns: List[str] = None, order_by: str = "id", descending: bool = False,
+              limit: int = None, **filters) -> pd.DataFrame:
+        """Trades matching the filters (start_date, end_date, ticker, strategy), in logging order by default"""
+        columns = columns or STORE_COLUMNS
+        for name in [*columns, order_by]:
+            if name != "id" and name not in STORE_COLUMNS:
+                raise ValueError(f"Unknown trade column: {name}")
+        where, params = self._where(**filters)
+        sql = f"SELECT {', '.join(columns)} FROM trades{where} ORDER BY {order_by}{' DESC' if descending else ''}"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        return self.read_sql(sql, params)
+    
+    def get_trades(self, ids: List[int], columns: List[str] = None) -> pd.DataFrame:
+        """Trades by store id, in the order of ids"""
+        columns = columns or STORE_COLUMNS
+        for name in columns:
+            if name not in STORE_COLUMNS:
+                raise ValueError(f"Unknown trade column: {name}")
+        if not ids:
+            return pd.DataFrame(columns=columns)
+        frame = self.read_sql(
+            f"SELECT id, {', '.join(columns)} FROM trades WHERE id IN ({', '.join('?' for _ in ids)})", list(ids)
+        )
+        return frame.set_index("id").loc[list(ids)].reset_index(drop=True)
+    
+    def summary(self, **filters) -> Dict:
+        """Overall performance of the matching trades, from the daily rollup"""
+        where, params = self._where(**filters)
+        frame = self.read_sql(f"""
+            SELECT CAST(COALESCE(SUM(trades), 0) AS INTEGER) AS total_trades,
+                   CAST(COALESCE(SUM(wins), 0) AS INTEGER) AS winning_trades,
+                   CAST(COALESCE(SUM(losses), 0) AS INTEGER) AS losing_trades,
+                   COALESCE(SUM(gross_profit), 0) AS total_profit,
+                   COALESCE(SUM(gross_loss), 0) AS total_loss,
+                   MIN(min_cumulative_pl) AS min_cumulative_pl,
+                   SUM(risk_sum) / SUM(risk_count) AS avg_risk,
+                   MAX(max_risk) AS max_risk,
+                   SUM(duration_sum) / SUM(duration_count) AS avg_duration_min
+            FROM daily_rollup{where}""", params)
+        # Per column, since a row of a frame would upcast the counts to float
+        summary = {key: (value.item() if isinstance(value, np.generic) else value)
+                   for key, value in frame.to_dict("records")[0].items()}
+        
+        total, wins, losses = summary["total_trades"], summary["winning_trades"], summary["losing_trades"]
+        summary["win_rate"] = wins / total * 100 if total else 0.0
+        summary["net_profit"] = summary["total_profit"] - summary["total_loss"]
+        summary["avg_win"] = summary["total_profit"] / wins if wins else 0.0
+        summary["avg_loss"] = summary["total_loss"] / losses if losses else 0.0
+        summary["profit_factor"] = (summary["total_profit"] / summary["total_loss"]
+                                    if summary["total_loss"] else float("inf"))
+        return summary
+    
+    def performance_by(self, column: str, limit: int = None, **filters) -> pd.DataFrame:
+        """Trades, wins, P/L and profit factor per date, ticker or strategy, from the daily rollup
+        
+        With a limit only the last `limit` groups are returned (the most recent
+        dates when grouping by date).
+        """
+        if column not in ROLLUP_KEY:
+            raise ValueError(f"Cannot group trades by {column}")
+        where, params = self._where(**filters)
+        sql = f"""
+            SELECT {column},
+                   CAST(SUM(trades) AS INTEGER) AS total_trades,
+                   CAST(SUM(wins) AS INTEGER) AS wins,
+                   SUM(total_pl) AS total_pl,
+                   SUM(total_pl) / SUM(trades) AS avg_pl,
+                   SUM(gross_profit) AS gross_profit,
+                   SUM(gross_loss) AS gross_loss
+            FROM daily_rollup{where} GROUP BY {column} ORDER BY {column} DESC"""
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        frame = self.read_sql(sql, params).iloc[::-1].set_index(column)
+        
+        frame["win_rate"] = frame["wins"] / frame["total_trades"] * 100
+        frame["profit_factor"] = frame["gross_profit"] / frame["gross_loss"].replace(0, np.nan)
+        return frame
+    
+    def close(self):
+        with self._lock:
+            self.connection.close()
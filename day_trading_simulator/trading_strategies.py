@@ -8,73 +8,171 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 import logging
 from abc import ABC, abstractmethod
+from dataclasses import dataclass
+import config
 from config import *
 from data_feed import MarketDataFeed
+from bar_store import market_time_index, window_starts
+from clock import Clock, WallClock
+from features import FeatureBuilder, FeatureSnapshot
 
 logger = logging.getLogger(__name__)
 
+# Config constants a strategy set can override per instance (e.g. in parameter sweeps)
+STRATEGY_PARAMETERS = [
+    "MOMENTUM_LOOKBACK", "REVERSAL_LOOKBACK", "BREAKOUT_LOOKBACK", "SCALPING_LOOKBACK",
+    "RSI_OVERSOLD", "RSI_OVERBOUGHT", "MACD_FAST", "MACD_SLOW", "MACD_SIGNAL",
+    "STOP_LOSS_PERCENTAGE"
+]
+
+def strategy_parameters(overrides: Dict = None) -> Dict:
+    """Strategy parameters from config.py with the given overrides applied"""
+    overrides = overrides or {}
+    unknown = set(overrides) - set(STRATEGY_PARAMETERS)
+    if unknown:
+        raise ValueError(f"Unknown strategy parameters: {sorted(unknown)}")
+    params = {name: getattr(config, name) for name in STRATEGY_PARAMETERS}
+    params.update(overrides)
+    return params
+
+@dataclass(frozen=True, slots=True)
 class TradingSignal:
-    def __init__(self, action: str, price: float, confidence: float, 
-                 stop_loss: float, target_price: float, reason: str):
-        self.action = action  # 'BUY', 'SELL', 'HOLD'
-        self.price = price
-        self.confidence = confidence  # 0-1 scale
-        self.stop_loss = stop_loss
-        self.target_price = target_price
-        self.reason = reason
-        self.timestamp = datetime.now()
+    action: str  # 'BUY', 'SELL', 'HOLD'
+    price: float
+    confidence: float  # 0-1 scale
+    stop_loss: float
+    target_price: float
+    reason: str
+    timestamp: datetime = None
+    
+    def __post_init__(self):
+        if self.timestamp is None:
+            object.__setattr__(self, "timestamp", datetime.now())
 
 class BaseStrategy(ABC):
     """Base class for all trading strategies"""
     
-    def __init__(self, name: str, version: str = "1.0"):
+    history_period = "30d"  # History requested for each signal
+    max_holding_time = timedelta(hours=2)  # Exit once a position is older than this
+    exit_profit_pct = 0.06  # Exit above this gain
+    exit_loss_pct = STOP_LOSS_PERCENTAGE  # Exit below this loss
+    
+    def __init__(self, name: str, version: str = "1.0", params: Dict = None):
         self.name = name
         self.version = version
+        self.params = strategy_parameters(params)
+        self.stop_loss_pct = self.params["STOP_LOSS_PERCENTAGE"]
+        self.required_features = ["bars"]  # Features (see features.py) generate_signal reads
         self.data_feed = None
+        self.feature_builder = None
+        self.clock = WallClock()
         
     def set_data_feed(self, data_feed: MarketDataFeed):
         self.data_feed = data_feed
     
+    def set_clock(self, clock: Clock):
+        self.clock = clock
+    
+    def set_feature_builder(self, feature_builder: FeatureBuilder):
+        """Share snapshots with other strategies instead of computing features alone"""
+        self.feature_builder = feature_builder
+    
+    def get_features(self, ticker: str) -> FeatureSnapshot:
+        """Snapshot of the ticker's latest bar over this strategy's history period"""
+        if self.feature_builder is None:
+            self.feature_builder = FeatureBuilder(self.data_feed, {self.history_period: self.required_features})
+        return self.feature_builder.get(ticker, self.history_period)
+    
     @abstractmethod
     def generate_signal(self, ticker: str) -> Optional[TradingSignal]:
         """Generate trading signal for given ticker"""
         pass
     
-    @abstractmethod
     def should_exit(self, ticker: str, entry_price: float, 
                    entry_time: datetime, current_price: float) -> bool:
         """Determine if position should be exited"""
+        # Exit if position has been held too long
+        if self.clock.now() - entry_time > self.max_holding_time:
+            return True
+        
+        # Exit if profit target reached
+        profit_pct = (current_price - entry_price) / entry_price
+        if profit_pct > self.exit_profit_pct:
+            return True
+        
+        # Exit if stop loss hit
+        if profit_pct < -self.exit_loss_pct:
+            return True
+        
+        return False
+    
+    @abstractmethod
+    def compute_signals(self, bars: pd.DataFrame) -> pd.DataFrame:
+        """Vectorized generate_signal over a whole bar history
+        
+        bars is the full history with indicators (as add_indicators builds
+        it). Row i holds the signal generate_signal would return with the feed
+        positioned at bar i: action (1 BUY, -1 SELL, 0 none), confidence,
+        stop_loss and target_price.
+        """
         pass
+    
+    def exit_mask(self, entry_price, entry_time: np.ndarray, prices: np.ndarray,
+                  times: np.ndarray) -> np.ndarray:
+        """Vectorized should_exit for prices observed at times (nanoseconds)"""
+        profit_pct = (prices - entry_price) / entry_price
+        return (((times - entry_time) > pd.Timedelta(self.max_holding_time).value) |
+                (profit_pct > self.exit_profit_pct) |
+                (profit_pct < -self.exit_loss_pct))
+    
+    def _window_lengths(self, bars: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        """First index and length of the history_period window ending at each bar"""
+        timestamps = market_time_index(bars.index).as_unit("ns").asi8
+        starts = window_starts(timestamps, self.history_period)
+        return starts, np.arange(len(bars)) - starts + 1
+    
+    def _signal_frame(self, bars: pd.DataFrame, buy: np.ndarray, sell: np.ndarray,
+                      buy_values: Tuple, sell_values: Tuple) -> pd.DataFrame:
+        """Combine (confidence, stop_loss, target_price) for buys and sells into one frame"""
+        columns = {"action": np.where(buy, 1, np.where(sell, -1, 0)).astype(np.int8)}
+        for name, buy_value, sell_value in zip(("confidence", "stop_loss", "target_price"),
+                                               buy_values, sell_values):
+            columns[name] = np.where(buy, buy_value, np.where(sell, sell_value, np.nan))
+        return pd.DataFrame(columns, index=bars.index)
 
 class MomentumStrategy(BaseStrategy):
     """Momentum trading strategy based on price and volume"""
     
-    def __init__(self):
-        super().__init__("Momentum", "1.0")
+    max_holding_time = timedelta(hours=2)
+    exit_profit_pct = 0.06  # 6% profit target
+    
+    def __init__(self, params: Dict = None):
+        super().__init__("Momentum", "1.0", params)
+        self.lookback = self.params["MOMENTUM_LOOKBACK"]
+        self.exit_loss_pct = self.stop_loss_pct
+        self.required_features += ["close", f"close_ago:{self.lookback - 1}",
+                                   f"volume_ratio:{self.lookback}", "rsi", "macd_histogram"]
     
     def generate_signal(self, ticker: str) -> Optional[TradingSignal]:
         try:
-            hist_data = self.data_feed.get_historical_data(ticker, "30d")
-            if len(hist_data) < MOMENTUM_LOOKBACK:
+            features = self.get_features(ticker)
+            if features["bars"] < self.lookback:
                 return None
             
-            current_price = self.data_feed.get_current_price(ticker)
+            current_price = features["price"]
             if not current_price:
                 return None
             
             # Calculate momentum indicators
-            price_change = (hist_data['Close'].iloc[-1] - hist_data['Close'].iloc[-MOMENTUM_LOOKBACK]) / hist_data['Close'].iloc[-MOMENTUM_LOOKBACK]
-            volume_avg = hist_data['Volume'].rolling(window=MOMENTUM_LOOKBACK).mean().iloc[-1]
-            current_volume = hist_data['Volume'].iloc[-1]
-            volume_ratio = current_volume / volume_avg if volume_avg > 0 else 1
+            past_close = features[f"close_ago:{self.lookback - 1}"]
+            price_change = (features["close"] - past_close) / past_close
+            volume_ratio = features[f"volume_ratio:{self.lookback}"]
             
             # RSI momentum
-            rsi = hist_data['RSI'].iloc[-1]
+            rsi = features["rsi"]
             
             # MACD momentum
-            macd = hist_data['MACD'].iloc[-1]
-            macd_signal = hist_data['MACD_Signal'].iloc[-1]
-            macd_histogram = macd - macd_signal
+            macd_histogram = features["macd_histogram"]
             
             # Generate signals
             if (price_change > 0.03 and  # 3% price increase
@@ -82,7 +180,7 @@ class MomentumStrategy(BaseStrategy):
                 rsi > 50 and rsi < 70 and  # RSI in momentum zone
                 macd_histogram > 0):  # MACD bullish
                 
-                stop_loss = current_price * (1 - STOP_LOSS_PERCENTAGE)
+                stop_loss = current_price * (1 - self.stop_loss_pct)
                 target_price = current_price * 1.06  # 6% target
                 confidence = min(0.9, (price_change * 10 + volume_ratio - 1 + (rsi - 50) / 20) / 3)
                 
@@ -92,7 +190,8 @@ class MomentumStrategy(BaseStrategy):
                     confidence=confidence,
                     stop_loss=stop_loss,
                     target_price=target_price,
-                    reason=f"Momentum: Price +{price_change:.2%}, Volume {volume_ratio:.1f}x, RSI {rsi:.1f}"
+                    reason=f"Momentum: Price +{price_change:.2%}, Volume {volume_ratio:.1f}x, RSI {rsi:.1f}",
+                    timestamp=self.clock.now()
                 )
             
             elif (price_change < -0.03 and  # 3% price decrease
@@ -100,7 +199,7 @@ class MomentumStrategy(BaseStrategy):
                   rsi < 50 and rsi > 30 and  # RSI in bearish momentum
                   macd_histogram < 0):  # MACD bearish
                 
-                stop_loss = current_price * (1 + STOP_LOSS_PERCENTAGE)
+                stop_loss = current_price * (1 + self.stop_loss_pct)
                 target_price = current_price * 0.94  # 6% target
                 confidence = min(0.9, (abs(price_change) * 10 + volume_ratio - 1 + (50 - rsi) / 20) / 3)
                 
@@ -110,7 +209,8 @@ class MomentumStrategy(BaseStrategy):
                     confidence=confidence,
                     stop_loss=stop_loss,
                     target_price=target_price,
-                    reason=f"Momentum: Price {price_change:.2%}, Volume {volume_ratio:.1f}x, RSI {rsi:.1f}"
+                    reason=f"Momentum: Price {price_change:.2%}, Volume {volume_ratio:.1f}x, RSI {rsi:.1f}",
+                    timestamp=self.clock.now()
                 )
             
             return None
@@ -119,52 +219,73 @@ class MomentumStrategy(BaseStrategy):
             logger.error(f"Error in MomentumStrategy for {ticker}: {e}")
             return None
     
-    def should_exit(self, ticker: str, entry_price: float, 
-                   entry_time: datetime, current_price: float) -> bool:
-        # Exit if position has been held for more than 2 hours
-        if datetime.now() - entry_time > timedelta(hours=2):
-            return True
+    def compute_signals(self, bars: pd.DataFrame) -> pd.DataFrame:
+        _, lengths = self._window_lengths(bars)
+        close = bars['Close'].to_numpy()
+        volume = bars['Volume'].to_numpy()
         
-        # Exit if profit target reached
-        profit_pct = (current_price - entry_price) / entry_price
-        if profit_pct > 0.06:  # 6% profit target
-            return True
+        past_close = _lagged(close, self.lookback - 1)
+        price_change = (close - past_close) / past_close
+        volume_avg = bars['Volume'].rolling(window=self.lookback).mean().to_numpy()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            volume_ratio = np.where(volume_avg > 0, volume / volume_avg, 1)
+        rsi = bars['RSI'].to_numpy()
+        macd_histogram = bars['MACD'].to_numpy() - bars['MACD_Signal'].to_numpy()
+        ready = lengths >= self.lookback
         
-        # Exit if stop loss hit
-        if profit_pct < -STOP_LOSS_PERCENTAGE:
-            return True
+        buy = (ready & (price_change > 0.03) & (volume_ratio > 1.5) &
+               (rsi > 50) & (rsi < 70) & (macd_histogram > 0))
+        sell = (ready & (price_change < -0.03) & (volume_ratio > 1.5) &
+                (rsi < 50) & (rsi > 30) & (macd_histogram < 0))
         
-        return False
+        with np.errstate(invalid="ignore"):
+            return self._signal_frame(bars, buy, sell, (
+                np.minimum(0.9, (price_change * 10 + volume_ratio - 1 + (rsi - 50) / 20) / 3),
+                close * (1 - self.stop_loss_pct),
+                close * 1.06
+            ), (
+                np.minimum(0.9, (np.abs(price_change) * 10 + volume_ratio - 1 + (50 - rsi) / 20) / 3),
+                close * (1 + self.stop_loss_pct),
+                close * 0.94
+            ))
 
 class ReversalStrategy(BaseStrategy):
     """Mean reversion strategy based on RSI and Bollinger Bands"""
     
-    def __init__(self):
-        super().__init__("Reversal", "1.0")
+    max_holding_time = timedelta(hours=3)
+    exit_profit_pct = 0.04  # 4% profit target for reversal
+    
+    def __init__(self, params: Dict = None):
+        super().__init__("Reversal", "1.0", params)
+        self.lookback = self.params["REVERSAL_LOOKBACK"]
+        self.rsi_oversold = self.params["RSI_OVERSOLD"]
+        self.rsi_overbought = self.params["RSI_OVERBOUGHT"]
+        self.exit_loss_pct = self.stop_loss_pct * 1.5
+        self.required_features += ["rsi", "bb_upper", "bb_lower", "bb_middle"]
     
     def generate_signal(self, ticker: str) -> Optional[TradingSignal]:
         try:
-            hist_data = self.data_feed.get_historical_data(ticker, "30d")
-            if len(hist_data) < REVERSAL_LOOKBACK:
+            features = self.get_features(ticker)
+            if features["bars"] < self.lookback:
                 return None
             
-            current_price = self.data_feed.get_current_price(ticker)
+            current_price = features["price"]
             if not current_price:
                 return None
             
-            rsi = hist_data['RSI'].iloc[-1]
-            bb_upper = hist_data['BB_Upper'].iloc[-1]
-            bb_lower = hist_data['BB_Lower'].iloc[-1]
-            bb_middle = hist_data['BB_Middle'].iloc[-1]
+            rsi = features["rsi"]
+            bb_upper = features["bb_upper"]
+            bb_lower = features["bb_lower"]
+            bb_middle = features["bb_middle"]
             
             # Oversold reversal (buy signal)
-            if (rsi < RSI_OVERSOLD and 
+            if (rsi < self.rsi_oversold and 
                 current_price <= bb_lower and
                 current_price < bb_middle):
                 
-                stop_loss = current_price * (1 - STOP_LOSS_PERCENTAGE * 1.5)  # Wider stop for reversal
+                stop_loss = current_price * (1 - self.stop_loss_pct * 1.5)  # Wider stop for reversal
                 target_price = bb_middle  # Target middle band
-                confidence = min(0.85, (RSI_OVERSOLD - rsi) / RSI_OVERSOLD + 0.3)
+                confidence = min(0.85, (self.rsi_oversold - rsi) / self.rsi_oversold + 0.3)
                 
                 return TradingSignal(
                     action="BUY",
@@ -172,17 +293,18 @@ class ReversalStrategy(BaseStrategy):
                     confidence=confidence,
                     stop_loss=stop_loss,
                     target_price=target_price,
-                    reason=f"Reversal: RSI {rsi:.1f} oversold, Price at BB Lower {current_price:.2f}"
+                    reason=f"Reversal: RSI {rsi:.1f} oversold, Price at BB Lower {current_price:.2f}",
+                    timestamp=self.clock.now()
                 )
             
             # Overbought reversal (sell signal)
-            elif (rsi > RSI_OVERBOUGHT and 
+            elif (rsi > self.rsi_overbought and 
                   current_price >= bb_upper and
                   current_price > bb_middle):
                 
-                stop_loss = current_price * (1 + STOP_LOSS_PERCENTAGE * 1.5)  # Wider stop for reversal
+                stop_loss = current_price * (1 + self.stop_loss_pct * 1.5)  # Wider stop for reversal
                 target_price = bb_middle  # Target middle band
-                confidence = min(0.85, (rsi - RSI_OVERBOUGHT) / (100 - RSI_OVERBOUGHT) + 0.3)
+                confidence = min(0.85, (rsi - self.rsi_overbought) / (100 - self.rsi_overbought) + 0.3)
                 
                 return TradingSignal(
                     action="SELL",
@@ -190,7 +312,8 @@ class ReversalStrategy(BaseStrategy):
                     confidence=confidence,
                     stop_loss=stop_loss,
                     target_price=target_price,
-                    reason=f"Reversal: RSI {rsi:.1f} overbought, Price at BB Upper {current_price:.2f}"
+                    reason=f"Reversal: RSI {rsi:.1f} overbought, Price at BB Upper {current_price:.2f}",
+                    timestamp=self.clock.now()
                 )
             
             return None
@@ -199,50 +322,57 @@ class ReversalStrategy(BaseStrategy):
             logger.error(f"Error in ReversalStrategy for {ticker}: {e}")
             return None
     
-    def should_exit(self, ticker: str, entry_price: float, 
-                   entry_time: datetime, current_price: float) -> bool:
-        # Exit if position has been held for more than 3 hours
-        if datetime.now() - entry_time > timedelta(hours=3):
-            return True
-        
-        # Exit if mean reversion target reached
-        profit_pct = (current_price - entry_price) / entry_price
-        if profit_pct > 0.04:  # 4% profit target for reversal
-            return True
+    def compute_signals(self, bars: pd.DataFrame) -> pd.DataFrame:
+        _, lengths = self._window_lengths(bars)
+        close = bars['Close'].to_numpy()
+        rsi = bars['RSI'].to_numpy()
+        bb_upper = bars['BB_Upper'].to_numpy()
+        bb_lower = bars['BB_Lower'].to_numpy()
+        bb_middle = bars['BB_Middle'].to_numpy()
+        ready = lengths >= self.lookback
         
-        # Exit if stop loss hit
-        if profit_pct < -STOP_LOSS_PERCENTAGE * 1.5:
-            return True
+        buy = ready & (rsi < self.rsi_oversold) & (close <= bb_lower) & (close < bb_middle)
+        sell = ready & (rsi > self.rsi_overbought) & (close >= bb_upper) & (close > bb_middle)
         
-        return False
+        return self._signal_frame(bars, buy, sell, (
+            np.minimum(0.85, (self.rsi_oversold - rsi) / self.rsi_oversold + 0.3),
+            close * (1 - self.stop_loss_pct * 1.5),
+            bb_middle
+        ), (
+            np.minimum(0.85, (rsi - self.rsi_overbought) / (100 - self.rsi_overbought) + 0.3),
+            close * (1 + self.stop_loss_pct * 1.5),
+            bb_middle
+        ))
 
 class BreakoutStrategy(BaseStrategy):
     """Breakout strategy based on support/resistance levels"""
     
-    def __init__(self):
-        super().__init__("Breakout", "1.0")
+    max_holding_time = timedelta(hours=4)
+    exit_profit_pct = 0.08  # 8% profit target
+    
+    def __init__(self, params: Dict = None):
+        super().__init__("Breakout", "1.0", params)
+        self.lookback = self.params["BREAKOUT_LOOKBACK"]
+        self.exit_loss_pct = self.stop_loss_pct
+        self.required_features += [f"resistance:{self.lookback}", f"support:{self.lookback}",
+                                   f"volume_ratio:{self.lookback}"]
     
     def generate_signal(self, ticker: str) -> Optional[TradingSignal]:
         try:
-            hist_data = self.data_feed.get_historical_data(ticker, "30d")
-            if len(hist_data) < BREAKOUT_LOOKBACK:
+            features = self.get_features(ticker)
+            if features["bars"] < self.lookback:
                 return None
             
-            current_price = self.data_feed.get_current_price(ticker)
+            current_price = features["price"]
             if not current_price:
                 return None
             
-            # Calculate support and resistance levels
-            recent_highs = hist_data['High'].rolling(window=5).max()
-            recent_lows = hist_data['Low'].rolling(window=5).min()
-            
-            resistance = recent_highs.iloc[-BREAKOUT_LOOKBACK:].max()
-            support = recent_lows.iloc[-BREAKOUT_LOOKBACK:].min()
+            # Support and resistance levels from the recent 5-bar highs and lows
+            resistance = features[f"resistance:{self.lookback}"]
+            support = features[f"support:{self.lookback}"]
             
             # Volume confirmation
-            volume_avg = hist_data['Volume'].rolling(window=BREAKOUT_LOOKBACK).mean().iloc[-1]
-            current_volume = hist_data['Volume'].iloc[-1]
-            volume_ratio = current_volume / volume_avg if volume_avg > 0 else 1
+            volume_ratio = features[f"volume_ratio:{self.lookback}"]
             
             # Breakout above resistance (buy signal)
             if (current_price > resistance * 1.001 and  # 0.1% above resistance
@@ -258,7 +388,8 @@ class BreakoutStrategy(BaseStrategy):
                     confidence=confidence,
                     stop_loss=stop_loss,
                     target_price=target_price,
-                    reason=f"Breakout: Price {current_price:.2f} > Resistance {resistance:.2f}, Volume {volume_ratio:.1f}x"
+                    reason=f"Breakout: Price {current_price:.2f} > Resistance {resistance:.2f}, Volume {volume_ratio:.1f}x",
+                    timestamp=self.clock.now()
                 )
             
             # Breakdown below support (sell signal)
@@ -275,7 +406,8 @@ class BreakoutStrategy(BaseStrategy):
                     confidence=confidence,
                     stop_loss=stop_loss,
                     target_price=target_price,
-                    reason=f"Breakdown: Price {current_price:.2f} < Support {support:.2f}, Volume {volume_ratio:.1f}x"
+                    reason=f"Breakdown: Price {current_price:.2f} < Support {support:.2f}, Volume {volume_ratio:.1f}x",
+                    timestamp=self.clock.now()
                 )
             
             return None
@@ -284,46 +416,67 @@ class BreakoutStrategy(BaseStrategy):
             logger.error(f"Error in BreakoutStrategy for {ticker}: {e}")
             return None
     
-    def should_exit(self, ticker: str, entry_price: float, 
-                   entry_time: datetime, current_price: float) -> bool:
-        # Exit if position has been held for more than 4 hours
-        if datetime.now() - entry_time > timedelta(hours=4):
-            return True
+    def compute_signals(self, bars: pd.DataFrame) -> pd.DataFrame:
+        starts, lengths = self._window_lengths(bars)
+        close = bars['Close'].to_numpy()
+        volume = bars['Volume'].to_numpy()
         
-        # Exit if profit target reached (2:1 risk/reward)
-        profit_pct = (current_price - entry_price) / entry_price
-        if profit_pct > 0.08:  # 8% profit target
-            return True
+        # The max of the last lookback 5-bar highs spans lookback + 4 bars,
+        # clipped to the history window like the rolling max on the window would be
+        stops = np.arange(len(bars)) + 1
+        level_starts = np.maximum(stops - (self.lookback + 4), starts)
+        resistance = _window_reduce(bars['High'].to_numpy(), level_starts, stops, np.fmax)
+        support = _window_reduce(bars['Low'].to_numpy(), level_starts, stops, np.fmin)
         
-        # Exit if stop loss hit
-        if profit_pct < -STOP_LOSS_PERCENTAGE:
-            return True
+        volume_avg = bars['Volume'].rolling(window=self.lookback).mean().to_numpy()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            volume_ratio = np.where(volume_avg > 0, volume / volume_avg, 1)
+        ready = lengths >= self.lookback
         
-        return False
+        buy = ready & (close > resistance * 1.001) & (volume_ratio > 1.3)
+        sell = ready & (close < support * 0.999) & (volume_ratio > 1.3)
+        
+        confidence = np.minimum(0.9, volume_ratio / 2 + 0.4)
+        return self._signal_frame(bars, buy, sell, (
+            confidence,
+            resistance * 0.998,
+            close + (close - resistance) * 2
+        ), (
+            confidence,
+            support * 1.002,
+            close - (support - close) * 2
+        ))
 
 class ScalpingStrategy(BaseStrategy):
     """Scalping strategy for quick profits on small price movements"""
     
-    def __init__(self):
-        super().__init__("Scalping", "1.0")
+    history_period = "5d"
+    max_holding_time = timedelta(minutes=30)
+    exit_profit_pct = 0.01  # 1% profit target
+    exit_loss_pct = 0.005  # 0.5% stop loss
+    
+    def __init__(self, params: Dict = None):
+        super().__init__("Scalping", "1.0", params)
+        self.lookback = self.params["SCALPING_LOOKBACK"]
+        self.required_features += ["sma:5", "sma:10", "close_ago:1", "close_ago:5"]
     
     def generate_signal(self, ticker: str) -> Optional[TradingSignal]:
         try:
-            hist_data = self.data_feed.get_historical_data(ticker, "5d")
-            if len(hist_data) < SCALPING_LOOKBACK:
+            features = self.get_features(ticker)
+            if features["bars"] < self.lookback:
                 return None
             
-            current_price = self.data_feed.get_current_price(ticker)
+            current_price = features["price"]
             if not current_price:
                 return None
             
             # Use shorter timeframes for scalping
-            sma_5 = hist_data['Close'].rolling(window=5).mean().iloc[-1]
-            sma_10 = hist_data['Close'].rolling(window=10).mean().iloc[-1]
+            sma_5 = features["sma:5"]
+            sma_10 = features["sma:10"]
             
             # Quick momentum signals
-            price_change_1min = (current_price - hist_data['Close'].iloc[-2]) / hist_data['Close'].iloc[-2]
-            price_change_5min = (current_price - hist_data['Close'].iloc[-6]) / hist_data['Close'].iloc[-6]
+            price_change_1min = (current_price - features["close_ago:1"]) / features["close_ago:1"]
+            price_change_5min = (current_price - features["close_ago:5"]) / features["close_ago:5"]
             
             # Buy signal: quick upward momentum
             if (price_change_1min > 0.002 and  # 0.2% in 1 minute
@@ -340,7 +493,8 @@ class ScalpingStrategy(BaseStrategy):
                     confidence=confidence,
                     stop_loss=stop_loss,
                     target_price=target_price,
-                    reason=f"Scalp: +{price_change_1min:.2%} 1min, +{price_change_5min:.2%} 5min"
+                    reason=f"Scalp: +{price_change_1min:.2%} 1min, +{price_change_5min:.2%} 5min",
+                    timestamp=self.clock.now()
                 )
             
             # Sell signal: quick downward momentum
@@ -358,7 +512,8 @@ class ScalpingStrategy(BaseStrategy):
                     confidence=confidence,
                     stop_loss=stop_loss,
                     target_price=target_price,
-                    reason=f"Scalp: {price_change_1min:.2%} 1min, {price_change_5min:.2%} 5min"
+                    reason=f"Scalp: {price_change_1min:.2%} 1min, {price_change_5min:.2%} 5min",
+                    timestamp=self.clock.now()
                 )
             
             return None
@@ -367,41 +522,59 @@ class ScalpingStrategy(BaseStrategy):
             logger.error(f"Error in ScalpingStrategy for {ticker}: {e}")
             return None
     
-    def should_exit(self, ticker: str, entry_price: float, 
-                   entry_time: datetime, current_price: float) -> bool:
-        # Exit if position has been held for more than 30 minutes
-        if datetime.now() - entry_time > timedelta(minutes=30):
-            return True
+    def compute_signals(self, bars: pd.DataFrame) -> pd.DataFrame:
+        _, lengths = self._window_lengths(bars)
+        close = bars['Close'].to_numpy()
         
-        # Exit if profit target reached
-        profit_pct = (current_price - entry_price) / entry_price
-        if profit_pct > 0.01:  # 1% profit target
-            return True
+        sma_5 = bars['Close'].rolling(window=5).mean().to_numpy()
+        sma_10 = np.where(lengths >= 10, bars['Close'].rolling(window=10).mean().to_numpy(), np.nan)
+        previous = _lagged(close, 1)
+        five_back = _lagged(close, 5)
+        price_change_1min = (close - previous) / previous
+        price_change_5min = (close - five_back) / five_back
+        # generate_signal reads Close.iloc[-6], so it needs six bars in the window
+        ready = (lengths >= self.lookback) & (lengths >= 6)
         
-        # Exit if stop loss hit
-        if profit_pct < -0.005:  # 0.5% stop loss
-            return True
+        with np.errstate(invalid="ignore"):
+            buy = (ready & (price_change_1min > 0.002) & (price_change_5min > 0.005) &
+                   (close > sma_5) & (sma_5 > sma_10))
+            sell = (ready & (price_change_1min < -0.002) & (price_change_5min < -0.005) &
+                    (close < sma_5) & (sma_5 < sma_10))
         
-        return False
+        return self._signal_frame(bars, buy, sell, (
+            np.minimum(0.8, price_change_1min * 100 + price_change_5min * 50),
+            close * (1 - 0.005),
+            close * 1.01
+        ), (
+            np.minimum(0.8, np.abs(price_change_1min) * 100 + np.abs(price_change_5min) * 50),
+            close * (1 + 0.005),
+            close * 0.99
+        ))
 
 class GapStrategy(BaseStrategy):
     """Gap trading strategy for opening gaps"""
     
-    def __init__(self):
-        super().__init__("Gap", "1.0")
+    history_period = "5d"
+    max_holding_time = timedelta(hours=2)
+    exit_profit_pct = 0.03  # 3% profit target
+    exit_loss_pct = 0.03  # 3% stop loss for gaps
+    
+    def __init__(self, params: Dict = None):
+        super().__init__("Gap", "1.0", params)
+        self.required_features += ["close_ago:1"]
     
     def generate_signal(self, ticker: str) -> Optional[TradingSignal]:
         try:
-            hist_data = self.data_feed.get_historical_data(ticker, "5d")
-            if len(hist_data) < 2:
+            features = self.get_features(ticker)
+            if features["bars"] < 2:
                 return None
             
-            current_price = self.data_feed.get_current_price(ticker)
+            current_price = features["price"]
             if not current_price:
                 return None
             
             # Calculate gap
-            prev_close = hist_data['Close'].iloc[-2]  # Previous day close
+            prev_close = features["close_ago:1"]  # Previous day close
             gap_size = (current_price - prev_close) / prev_close
             
             # Only trade significant gaps (>2%)
@@ -420,7 +593,8 @@ class GapStrategy(BaseStrategy):
                     confidence=confidence,
                     stop_loss=stop_loss,
                     target_price=target_price,
-                    reason=f"Gap Up: {gap_size:.2%} gap from {prev_close:.2f} to {current_price:.2f}"
+                    reason=f"Gap Up: {gap_size:.2%} gap from {prev_close:.2f} to {current_price:.2f}",
+                    timestamp=self.clock.now()
                 )
             
             # Gap down (sell signal)
@@ -435,7 +609,8 @@ class GapStrategy(BaseStrategy):
                     confidence=confidence,
                     stop_loss=stop_loss,
                     target_price=target_price,
-                    reason=f"Gap Down: {gap_size:.2%} gap from {prev_close:.2f} to {current_price:.2f}"
+                    reason=f"Gap Down: {gap_size:.2%} gap from {prev_close:.2f} to {current_price:.2f}",
+                    timestamp=self.clock.now()
                 )
             
             return None
@@ -444,39 +619,72 @@ class GapStrategy(BaseStrategy):
             logger.error(f"Error in GapStrategy for {ticker}: {e}")
             return None
     
-    def should_exit(self, ticker: str, entry_price: float, 
-                   entry_time: datetime, current_price: float) -> bool:
-        # Exit if position has been held for more than 2 hours
-        if datetime.now() - entry_time > timedelta(hours=2):
-            return True
+    def compute_signals(self, bars: pd.DataFrame) -> pd.DataFrame:
+        _, lengths = self._window_lengths(bars)
+        close = bars['Close'].to_numpy()
         
-        # Exit if profit target reached
-        profit_pct = (current_price - entry_price) / entry_price
-        if profit_pct > 0.03:  # 3% profit target
-            return True
+        prev_close = _lagged(close, 1)
+        gap_size = (close - prev_close) / prev_close
+        ready = lengths >= 2
         
-        # Exit if stop loss hit
-        if profit_pct < -0.03:  # 3% stop loss for gaps
-            return True
+        buy = ready & (gap_size > 0.02)
+        sell = ready & (gap_size < -0.02)
         
-        return False
+        return self._signal_frame(bars, buy, sell, (
+            np.minimum(0.9, gap_size * 20),
+            prev_close,
+            close * 1.03
+        ), (
+            np.minimum(0.9, np.abs(gap_size) * 20),
+            prev_close,
+            close * 0.97
+        ))
+
+def _lagged(values: np.ndarray, lag: int) -> np.ndarray:
+    """values shifted forward by lag bars, NaN where there is no earlier bar"""
+    result = np.full(len(values), np.nan)
+    result[lag:] = values[:len(values) - lag]
+    return result
+
+def _window_reduce(values: np.ndarray, starts: np.ndarray, stops: np.ndarray, ufunc) -> np.ndarray:
+    """Reduce values[starts[i]:stops[i]] for every i with a NaN-skipping ufunc such as np.fmax"""
+    if len(values) == 0:
+        return np.empty(0)
+    padded = np.append(values, np.nan)  # reduceat indices must be < len, stops can equal len(values)
+    indices = np.empty(2 * len(starts), dtype=np.intp)
+    indices[0::2] = starts
+    indices[1::2] = stops
+    return ufunc.reduceat(padded, indices)[0::2]
 
 class StrategyManager:
     """Manages all trading strategies"""
     
-    def __init__(self, data_feed: MarketDataFeed):
+    def __init__(self, data_feed: MarketDataFeed, clock: Clock = None, params: Dict = None):
         self.data_feed = data_feed
+        self.clock = clock or data_feed.clock
         self.strategies = {
-            "Momentum": MomentumStrategy(),
-            "Reversal": ReversalStrategy(),
-            "Breakout": BreakoutStrategy(),
-            "Scalping": ScalpingStrategy(),
-            "Gap": GapStrategy()
+            "Momentum": MomentumStrategy(params),
+            "Reversal": ReversalStrategy(params),
+            "Breakout": BreakoutStrategy(params),
+            "Scalping": ScalpingStrategy(params),
+            "Gap": GapStrategy(params)
         }
         
-        # Set data feed for all strategies
+        # Strategies share one feature snapshot per ticker, history period and bar
+        requirements = {}
+        for strategy in self.strategies.values():
+            requirements.setdefault(strategy.history_period, []).extend(strategy.required_features)
+        self.feature_builder = FeatureBuilder(data_feed, requirements)
+        
+        # Set data feed, clock and shared features for all strategies
         for strategy in self.strategies.values():
             strategy.set_data_feed(data_feed)
+            strategy.set_clock(self.clock)
+            strategy.set_feature_builder(self.feature_builder)
+    
+    def get_features(self, ticker: str, period: str = "30d") -> FeatureSnapshot:
+        """Feature snapshot of a ticker's latest bar over a history period, shared by all strategies"""
+        return self.feature_builder.get(ticker, period)
     
     def get_all_signals(self, ticker: str) -> Dict[str, TradingSignal]:
         """Get signals from all strategies for a ticker"""
@@ -0,0 +1,261 @@
+"""
+Vectorized backtest mode: strategy signals and exits computed over whole price histories
+"""
+
+import heapq
+import time
+import logging
+from typing import Dict, List, Optional
+import pandas as pd
+import numpy as np
+from config import *
+from backtester import BacktestEngine, BacktestResult, BarWindow
+from trading_strategies import TradingSignal
+
+logger = logging.getLogger(__name__)
+
+ACTIONS = {1: "BUY", -1: "SELL"}
+
+class VectorizedBacktestEngine(BacktestEngine):
+    """Backtest that evaluates strategies with compute_signals instead of bar by bar
+    
+    Every strategy's entry signals are computed once per ticker over the whole
+    history and aligned to the backtest timeline. The portfolio is then only
+    visited at steps where a signal fires or an open position's exit (found
+    with the strategy's exit_mask plus stop/target checks over the bars it is
+    held) falls due. At those steps the regular position update, risk checks,
+    daily quotas and trade execution run unchanged, so the trades match the
+    event-driven BacktestEngine on the same data. Bars between visits are
+    skipped entirely.
+    
+    Signals are evaluated on each ticker's own bars; when tickers have
+    different timestamps the event-driven engine may also act on a stale
+    price between two bars of a ticker.
+    """
+    
+    def __init__(self, start_date, end_date, tickers: List[str] = None,
+                 interval: str = BACKTEST_INTERVAL, provider=None,
+                 initial_capital: float = INITIAL_PORTFOLIO_VALUE, params: Dict = None,
+                 bars: Dict[str, pd.DataFrame] = None, metadata: Dict[str, Dict] = None):
+        super().__init__(start_date, end_date, tickers, interval, provider, initial_capital, params, bars,
+                         metadata)
+        self.step = None
+        self.closes = {}  # {ticker: close of the latest bar at each timeline step}
+        self.sample_prices = None  # Closes by step and correlation index ticker
+        self.sampled_step = -1  # Last step fed to the correlation index
+        self.candidates = {}  # {strategy: dict of step-sorted candidate arrays}
+        self.pending_exits = []  # heap of (step, order_id)
+        self.open_steps = {}  # {order_id: (ticker, signed shares, step opened)}
+        self.holdings = []  # (ticker, signed shares, step opened, step closed)
+    
+    def _prepare_signals(self):
+        """Compute every strategy's signals per ticker and collect the tradeable ones by step"""
+        feed = self.data_feed
+        tickers = feed.tickers
+        collected = {name: [] for name in self.strategy_manager.strategies}
+        
+        for ticker_index, ticker in enumerate(tickers):
+            history = feed.histories[ticker]
+            positions = feed._positions[ticker]
+            has_bar = positions > 0
+            bar_index = np.maximum(positions - 1, 0)
+            self.closes[ticker] = np.where(has_bar, history.values['Close'][bar_index], np.nan)
+            
+            bars = BarWindow(history, 0, len(history.timestamps)).to_frame()
+            for name, strategy in self.strategy_manager.strategies.items():
+                signals = strategy.compute_signals(bars)
+                # A signal stays live until the ticker's next bar, as in the bar-by-bar scan
+                confidence = signals['confidence'].to_numpy()[bar_index]
+                steps = np.flatnonzero(has_bar & (confidence > 0.7))
+                if len(steps) == 0:
+                    continue
+                rows = bar_index[steps]
+                collected[name].append({
+                    "step": steps,
+                    "ticker": np.full(len(steps), ticker_index),
+                    "confidence": confidence[steps],
+                    "action": signals['action'].to_numpy()[rows],
+                    "price": history.values['Close'][rows],
+                    "stop_loss": signals['stop_loss'].to_numpy()[rows],
+                    "target_price": signals['target_price'].to_numpy()[rows]
+                })
+        
+        if tickers:
+            self.sample_prices = np.column_stack([self.closes[ticker] for ticker in self.correlations.tickers])
+        
+        for name, parts in collected.items():
+            if not parts:
+                continue
+            merged = {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+            # Same order as _find_opportunities: by step, then confidence, then ticker order
+            order = np.lexsort((merged["ticker"], -merged["confidence"], merged["step"]))
+            self.candidates[name] = {key: values[order] for key, values in merged.items()}
+    
+    def run(self) -> BacktestResult:
+        """Run the backtest, visiting only steps where something can happen"""
+        feed = self.data_feed
+        timeline = feed.timeline
+        started = time.perf_counter()
+        self._prepare_signals()
+        
+        entry_steps = [candidates["step"] for candidates in self.candidates.values()]
+        entry_steps = np.unique(np.concatenate(entry_steps)) if entry_steps else np.empty(0, dtype=np.int64)
+        cash_steps = []
+        cash = []
+        
+        logger.info(f"Vectorized backtest of {len(feed.tickers)} tickers on {self.interval} bars: "
+                    f"{len(timeline)} steps, {len(entry_steps)} with signals")
+        
+        next_entry = 0
+        while next_entry < len(entry_steps) or self.pending_exits:
+            step = int(entry_steps[next_entry]) if next_entry < len(entry_steps) else len(timeline)
+            if self.pending_exits and self.pending_exits[0][0] < step:
+                step = self.pending_exits[0][0]
+            if next_entry < len(entry_steps) and entry_steps[next_entry] == step:
+                next_entry += 1
+            
+            self._visit(step)
+            cash_steps.append(step)
+            cash.append(self.portfolio_manager.current_capital)
+        
+        # Anything still open is closed at the last price so the ledger is complete
+        if len(timeline):
+            self._advance_to(len(timeline) - 1)
+            self.force_close_all_positions()
+            self._record_closed(len(timeline) - 1)
+            cash_steps.append(len(timeline) - 1)
+            cash.append(self.portfolio_manager.current_capital)
+        
+        elapsed = time.perf_counter() - started
+        equity_curve = self._equity_curve(cash_steps, cash)
+        bars = sum(int(np.count_nonzero(np.diff(positions, prepend=0))) for positions in feed._positions.values())
+        stats = self._compute_stats(equity_curve, bars, elapsed)
+        logger.info(f"Vectorized backtest finished: {stats['total_trades']} trades, "
+                    f"return {stats['total_return']:.2%}, {stats['bars_per_second']:,.0f} bars/s")
+        
+        return BacktestResult(trades=self.ledger, equity_curve=equity_curve, stats=stats)
+    
+    def _advance_to(self, step: int):
+        self.step = step
+        self.clock.set_time(pd.Timestamp(int(self.data_feed.timeline[step])).to_pydatetime())
+        self.data_feed.advance(step)
+        if self.clock.today() != self.tracking_date:
+            self._reset_daily_tracking()
+        self._sample_correlations_to(step)
+    
+    def _sample_correlations_to(self, step: int):
+        """Feed the correlation index every step up to this one, as the bar-by-bar loop does
+        
+        Only the last window of returns stays in the index, so after a longer
+        gap just those steps are replayed, starting from the prices and sample
+        count the index would have had by then.
+        """
+        correlations = self.correlations
+        correlations.update_sectors(self.data_feed.ticker_metadata, self.data_feed.metadata_date)
+        first = self.sampled_step + 1
+        if step - first >= correlations.window:
+            first = step - correlations.window + 1
+            correlations.last_prices = self.sample_prices[first - 1].copy()
+            correlations.samples = first
+        for row in range(first, step + 1):
+            correlations.update(self.sample_prices[row])
+        self.sampled_step = step
+    
+    def _visit(self, step: int):
+        """Run one step of the live loop: position updates, then the opportunity scan"""
+        self._advance_to(step)
+        self._update_positions()
+        self._record_closed(step)
+        
+        # A position scheduled to exit here that is still open means the vectorized
+        # exit disagreed with update_positions; fall back to checking it every bar
+        while self.pending_exits and self.pending_exits[0][0] <= step:
+            _, order_id = heapq.heappop(self.pending_exits)
+            if order_id in self.portfolio_manager.positions and step + 1 < len(self.data_feed.timeline):
+                logger.warning(f"Vectorized exit for {order_id} did not trigger, rechecking next bar")
+                heapq.heappush(self.pending_exits, (step + 1, order_id))
+        
+        self._scan_for_opportunities()
+    
+    def _record_closed(self, step: int):
+        for order_id in [order_id for order_id in self.open_steps if order_id not in self.portfolio_manager.positions]:
+            ticker, shares, opened = self.open_steps.pop(order_id)
+            self.holdings.append((ticker, shares, opened, step))
+    
+    def _find_opportunities(self, strategy_name: str) -> List[tuple]:
+        """Precomputed signals of one strategy at the current step, best first"""
+        candidates = self.candidates.get(strategy_name)
+        if candidates is None:
+            return []
+        
+        first, last = np.searchsorted(candidates["step"], [self.step, self.step + 1])
+        opportunities = []
+        now = self.clock.now()
+        for row in range(first, last):
+            ticker = self.data_feed.tickers[candidates["ticker"][row]]
+            action = ACTIONS[int(candidates["action"][row])]
+            opportunities.append((ticker, TradingSignal(
+                action=action,
+                price=float(candidates["price"][row]),
+                confidence=float(candidates["confidence"][row]),
+                stop_loss=float(candidates["stop_loss"][row]),
+                target_price=float(candidates["target_price"][row]),
+                reason=f"{strategy_name}: vectorized {action} signal",
+                timestamp=now
+            )))
+        return opportunities
+    
+    def _execute_trade(self, ticker: str, strategy_name: str, signal: TradingSignal) -> bool:
+        if not super()._execute_trade(ticker, strategy_name, signal):
+            return False
+        
+        order_id = next(reversed(self.portfolio_manager.positions))
+        position = self.portfolio_manager.positions[order_id]
+        sign = 1 if position.action == "BUY" else -1
+        self.open_steps[order_id] = (ticker, sign * position.shares, self.step)
+        
+        exit_step = self._exit_step(ticker, self.strategy_manager.strategies[strategy_name], position)
+        if exit_step is not None:
+            heapq.heappush(self.pending_exits, (exit_step, order_id))
+        return True
+    
+    def _exit_step(self, ticker: str, strategy, position) -> Optional[int]:
+        """First later step at which update_positions closes the position, if any"""
+        timeline = self.data_feed.timeline
+        entry_ns = int(timeline[self.step])
+        # The holding-time exit bounds the search
+        last = min(int(np.searchsorted(timeline, entry_ns + pd.Timedelta(strategy.max_holding_time).value,
+                                       side="right")), len(timeline) - 1)
+        if last <= self.step:
+            return None
+        
+        prices = self.closes[ticker][self.step + 1:last + 1]
+        if position.action == "BUY":
+            hit = (prices <= position.stop_loss) | (prices >= position.target_price)
+        else:
+            hit = (prices >= position.stop_loss) | (prices <= position.target_price)
+        hit |= strategy.exit_mask(position.entry_price, entry_ns, prices, timeline[self.step + 1:last + 1])
+        
+        first = int(np.argmax(hit))
+        return self.step + 1 + first if hit[first] else None
+    
+    def _equity_curve(self, cash_steps: List[int], cash: List[float]) -> pd.Series:
+        """Cash between visits plus open holdings marked to each step's close"""
+        timeline = self.data_feed.timeline
+        equity = np.full(len(timeline), np.nan)
+        for step, value in zip(cash_steps, cash):
+            equity[step] = value
+        equity = pd.Series(equity).ffill().fillna(self.portfolio_manager.initial_capital).to_numpy(copy=True)
+        
+        for ticker, shares, opened, closed in self.holdings:
+            equity[opened:closed] += shares * self.closes[ticker][opened:closed]
+        
+        return pd.Series(equity, index=pd.DatetimeIndex(timeline.view("datetime64[ns]")), name="Equity")
+
+def run_vectorized_backtest(start_date, end_date, tickers: List[str] = None,
+                            interval: str = BACKTEST_INTERVAL, provider=None,
+                            initial_capital: float = INITIAL_PORTFOLIO_VALUE,
+                            params: Dict = None) -> BacktestResult:
+    """Convenience wrapper around VectorizedBacktestEngine"""
+    return VectorizedBacktestEngine(start_date, end_date, tickers, interval, provider,
+                                    initial_capital, params).run()